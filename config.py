@@ -1,10 +1,12 @@
+import os
 import configparser
 
 # Reading initial configuration
 config = configparser.ConfigParser()
 config.read('config.ini')
 
-WORKDIR = config['config']['workdir']
+# QA_WORKDIR lets qa_framework.py give every parallel test its own workdir
+WORKDIR = os.environ.get('QA_WORKDIR', config['config']['workdir'])
 BASEDIR = config['config']['basedir']
 SERVER = config['config']['server']
 NODE = config['config']['node']
@@ -12,9 +14,19 @@ USER = config['config']['user']
 MD1_SOCKET = config['config']['md1_socket']
 MD2_SOCKET = config['config']['md2_socket']
 MD3_SOCKET = config['config']['md3_socket']
+# Port leases are shared by all tests, so they always live in the main workdir
+PORT_LEASE_DIR = config['config']['workdir']
+PORT_RANGE_START = config['config']['port_range_start']
+PORT_RANGE_END = config['config']['port_range_end']
+DATADIR_CACHE = config['config']['datadir_cache']
+PARALLEL_STARTUP = config['config']['parallel_startup']
+DATASET_CACHE = config['config']['dataset_cache']
+CLUSTER_POOL_MY_EXTRA = config['config']['cluster_pool_my_extra']
 PT_BASEDIR = config['config']['pt_basedir']
 PQUERY_BIN = config['config']['pquery_bin']
 PQUERY_GRAMMER_FILE = config['config']['pquery_grammer_file']
+PQUERY_CLUSTERS = config['config']['pquery_clusters']
+COMBINATION_STRENGTH = config['config']['combination_strength']
 SYSBENCH_USER = config['sysbench']['sysbench_user']
 SYSBENCH_PASS = config['sysbench']['sysbench_pass']
 SYSBENCH_DB = config['sysbench']['sysbench_db']
@@ -28,5 +40,9 @@ SYSBENCH_RANDOM_LOAD_RUN_TIME = config['sysbench']['sysbench_random_load_run_tim
 SYSBENCH_OLTP_TEST_TABLE_SIZE = config['sysbench']['sysbench_oltp_test_table_size']
 SYSBENCH_READ_QA_TABLE_SIZE = config['sysbench']['sysbench_read_qa_table_size']
 SYSBENCH_CUSTOMIZED_DATALOAD_TABLE_SIZE = config['sysbench']['sysbench_customized_dataload_table_size']
+SYSBENCH_REPORT_INTERVAL = config['sysbench']['sysbench_report_interval']
+SYSBENCH_RESULTS_DB = config['sysbench']['sysbench_results_db']
+PERF_REGRESSION_THRESHOLD = config['sysbench']['perf_regression_threshold']
+WSREP_SAMPLE_INTERVAL = config['sysbench']['wsrep_sample_interval']
 GALERA_LOWER_BASE = config['upgrade']['galera_lower_base']
 GALERA_UPPER_BASE = config['upgrade']['galera_upper_base']
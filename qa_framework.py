@@ -5,8 +5,73 @@
 import os
 import argparse
 import shutil
+import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from config import *
+from util import perf_regression
+from util import cluster_pool
+
+# These suites talk to the standalone MariaDB servers, which always listen
+# on the fixed md_socket paths from config.ini, so they never run in parallel.
+SERIAL_SUITES = ['replication', 'upgrade']
+# Tests which start their cluster with Utility.start_galera and the default
+# profile (cluster_pool_my_extra). Only these get a warm pool cluster, any
+# other test would kill it in its startup sanity check and boot its own.
+POOL_TESTS = ['loadtest/sysbench_load_test.py', 'loadtest/sysbench_multi_writer_test.py',
+              'loadtest/sysbench_random_load_test.py', 'sysbench_run/sysbench_customized_dataload_test.py',
+              'sysbench_run/sysbench_oltp_test.py', 'sysbench_run/sysbench_read_only_test.py']
+
+
+def run_test(scriptdir, suite, file, encryption, debug, job_workdir=None, pooled=False):
+    """ Run one suite test file. Parallel runs get a
+        private workdir through the QA_WORKDIR environment
+        variable, cluster ports come from util/port_allocator.
+        A pooled workdir holds a warm cluster from the
+        cluster pool and is kept as it is.
+    """
+    command = scriptdir + '/suite/' + suite + '/' + file + ' ' + encryption + ' ' + debug
+    if job_workdir is None:
+        return os.system(command)
+    env = dict(os.environ)
+    env['QA_WORKDIR'] = job_workdir
+    if pooled:
+        env['QA_CLUSTER_POOL'] = job_workdir
+    else:
+        if os.path.exists(job_workdir):
+            shutil.rmtree(job_workdir, ignore_errors=True)
+        os.makedirs(job_workdir)
+    with open(job_workdir + '/test_run.log', 'w') as test_log:
+        return subprocess.call(command, shell=True, env=env, stdout=test_log, stderr=subprocess.STDOUT)
+
+
+def save_failed_logs(suite, file, log_files):
+    # Archive the logs of a failed test
+    os.system('tar -czf ' + WORKDIR + '/failed_logs/' + suite + '_' +
+              file + '.tar.gz ' + log_files)
+
+
+def run_parallel(scriptdir, tests, jobs, encryption, debug, pool=None):
+    # Run suite test files concurrently, on warm clusters if there is a cluster pool
+    def job(test):
+        suite, file = test
+        job_workdir = None
+        if pool is not None and suite + '/' + file in POOL_TESTS:
+            job_workdir = pool.lease()
+        pooled = job_workdir is not None
+        if not pooled:
+            job_workdir = WORKDIR + '/jobs/' + suite + '_' + file[:-3]
+        print("Running " + suite + "/" + file + " (workdir: " + job_workdir + ")")
+        result = run_test(scriptdir, suite, file, encryption, debug, job_workdir, pooled)
+        if result != 0:
+            save_failed_logs(suite, file, job_workdir + '/log/* ' + job_workdir + '/test_run.log')
+        if pooled:
+            pool.release(job_workdir)
+        return result
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(job, tests))
+
 
 def main():
     """ This function will help us to run PS/PXC QA scripts.
@@ -23,6 +88,10 @@ def main():
                         choices=['sysbench_run', 'loadtest', 'replication', 'correctness', 'ssl', 'upgrade',
                                  'random_qa', 'galera'],
                         help='Specify suite name', nargs='*')
+    parser.add_argument('-j', '--jobs', default=1, type=int,
+                        help='Number of suite test files to run concurrently')
+    parser.add_argument('--cluster-pool', default=0, type=int,
+                        help='Number of warm clusters kept running for the suite test files')
     parser.add_argument('-e', '--encryption-run', action='store_true',
                         help='This option will enable encryption options')
     parser.add_argument('-d', '--debug', action='store_true',
@@ -48,30 +117,66 @@ def main():
         else:
             shutil.rmtree(WORKDIR + '/failed_logs', ignore_errors=True)
             os.mkdir(WORKDIR + '/failed_logs')
+    parallel_tests = []
+    serial_tests = []
     for i in suite:
         if i:
             if not os.path.exists(scriptdir + '/suite/' + i):
                 print('Suite ' + i + '(' + scriptdir + '/suite/' + i + ') does not exist')
                 exit(1)
-            print("Running " + i + " QA framework")
-            for file in os.listdir(scriptdir + '/suite/' + i):
+            for file in sorted(os.listdir(scriptdir + '/suite/' + i)):
                 if file.endswith(".py"):
-                    result = os.system(scriptdir + '/suite/' + i + '/' + file + ' ' + encryption + ' ' + debug)
-                    if result == 0:
-                        tc_output.write('Test run ' + f'{file:50}' + 'passed\n')
+                    if (args.jobs > 1 or args.cluster_pool > 0) and i not in SERIAL_SUITES and SERVER != 'md':
+                        parallel_tests.append((i, file))
                     else:
-                        tc_output.write('Test run ' + f'{file:50}' + 'failed\n')
-                        os.system('tar -czf ' + WORKDIR + '/failed_logs/' + i + '_' +
-                                  file + '.tar.gz ' + WORKDIR + '/log/*')
+                        serial_tests.append((i, file))
+
+    results = {}
+    pool = None
+    if args.cluster_pool > 0 and any(test[0] + '/' + test[1] in POOL_TESTS for test in parallel_tests):
+        # Clusters are booted and reset in the background while tests run
+        pool = cluster_pool.ClusterPool(scriptdir, BASEDIR, WORKDIR + '/cluster_pool', args.cluster_pool, NODE,
+                                        'YES' if args.encryption_run else 'NO', CLUSTER_POOL_MY_EXTRA,
+                                        'YES' if args.debug else 'NO')
+        pool.start()
+    if parallel_tests:
+        print("Running " + str(len(parallel_tests)) + " tests with " + str(args.jobs) + " parallel jobs")
+        for test, result in zip(parallel_tests, run_parallel(scriptdir, parallel_tests, args.jobs,
+                                                             encryption, debug, pool)):
+            results[test] = result
+    if pool is not None:
+        pool.shutdown()
+    running_suite = ''
+    for test in serial_tests:
+        i, file = test
+        if i != running_suite:
+            print("Running " + i + " QA framework")
+            running_suite = i
+        result = run_test(scriptdir, i, file, encryption, debug)
+        if result != 0:
+            save_failed_logs(i, file, WORKDIR + '/log/*')
+        results[test] = result
+
+    for i in suite:
+        for test in [test for test in parallel_tests + serial_tests if test[0] == i]:
+            file = test[1]
+            if results[test] == 0:
+                tc_output.write('Test run ' + f'{file:50}' + 'passed\n')
+            else:
+                tc_output.write('Test run ' + f'{file:50}' + 'failed\n')
 
     tc_output.close()
+    # Compare sysbench results of this build with the previous build
+    regression = perf_regression.check_regressions([test[1][:-3] for test in parallel_tests + serial_tests],
+                                                   BASEDIR, 'YES' if args.debug else 'NO')
     if test_name is not None:
         if not os.path.isfile(test_name):
             print(test_name + ' does not exist')
             exit(1)
         else:
             os.system(scriptdir + '/' + test_name + ' ' + encryption + ' ' + debug)
+    return regression
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
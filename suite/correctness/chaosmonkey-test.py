@@ -12,6 +12,7 @@ from util import galera_startup
 from util import db_connection
 from util import sysbench_run
 from util import utility
+from util import recovery_metrics
 
 # Read argument
 parser = argparse.ArgumentParser(prog='Galera chaosmonkey test', usage='%(prog)s [options]')
@@ -75,9 +76,10 @@ class ChaosMonkeyQA:
                 if debug == 'YES':
                     print(encrypt_table)
                 os.system(encrypt_table)
-        result = sysbench.sysbench_oltp_read_write(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
-                                                   SYSBENCH_NORMAL_TABLE_SIZE, SYSBENCH_RUN_TIME, 'Yes')
-        utility_cmd.check_testcase(result, "Initiated sysbench oltp run")
+        workload = sysbench.sysbench_oltp_read_write(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
+                                                     SYSBENCH_NORMAL_TABLE_SIZE, SYSBENCH_RUN_TIME, 'Yes')
+        utility_cmd.check_testcase(workload.startup_status(), "Initiated sysbench oltp run")
+        return workload
 
     def multi_recovery_test(self):
         """ This method will kill 2 random nodes from
@@ -86,9 +88,7 @@ class ChaosMonkeyQA:
         """
         nodes = [2, 3, 4, 5, 6]
         rand_nodes = random.choices(nodes, k=2)
-        self.sysbench_run(WORKDIR + '/node1/mysql.sock', 'test')
-        query = 'pidof sysbench'
-        sysbench_pid = os.popen(query).read().rstrip()
+        workload = self.sysbench_run(WORKDIR + '/node1/mysql.sock', 'test')
         for j in rand_nodes:
             query = 'cat `' + BASEDIR + \
                     '/bin/mysql  --user=root --socket=' + WORKDIR + \
@@ -100,21 +100,15 @@ class ChaosMonkeyQA:
             result = os.system('kill -9 ' + pid)
             utility_cmd.check_testcase(result, "Killed Cluster Node" + str(j) + " for ChaosMonkey QA")
 
-        kill_sysbench = "kill -9 " + sysbench_pid
-        if debug == 'YES':
-            print("Terminating sysbench run : " + kill_sysbench)
-        result = os.system(kill_sysbench)
-        utility_cmd.check_testcase(result, "Killed sysbench oltp run")
-        time.sleep(10)
+        workload.stop()
+        utility_cmd.check_testcase(0, "Stopped sysbench oltp run")
+        result = utility_cmd.wait_for_cluster_sync(WORKDIR)
+        utility_cmd.check_testcase(result, "Surviving cluster nodes are in sync")
 
+        recovery = recovery_metrics.RecoveryMetrics(BASEDIR, WORKDIR, debug)
         for j in rand_nodes:
-            query = 'bash ' + WORKDIR + \
-                    '/log/startup' + str(j) + '.sh'
-            if debug == 'YES':
-                print(query)
-            result = os.system(query)
-            utility_cmd.check_testcase(result, "Restarting Cluster Node" + str(j))
-            time.sleep(5)
+            result = recovery.restart(j, 'chaosmonkey', 300)
+            utility_cmd.check_testcase(result, "Restarted Cluster Node" + str(j) + " is synced")
 
 
 print("\nGalera ChaosMonkey Style test")
@@ -123,7 +117,5 @@ chaosmonkey_qa = ChaosMonkeyQA()
 chaosmonkey_qa.startup()
 chaosmonkey_qa.multi_recovery_test()
 version = utility_cmd.version_check(BASEDIR)
-time.sleep(10)
-result = utility_cmd.check_table_count(BASEDIR, 'test', WORKDIR + '/node1/mysql.sock',
-                                       WORKDIR + '/node2/mysql.sock')
+result = utility_cmd.check_cluster_consistency(BASEDIR, WORKDIR, node, 'test')
 utility_cmd.check_testcase(result, "Checksum run for DB: test")
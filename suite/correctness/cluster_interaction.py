@@ -3,7 +3,6 @@ import os
 import sys
 import argparse
 import time
-import subprocess
 cwd = os.path.dirname(os.path.realpath(__file__))
 parent_dir = os.path.normpath(os.path.join(cwd, '../../'))
 sys.path.insert(0, parent_dir)
@@ -12,6 +11,7 @@ from util import galera_startup
 from util import db_connection
 from util import sysbench_run
 from util import utility
+from util import node_readiness
 
 
 # Read argument
@@ -98,23 +98,18 @@ class ClusterInteraction:
                 os.system(encrypt_table)
 
         if background_run == "Yes":
-            result = sysbench.sysbench_oltp_read_write(db, SYSBENCH_TABLE_COUNT, SYSBENCH_TABLE_COUNT,
-                                                   SYSBENCH_NORMAL_TABLE_SIZE, SYSBENCH_RUN_TIME, background_run)
-            utility_cmd.check_testcase(result, "Initiated sysbench oltp run")
+            workload = sysbench.sysbench_oltp_read_write(db, SYSBENCH_TABLE_COUNT, SYSBENCH_TABLE_COUNT,
+                                                         SYSBENCH_NORMAL_TABLE_SIZE, SYSBENCH_RUN_TIME, background_run)
+            utility_cmd.check_testcase(workload.startup_status(), "Initiated sysbench oltp run")
+            return workload
 
-    def startup_check(self, cluster_node):
+    def startup_check(self, cluster_node, waiter):
         """ This method will check the node
-            startup status.
+            startup status. waiter is the node_readiness
+            restart_waiter created before the node was started.
         """
-        ping_query = self.basedir + '/bin/mysqladmin --user=root --socket=' + \
-            WORKDIR + '/node' + cluster_node + '/mysql.sock ping > /dev/null 2>&1'
-        for startup_timer in range(120):
-            time.sleep(1)
-            ping_check = subprocess.call(ping_query, shell=True, stderr=subprocess.DEVNULL)
-            ping_status = ("{}".format(ping_check))
-            if int(ping_status) == 0:
-                utility_cmd.check_testcase(int(ping_status), "Cluster restart is successful")
-                break  # break the loop if mysqld is running
+        result = waiter.wait('synced', 120)
+        utility_cmd.check_testcase(result, "Cluster restart is successful")
 
     def cluster_interaction_qa(self):
         """ This method will help us to test cluster
@@ -123,9 +118,7 @@ class ClusterInteraction:
             2) IST
             3) Node joining
         """
-        self.sysbench_run(self.socket, 'test', 'background_run')
-        query = 'pidof sysbench'
-        sysbench_pid = os.popen(query).read().rstrip()
+        workload = self.sysbench_run(self.socket, 'test', 'background_run')
         utility_cmd.check_testcase(0, "Initiating flow control test")
         for j in range(1, int(self.node) + 1):
             query = self.basedir + \
@@ -154,21 +147,14 @@ class ClusterInteraction:
         result = os.system(shutdown_node)
         utility_cmd.check_testcase(result, "Shutdown cluster node IST test")
         time.sleep(15)
-        kill_sysbench = "kill -9 " + sysbench_pid + " > /dev/null 2>&1"
-        if debug == 'YES':
-            print("Terminating sysbench run : " + kill_sysbench)
-        os.system(kill_sysbench)
+        workload.stop()
         ist_startup = "bash " + self.workdir + \
             '/log/startup' + str(self.node) + '.sh'
         if debug == 'YES':
             print(ist_startup)
+        waiter = node_readiness.restart_waiter(self.workdir, self.node, debug)
         os.system(ist_startup)
-        self.startup_check(self.node)
-
-        kill_sysbench = "kill -9 " + sysbench_pid + " > /dev/null 2>&1"
-        if debug == 'YES':
-            print("Terminating sysbench run : " + kill_sysbench)
-        os.system(kill_sysbench)
+        self.startup_check(self.node, waiter)
 
         utility_cmd.check_testcase(0, "Initiating Node joining test")
         self.sysbench_run(self.socket, 'test_one')
@@ -184,7 +170,5 @@ print('Cluster interaction QA using flow control test')
 print('----------------------------------------------')
 cluster_interaction.start_galera()
 cluster_interaction.cluster_interaction_qa()
-time.sleep(5)
-result = utility_cmd.check_table_count(BASEDIR, 'test', WORKDIR + '/node1/mysql.sock',
-                                       WORKDIR + '/node2/mysql.sock')
+result = utility_cmd.check_cluster_consistency(BASEDIR, WORKDIR, NODE, 'test')
 utility_cmd.check_testcase(result, "Checksum run for DB: test")
@@ -2,7 +2,6 @@
 import os
 import sys
 import argparse
-import time
 cwd = os.path.dirname(os.path.realpath(__file__))
 parent_dir = os.path.normpath(os.path.join(cwd, '../../'))
 sys.path.insert(0, parent_dir)
@@ -93,7 +92,7 @@ class ConsistencyCheck:
     def data_load(self, db, socket):
         # Random dataload for consistency test
         if os.path.isfile(parent_dir + '/util/createsql.py'):
-            generate_sql = createsql.GenerateSQL('/tmp/dataload.sql', 1000)
+            generate_sql = createsql.GenerateSQL(WORKDIR + '/dataload.sql', 1000, 'tsv')
             generate_sql.OutFile()
             generate_sql.CreateTable()
             sys.stdout = sys.__stdout__
@@ -104,11 +103,7 @@ class ConsistencyCheck:
                 print(create_db)
             result = os.system(create_db)
             utility_cmd.check_testcase(result, "Sample DB creation")
-            data_load_query = self.basedir + "/bin/mysql --user=root --socket=" + \
-                socket + ' ' + db + ' -f <  /tmp/dataload.sql >/dev/null 2>&1'
-            if debug == 'YES':
-                print(data_load_query)
-            result = os.system(data_load_query)
+            result = generate_sql.LoadData(self.basedir, socket, db, debug)
             utility_cmd.check_testcase(result, "Sample data load")
 
 
@@ -120,10 +115,7 @@ consistency_run.start_galera()
 consistency_run.sysbench_run(WORKDIR + '/node1/mysql.sock', 'test')
 consistency_run.data_load('mdg_dataload_db', WORKDIR + '/node1/mysql.sock')
 rqg_dataload.galera_dataload(WORKDIR + '/node1/mysql.sock')
-time.sleep(5)
-result = utility_cmd.check_table_count(BASEDIR, 'test', WORKDIR + '/node1/mysql.sock',
-                                       WORKDIR + '/node2/mysql.sock')
+result = utility_cmd.check_cluster_consistency(BASEDIR, WORKDIR, NODE, 'test')
 utility_cmd.check_testcase(result, "Checksum run for DB: test")
-result = utility_cmd.check_table_count(BASEDIR, 'mdg_dataload_db', WORKDIR + '/node1/mysql.sock',
-                                       WORKDIR + '/node2/mysql.sock')
+result = utility_cmd.check_cluster_consistency(BASEDIR, WORKDIR, NODE, 'mdg_dataload_db')
 utility_cmd.check_testcase(result, "Checksum run for DB: mdg_dataload_db")
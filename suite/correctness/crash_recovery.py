@@ -2,8 +2,6 @@
 import os
 import sys
 import argparse
-import time
-import subprocess
 cwd = os.path.dirname(os.path.realpath(__file__))
 parent_dir = os.path.normpath(os.path.join(cwd, '../../'))
 sys.path.insert(0, parent_dir)
@@ -13,6 +11,8 @@ from util import db_connection
 from util import sysbench_run
 from util import utility
 from util import table_checksum
+from util import recovery_metrics
+from util import wsrep_sync
 
 
 # Read argument
@@ -89,35 +89,28 @@ class CrashRecovery:
                 if debug == 'YES':
                     print(encrypt_table)
                 os.system(encrypt_table)
-        result = sysbench.sysbench_oltp_read_write(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
-                                                   SYSBENCH_NORMAL_TABLE_SIZE, SYSBENCH_RUN_TIME, 'Yes')
-        utility_cmd.check_testcase(result, "Initiated sysbench oltp run")
+        workload = sysbench.sysbench_oltp_read_write(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
+                                                     SYSBENCH_NORMAL_TABLE_SIZE, SYSBENCH_RUN_TIME, 'Yes')
+        utility_cmd.check_testcase(workload.startup_status(), "Initiated sysbench oltp run")
+        return workload
 
-    def startup_check(self, cluster_node):
+    def startup_check(self, cluster_node, scenario):
         """ This method will check the node recovery
-            startup status.
+            startup status and record the recovery time.
         """
-        recovery_startup = "bash " + self.workdir + \
-                           '/log/startup' + str(cluster_node) + '.sh'
-        if debug == 'YES':
-            print(recovery_startup)
-        os.system(recovery_startup)
-        ping_query = self.basedir + '/bin/mysqladmin --user=root --socket=' + \
-                     WORKDIR + '/node' + cluster_node + '/mysql.sock ping > /dev/null 2>&1'
-        for startup_timer in range(120):
-            time.sleep(1)
-            ping_check = subprocess.call(ping_query, shell=True, stderr=subprocess.DEVNULL)
-            ping_status = ("{}".format(ping_check))
-            if int(ping_status) == 0:
-                wsrep_status = ""
-                while wsrep_status != "Synced":
-                    status_query = self.basedir + '/bin/mysql --user=root --socket=' + \
-                        WORKDIR + '/node' + cluster_node + \
-                        '/mysql.sock -Bse"show status like ' \
-                        "'wsrep_local_state_comment'\"  2>&1 | awk \'{print $2}\'"
-                    wsrep_status = os.popen(status_query).read().rstrip()
-                utility_cmd.check_testcase(int(ping_status), "Cluster recovery is successful")
-                break  # break the loop if mysqld is running
+        recovery = recovery_metrics.RecoveryMetrics(self.basedir, self.workdir, debug)
+        result = recovery.restart(cluster_node, scenario, 120)
+        utility_cmd.check_testcase(result, "Cluster recovery is successful")
+
+    def wait_for_load(self):
+        # Wait until the other nodes have applied what the load committed on node1 so far
+        result = wsrep_sync.wait_for_apply(self.socket, wsrep_sync.cluster_sockets(WORKDIR), debug=debug)
+        utility_cmd.check_testcase(result, "Cluster nodes applied the sysbench load")
+
+    def wait_for_running_nodes(self):
+        # Wait until the nodes which are still up have applied the same write sets
+        result = utility_cmd.wait_for_cluster_sync(WORKDIR)
+        utility_cmd.check_testcase(result, "Running cluster nodes are in sync")
 
     def crash_recovery(self, test_name):
         """ This method will help us to test crash
@@ -128,9 +121,7 @@ class CrashRecovery:
             3) Abnormal restart (multiple restart)
                 while active data load in primary node
         """
-        self.sysbench_run(self.socket, 'test')
-        query = 'pidof sysbench'
-        sysbench_pid = os.popen(query).read().rstrip()
+        workload = self.sysbench_run(self.socket, 'test')
         pid_list = []
         if test_name == "with_force_kill":
             for j in range(1, int(self.node) + 1):
@@ -138,18 +129,15 @@ class CrashRecovery:
                         ' --user=root --socket=' + WORKDIR + \
                         '/node' + str(j) + '/mysql.sock -Bse"select @@pid_file"  2>&1`'
                 pid_list += [os.popen(query).read().rstrip()]
-            time.sleep(10)
+            self.wait_for_load()
             kill_mysqld = "kill -9 " + pid_list[int(self.node) - 1]
             if debug == 'YES':
                 print("Terminating mysqld : " + kill_mysqld)
             result = os.system(kill_mysqld)
             utility_cmd.check_testcase(result, "Killed cluster node for crash recovery")
-            time.sleep(5)
-            kill_sysbench = "kill -9 " + sysbench_pid
-            if debug == 'YES':
-                print("Terminating sysbench run : " + kill_sysbench)
-            os.system(kill_sysbench)
-            self.startup_check(self.node)
+            self.wait_for_running_nodes()
+            workload.stop()
+            self.startup_check(self.node, test_name)
         elif test_name == "single_restart":
             shutdown_node = self.basedir + '/bin/mysqladmin --user=root --socket=' + \
                             WORKDIR + '/node' + self.node + '/mysql.sock shutdown > /dev/null 2>&1'
@@ -157,12 +145,9 @@ class CrashRecovery:
                 print(shutdown_node)
             result = os.system(shutdown_node)
             utility_cmd.check_testcase(result, "Shutdown cluster node for crash recovery")
-            time.sleep(5)
-            kill_sysbench = "kill -9 " + sysbench_pid
-            if debug == 'YES':
-                print("Terminating sysbench run : " + kill_sysbench)
-            os.system(kill_sysbench)
-            self.startup_check(self.node)
+            self.wait_for_running_nodes()
+            workload.stop()
+            self.startup_check(self.node, test_name)
         elif test_name == "multi_restart":
             for j in range(1, 3):
                 shutdown_node = self.basedir + '/bin/mysqladmin --user=root --socket=' + \
@@ -171,25 +156,14 @@ class CrashRecovery:
                     print(shutdown_node)
                 result = os.system(shutdown_node)
                 utility_cmd.check_testcase(result, "Shutdown cluster node for crash recovery")
-                time.sleep(5)
-                self.startup_check(self.node)
-                query = 'pidof sysbench'
-                sysbench_pid = os.popen(query).read().rstrip()
-                time.sleep(5)
-                if not sysbench_pid:
-                    self.sysbench_run(self.socket, 'test')
-                    query = 'pidof sysbench'
-                    sysbench_pid = os.popen(query).read().rstrip()
-                    time.sleep(5)
-                    kill_sysbench = "kill -9 " + sysbench_pid
-                    if debug == 'YES':
-                        print("Terminating sysbench run : " + kill_sysbench)
-                    os.system(kill_sysbench)
-                else:
-                    kill_sysbench = "kill -9 " + sysbench_pid
-                    if debug == 'YES':
-                        print("Terminating sysbench run : " + kill_sysbench)
-                    os.system(kill_sysbench)
+                self.wait_for_running_nodes()
+                self.startup_check(self.node, test_name)
+                result = utility_cmd.wait_for_cluster_sync(WORKDIR)
+                utility_cmd.check_testcase(result, "Cluster nodes are in sync after restart")
+                if not workload.is_running():
+                    workload = self.sysbench_run(self.socket, 'test')
+                    self.wait_for_load()
+                workload.stop()
 
 
 crash_recovery_run = CrashRecovery(BASEDIR, WORKDIR, USER, WORKDIR + '/node1/mysql.sock', PT_BASEDIR, NODE)
@@ -200,24 +174,20 @@ print('Crash recovery QA using forceful mysqld termination')
 print('---------------------------------------------------')
 crash_recovery_run.start_galera()
 crash_recovery_run.crash_recovery('with_force_kill')
-result = utility_cmd.check_table_count(BASEDIR, 'test', WORKDIR + '/node1/mysql.sock',
-                                       WORKDIR + '/node2/mysql.sock')
+result = utility_cmd.check_cluster_consistency(BASEDIR, WORKDIR, NODE, 'test')
 utility_cmd.check_testcase(result, "Checksum run for DB: test")
 print('-------------------------------')
 print('Crash recovery QA using single restart')
 print('-------------------------------')
 crash_recovery_run.start_galera()
 crash_recovery_run.crash_recovery('single_restart')
-result = utility_cmd.check_table_count(BASEDIR, 'test', WORKDIR + '/node1/mysql.sock',
-                                       WORKDIR + '/node2/mysql.sock')
+result = utility_cmd.check_cluster_consistency(BASEDIR, WORKDIR, NODE, 'test')
 utility_cmd.check_testcase(result, "Checksum run for DB: test")
 print('----------------------------------------')
 print('Crash recovery QA using multiple restart')
 print('----------------------------------------')
 crash_recovery_run.start_galera()
 crash_recovery_run.crash_recovery('multi_restart')
-time.sleep(10)
-result = utility_cmd.check_table_count(BASEDIR, 'test', WORKDIR + '/node1/mysql.sock',
-                                       WORKDIR + '/node2/mysql.sock')
+result = utility_cmd.check_cluster_consistency(BASEDIR, WORKDIR, NODE, 'test')
 utility_cmd.check_testcase(result, "Checksum run for DB: test")
 
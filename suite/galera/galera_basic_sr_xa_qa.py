@@ -2,7 +2,6 @@
 import os
 import sys
 import argparse
-import itertools
 import time
 cwd = os.path.dirname(os.path.realpath(__file__))
 parent_dir = os.path.normpath(os.path.join(cwd, '../../'))
@@ -11,6 +10,7 @@ from config import *
 from util import sysbench_run
 from util import utility
 from util import table_checksum
+from util import combinations
 
 # Read argument
 parser = argparse.ArgumentParser(prog='Galera streaming replication XA test', usage='%(prog)s [options]')
@@ -55,11 +55,15 @@ class StreamingReplicationXA:
             print(create_procedure)
         result = os.system(create_procedure)
         utility_cmd.check_testcase(result, "Creating streaming replication XA data insert procedure")
-        wsrep_trx_fragment_unit = ['bytes', 'rows']
-        wsrep_trx_fragment_size = [1, 2, 4, 8, 16, 64, 128, 256, 512, 1024]
-        row_count = [100, 1000, 10000, 100000]
-        for trx_fragment_unit, trx_fragment_size, rows in \
-                itertools.product(wsrep_trx_fragment_unit, wsrep_trx_fragment_size, row_count):
+        sr_options = {
+            "wsrep_trx_fragment_unit": ['bytes', 'rows'],
+            "wsrep_trx_fragment_size": [1, 2, 4, 8, 16, 64, 128, 256, 512, 1024],
+            "row_count": [100, 1000, 10000, 100000]
+        }
+        for sr_option in combinations.plan(sr_options):
+            trx_fragment_unit = sr_option['wsrep_trx_fragment_unit']
+            trx_fragment_size = sr_option['wsrep_trx_fragment_size']
+            rows = sr_option['row_count']
             sr_procedure = BASEDIR + "/bin/mysql --user=root --socket=" + socket + \
                 ' -Bse"call ' + db + '.sr_xa_procedure(' + str(rows) + \
                 ",'" + trx_fragment_unit + "'," + str(trx_fragment_size) + ');" 2>&1'
@@ -2,7 +2,6 @@
 import os
 import sys
 import argparse
-import itertools
 cwd = os.path.dirname(os.path.realpath(__file__))
 parent_dir = os.path.normpath(os.path.join(cwd, '../../'))
 sys.path.insert(0, parent_dir)
@@ -12,6 +11,8 @@ from util import utility
 from util import table_checksum
 from util import db_connection
 from util import galera_startup
+from util import combinations
+from util import cnf_model
 
 # Read argument
 parser = argparse.ArgumentParser(prog='Galera thread pool test', usage='%(prog)s [options]')
@@ -39,7 +40,7 @@ class ThreadPooling:
         utility_cmd.start_galera(parent_dir, WORKDIR, BASEDIR, node,
                                  WORKDIR + '/node1/mysql.sock', USER, encryption, my_extra)
 
-    def sysbench_run(self, socket, db, port):
+    def sysbench_run(self, socket, db, port, my_extra):
         # Sysbench data load
         sysbench = sysbench_run.SysbenchRun(BASEDIR, WORKDIR, socket, debug)
         result = sysbench.sanity_check(db)
@@ -54,7 +55,8 @@ class ThreadPooling:
                 " --mysql-db=test --mysql-user=" + SYSBENCH_USER + \
                 " --mysql-password=" + SYSBENCH_PASS + \
                 " --db-driver=mysql --mysql-host=127.0.0.1 --mysql-port=" + str(port) + \
-                "  --time=300 --db-ps-mode=disable run > " + WORKDIR + "/log/sysbench_read_write.log"
+                "  --time=300 --db-ps-mode=disable" + sysbench_run.SYSBENCH_REPORT + \
+                " run > " + WORKDIR + "/log/sysbench_read_write.log"
         if debug == 'YES':
             print(query)
         query_status = os.system(query)
@@ -62,16 +64,18 @@ class ThreadPooling:
             print("ERROR!: sysbench read write run is failed")
             utility_cmd.check_testcase(result, "Sysbench read write run")
         utility_cmd.check_testcase(0, "Sysbench read write run")
+        # Keep the throughput of every thread pool configuration
+        sysbench.save_result('thread_pool_read_write', my_extra, 50, WORKDIR + "/log/sysbench_read_write.log")
 
     def thread_pooling_qa(self, socket, db):
         # Thread Pooling QA
-        thread_handling_option = ['pool-of-threads', 'one-thread-per-connection']
-        thread_pool_size = [2, 4, 8]
-        thread_pool_max_threads = [2, 4, 8]
-        for tp_option, tp_size, tp_max_thread in \
-                itertools.product(thread_handling_option, thread_pool_size, thread_pool_max_threads):
-            my_extra = "--thread_handling=" + tp_option + " --thread_pool_size=" + str(tp_size) + \
-                       " --thread_pool_max_threads=" + str(tp_max_thread)
+        thread_pool_options = {
+            "thread_handling": ['pool-of-threads', 'one-thread-per-connection'],
+            "thread_pool_size": [2, 4, 8],
+            "thread_pool_max_threads": [2, 4, 8]
+        }
+        for tp_combination in combinations.plan(thread_pool_options):
+            my_extra = " ".join("--" + option + "=" + str(value) for option, value in tp_combination.items())
             # Start Galera cluster for encryption test
             utility_cmd.check_testcase(0, "Thread pooling options : " + my_extra)
             dbconnection_check = db_connection.DbConnection(USER, WORKDIR + '/node1/mysql.sock')
@@ -83,16 +87,15 @@ class ThreadPooling:
             result = server_startup.initialize_cluster()
             utility_cmd.check_testcase(result, "Initializing cluster")
             for i in range(1, int(NODE) + 1):
-                n_name = open(WORKDIR + '/conf/node' + str(i) + '.cnf', 'a+')
-                n_name.write('admin_address=127.0.0.1\n')
-                n_name.write('admin_port=' + str(33062 + i) + '\n')
-                n_name.close()
+                node_cnf = cnf_model.CnfFile.load(WORKDIR + '/conf/node' + str(i) + '.cnf')
+                node_cnf.set('admin_address', '127.0.0.1').set('admin_port', str(33062 + i))
+                node_cnf.write(WORKDIR + '/conf/node' + str(i) + '.cnf')
 
             result = server_startup.start_cluster(my_extra)
             utility_cmd.check_testcase(result, "Cluster startup")
             result = dbconnection_check.connection_check()
             utility_cmd.check_testcase(result, "Database connection")
-            self.sysbench_run(WORKDIR + '/node1/mysql.sock', 'test', 33063)
+            self.sysbench_run(WORKDIR + '/node1/mysql.sock', 'test', 33063, my_extra)
             utility_cmd.stop_galera(WORKDIR, BASEDIR, NODE)
 
 
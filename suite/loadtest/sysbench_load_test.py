@@ -2,7 +2,6 @@
 import os
 import sys
 import argparse
-import time
 cwd = os.path.dirname(os.path.realpath(__file__))
 parent_dir = os.path.normpath(os.path.join(cwd, '../../'))
 sys.path.insert(0, parent_dir)
@@ -53,8 +52,7 @@ class SysbenchLoadTest:
             utility_cmd.check_testcase(result, "Sysbench data cleanup (threads : " + str(thread) + ")")
             result = sysbench.sysbench_load(db, thread, thread, SYSBENCH_LOAD_TEST_TABLE_SIZE)
             utility_cmd.check_testcase(result, "Sysbench data load (threads : " + str(thread) + ")")
-            time.sleep(5)
-            result = utility_cmd.check_table_count(BASEDIR, db, socket, WORKDIR + '/node2/mysql.sock')
+            result = utility_cmd.check_cluster_consistency(BASEDIR, WORKDIR, NODE, db)
             utility_cmd.check_testcase(result, "Checksum run for DB: test")
 
 
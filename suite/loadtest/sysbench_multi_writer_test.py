@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+import os
+import sys
+import argparse
+cwd = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.normpath(os.path.join(cwd, '../../'))
+sys.path.insert(0, parent_dir)
+from config import *
+from util import sysbench_run
+from util import utility
+from util import cluster_workload
+
+# Read argument
+parser = argparse.ArgumentParser(prog='Galera sysbench multi writer test', usage='%(prog)s [options]')
+parser.add_argument('-e', '--encryption-run', action='store_true',
+                    help='This option will enable encryption options')
+parser.add_argument('-d', '--debug', action='store_true',
+                    help='This option will enable debug logging')
+parser.add_argument('--distribution', default='round-robin', choices=cluster_workload.DISTRIBUTIONS,
+                    help='How sysbench threads are spread over the cluster nodes')
+parser.add_argument('--weights', default=None,
+                    help='Comma separated thread weight of each node (weighted distribution)')
+parser.add_argument('--hot-node', default=1, type=int,
+                    help='Node which gets most of the threads (hot-node distribution)')
+args = parser.parse_args()
+if args.encryption_run is True:
+    encryption = 'YES'
+else:
+    encryption = 'NO'
+if args.debug is True:
+    debug = 'YES'
+else:
+    debug = 'NO'
+weights = None
+if args.weights:
+    weights = [float(weight) for weight in args.weights.split(',')]
+
+utility_cmd = utility.Utility(debug)
+utility_cmd.check_python_version()
+
+
+class SysbenchMultiWriterTest:
+    def start_server(self, socket, node):
+        my_extra = "--innodb_buffer_pool_size=8G --innodb_log_file_size=1G"
+        utility_cmd.start_galera(parent_dir, WORKDIR, BASEDIR, node, socket, USER, encryption, my_extra)
+
+    def sysbench_run(self, socket, db):
+        # Write load on all nodes at once, few tables so write sets conflict
+        threads = [16, 64, 256]
+        sysbench = sysbench_run.SysbenchRun(BASEDIR, WORKDIR, socket, debug)
+        result = sysbench.sanity_check(db)
+        utility_cmd.check_testcase(result, "Sysbench run sanity check")
+        result = sysbench.sysbench_load(db, 4, 4, SYSBENCH_NORMAL_TABLE_SIZE)
+        utility_cmd.check_testcase(result, "Sysbench data load")
+        workload = cluster_workload.ClusterWorkload(BASEDIR, WORKDIR, NODE, debug)
+        for thread in threads:
+            result, report = workload.run("oltp_write_only.lua", 'oltp_write_only', db, 4, thread,
+                                          SYSBENCH_NORMAL_TABLE_SIZE, SYSBENCH_RUN_TIME,
+                                          args.distribution, weights, args.hot_node)
+            utility_cmd.check_testcase(result, "Sysbench multi writer run (" + args.distribution +
+                                       ", threads : " + str(thread) + ")")
+            result = utility_cmd.check_cluster_consistency(BASEDIR, WORKDIR, NODE, db)
+            utility_cmd.check_testcase(result, "Checksum run for DB: " + db)
+
+
+print("-----------------------------------")
+print("\nGalera sysbench multi writer test")
+print("-----------------------------------")
+sysbench_loadtest = SysbenchMultiWriterTest()
+if SERVER == "mdg":
+    sysbench_loadtest.start_server(WORKDIR + '/node1/mysql.sock', NODE)
+    sysbench_loadtest.sysbench_run(WORKDIR + '/node1/mysql.sock', 'test')
+    utility_cmd.stop_galera(WORKDIR, BASEDIR, NODE)
+elif SERVER == "md":
+    print("Multi writer test needs a Galera cluster, skipping")
@@ -1,6 +1,5 @@
 #!/usr/bin/env python3
 import os
-import time
 import sys
 import argparse
 cwd = os.path.dirname(os.path.realpath(__file__))
@@ -58,8 +57,7 @@ class SysbenchRandomLoadTest:
             for thread in threads:
                 sysbench.sysbench_oltp_read_write(db, table_count, thread,
                                                   SYSBENCH_RANDOM_LOAD_TABLE_SIZE, SYSBENCH_RANDOM_LOAD_RUN_TIME)
-                time.sleep(5)
-                result = utility_cmd.check_table_count(BASEDIR, db, socket, WORKDIR + '/node2/mysql.sock')
+                result = utility_cmd.check_cluster_consistency(BASEDIR, WORKDIR, NODE, db)
                 utility_cmd.check_testcase(result, "Checksum run for DB: " + db)
 
 
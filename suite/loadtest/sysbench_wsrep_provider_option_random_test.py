@@ -2,7 +2,6 @@
 import os
 import sys
 import argparse
-import itertools
 import time
 import subprocess
 from datetime import datetime
@@ -14,6 +13,8 @@ from util import sysbench_run
 from util import utility
 from util import db_connection
 from util import galera_startup
+from util import recovery_metrics
+from util import combinations
 
 
 # Read argument
@@ -39,20 +40,12 @@ utility_cmd.check_python_version()
 class WSREPProviderRandomTest:
     def startup_check(self, cluster_node):
         """ This method will check the node recovery
-            startup status.
+            startup status and record the recovery time
+            for the current gcache configuration.
         """
-        restart_server = "bash " + WORKDIR + \
-            '/log/startup' + str(cluster_node) + '.sh'
-        os.system(restart_server)
-        ping_query = BASEDIR + '/bin/mysqladmin --user=root --socket=' + \
-            WORKDIR + '/node' + str(cluster_node) + '/mysql.sock ping > /dev/null 2>&1'
-        for startup_timer in range(120):
-            time.sleep(1)
-            ping_check = subprocess.call(ping_query, shell=True, stderr=subprocess.DEVNULL)
-            ping_status = ("{}".format(ping_check))
-            if int(ping_status) == 0:
-                utility_cmd.check_testcase(int(ping_status), "Cluster node restart is successful")
-                break  # break the loop if mysqld is running
+        recovery = recovery_metrics.RecoveryMetrics(BASEDIR, WORKDIR, debug)
+        result = recovery.restart(cluster_node, 'wsrep_provider_random', 120)
+        utility_cmd.check_testcase(result, "Cluster node restart is successful")
 
     def start_random_test(self, socket, db):
         my_extra = "--innodb_buffer_pool_size=8G --innodb_log_file_size=1G"
@@ -88,9 +81,8 @@ class WSREPProviderRandomTest:
             #"repl.commit_order": [0, 1, 2, 3]
         }
 
-        keys = wsrep_provider_options.keys()
-        values = (wsrep_provider_options[key] for key in keys)
-        wsrep_combinations = [dict(zip(keys, combination)) for combination in itertools.product(*values)]
+        # Pairwise (combination_strength) covering array of the provider options
+        wsrep_combinations = combinations.plan(wsrep_provider_options)
         wsrep_provider_option = ''
         for wsrep_combination in range(0, len(wsrep_combinations)):
             for wsrep_option, wsrep_value in wsrep_combinations[wsrep_combination].items():
@@ -109,11 +101,9 @@ class WSREPProviderRandomTest:
             utility_cmd.check_testcase(result, "Cluster startup")
             result = dbconnection_check.connection_check()
             utility_cmd.check_testcase(result, "Database connection check")
-            result = sysbench.sysbench_oltp_read_write(db, 64, 64,
-                                                       SYSBENCH_LOAD_TEST_TABLE_SIZE, 300, 'Yes')
-            utility_cmd.check_testcase(result, "Sysbench oltp run initiated")
-            query = 'pidof sysbench'
-            sysbench_pid = os.popen(query).read().rstrip()
+            workload = sysbench.sysbench_oltp_read_write(db, 64, 64,
+                                                         SYSBENCH_LOAD_TEST_TABLE_SIZE, 300, 'Yes')
+            utility_cmd.check_testcase(workload.startup_status(), "Sysbench oltp run initiated")
             time.sleep(100)
             shutdown_node = BASEDIR + '/bin/mysqladmin --user=root --socket=' + \
                             WORKDIR + '/node3/mysql.sock shutdown > /dev/null 2>&1'
@@ -122,15 +112,11 @@ class WSREPProviderRandomTest:
             result = os.system(shutdown_node)
             utility_cmd.check_testcase(result, "Shutdown cluster node for IST/SST check")
             time.sleep(5)
-            kill_sysbench = "kill -9 " + sysbench_pid
-            if debug == 'YES':
-                print("Terminating sysbench run : " + kill_sysbench)
-            os.system(kill_sysbench)
+            workload.stop()
             self.startup_check(3)
 
             wsrep_provider_option = ''
-            time.sleep(5)
-            result = utility_cmd.check_table_count(BASEDIR, db, socket, WORKDIR + '/node2/mysql.sock')
+            result = utility_cmd.check_cluster_consistency(BASEDIR, WORKDIR, NODE, db)
             utility_cmd.check_testcase(result, "Checksum run for DB: test")
             utility_cmd.stop_galera(WORKDIR, BASEDIR, NODE)
 
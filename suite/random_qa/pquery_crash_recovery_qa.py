@@ -2,8 +2,6 @@
 import os
 import sys
 import argparse
-import time
-import subprocess
 import itertools
 cwd = os.path.dirname(os.path.realpath(__file__))
 parent_dir = os.path.normpath(os.path.join(cwd, '../../'))
@@ -12,6 +10,7 @@ from config import *
 from util import galera_startup
 from util import db_connection
 from util import utility
+from util import node_readiness
 
 # Read argument
 parser = argparse.ArgumentParser(prog='Galera random mysqld option test', usage='%(prog)s [options]')
@@ -66,19 +65,13 @@ class RandomPQueryQA:
             print("ERROR!: Could not create test database.")
             exit(1)
 
-    def startup_check(self, cluster_node):
+    def startup_check(self, cluster_node, waiter):
         """ This method will check the node
-            startup status.
+            startup status. waiter is the node_readiness
+            restart_waiter created before the node was started.
         """
-        ping_query = BASEDIR + '/bin/mysqladmin --user=root --socket=' + \
-                     WORKDIR + '/node' + str(cluster_node) + '/mysql.sock ping > /dev/null 2>&1'
-        for startup_timer in range(120):
-            time.sleep(1)
-            ping_check = subprocess.call(ping_query, shell=True, stderr=subprocess.DEVNULL)
-            ping_status = ("{}".format(ping_check))
-            if int(ping_status) == 0:
-                utility_cmd.check_testcase(int(ping_status), "Cluster restart is successful")
-                break  # break the loop if mysqld is running
+        result = waiter.wait('synced', 120)
+        utility_cmd.check_testcase(result, "Cluster restart is successful")
 
     def data_load(self, socket, db):
         # pquery crash recovery qa
@@ -107,8 +100,9 @@ class RandomPQueryQA:
                           '/log/startup' + str(j) + '.sh'
                 if debug == 'YES':
                     print(startup)
+                waiter = node_readiness.restart_waiter(WORKDIR, j, debug)
                 os.system(startup)
-                self.startup_check(j)
+                self.startup_check(j, waiter)
 
 
 print("-----------------------")
@@ -7,9 +7,8 @@ cwd = os.path.dirname(os.path.realpath(__file__))
 parent_dir = os.path.normpath(os.path.join(cwd, '../../'))
 sys.path.insert(0, parent_dir)
 from config import *
-from util import galera_startup
-from util import db_connection
 from util import utility
+from util import cluster_matrix
 
 # Read argument
 parser = argparse.ArgumentParser(prog='Galera random mysqld option test', usage='%(prog)s [options]')
@@ -17,6 +16,8 @@ parser.add_argument('-e', '--encryption-run', action='store_true',
                     help='This option will enable encryption options')
 parser.add_argument('-d', '--debug', action='store_true',
                     help='This option will enable debug logging')
+parser.add_argument('-c', '--clusters', default=int(PQUERY_CLUSTERS), type=int,
+                    help='Number of clusters running pquery combinations at the same time')
 args = parser.parse_args()
 if args.encryption_run is True:
     encryption = 'YES'
@@ -35,55 +36,53 @@ utility_cmd.check_python_version()
 
 
 class RandomPQueryQA:
-    def start_galera(self):
-        # Start Galera cluster for pquery run
-        dbconnection_check = db_connection.DbConnection(USER, WORKDIR + '/node1/mysql.sock')
-        server_startup = galera_startup.StartCluster(parent_dir, WORKDIR, BASEDIR, int(NODE), debug)
-        result = server_startup.sanity_check()
-        utility_cmd.check_testcase(result, "Startup sanity check")
-        if encryption == 'YES':
-            result = server_startup.create_config('encryption')
-            utility_cmd.check_testcase(result, "Configuration file creation")
-        else:
-            result = server_startup.create_config('none')
-            utility_cmd.check_testcase(result, "Configuration file creation")
-        result = server_startup.initialize_cluster()
-        utility_cmd.check_testcase(result, "Initializing cluster")
-        result = server_startup.start_cluster('--max-connections=1500')
-        utility_cmd.check_testcase(result, "Cluster startup")
-        result = dbconnection_check.connection_check()
-        utility_cmd.check_testcase(result, "Database connection")
+    def pquery_run(self, combination, cluster_workdir, log_dir):
+        """ pquery run of one matrix combination on the
+            cluster in cluster_workdir
+        """
+        socket = cluster_workdir + '/node1/mysql.sock'
         query = BASEDIR + "/bin/mysql --user=root --socket=" + \
-            WORKDIR + "/node1/mysql.sock -e'drop database if exists test " \
-                          "; create database test ;' > /dev/null 2>&1"
+            socket + " -e'drop database if exists test " \
+                     "; create database test ;' > /dev/null 2>&1"
         if debug == 'YES':
             print(query)
         query_status = os.system(query)
         if int(query_status) != 0:
-            # return 1
             print("ERROR!: Could not create test database.")
-            exit(1)
-
-    def data_load(self, socket, db):
+            return 1
+        pquery_cmd = PQUERY_BIN + " --database=test --threads=" + str(combination['threads']) + \
+            " --logdir=" + log_dir + " --log-all-queries --log-failed-queries --user=root --socket=" + \
+            socket + " --seed " + str(combination['seed']) + " --tables " + str(combination['tables']) + " " + \
+            PQUERY_EXTRA + " --seconds 300  --sql-file " + \
+            PQUERY_GRAMMER_FILE + " --records " + str(combination['records']) + "> " + \
+            log_dir + "/pquery_run.log 2>&1"
+        if debug == 'YES':
+            print(pquery_cmd)
+        query_status = os.system(pquery_cmd)
+        if int(query_status) != 0:
+            print("ERROR!: PQUERY run is failed, see " + log_dir + "/pquery_run.log")
+            return 1
+        return 0
 
-        # pquery random load
+    def data_load(self, clusters):
+        """ pquery random load. Every combination runs on a fresh
+            cluster, clusters of them at the same time.
+        """
         threads = [16, 64, 512, 1024]
         tables = [16, 32, 64, 128]
         records = [100, 500, 1000]
         seeds = [100, 500, 1000]
-        for thread, table, record, seed in \
-                itertools.product(threads, tables, records, seeds):
-            self.start_galera()
-            pquery_cmd = PQUERY_BIN + " --database=" + db + " --threads=" + str(table) + " --logdir=" + \
-                WORKDIR + "/log --log-all-queries --log-failed-queries --user=root --socket=" + \
-                socket + " --seed " + str(seed) + " --tables " + str(table) + " " + \
-                PQUERY_EXTRA + " --seconds 300  --sql-file " + \
-                PQUERY_GRAMMER_FILE + " --records " + str(record) + "> " + \
-                WORKDIR + "/log/pquery_run.log"
-            utility_cmd.check_testcase(0, "PQUERY RUN command : " + pquery_cmd)
-            query_status = os.system(pquery_cmd)
-            if int(query_status) != 0:
-                utility_cmd.check_testcase(1, "ERROR!: PQUERY run is failed")
+        combinations = [{'threads': thread, 'tables': table, 'records': record, 'seed': seed}
+                        for thread, table, record, seed in itertools.product(threads, tables, records, seeds)]
+        matrix = cluster_matrix.ClusterMatrix(parent_dir, BASEDIR, WORKDIR + '/pquery_matrix', NODE,
+                                              clusters, debug)
+        utility_cmd.check_testcase(0, "PQUERY matrix: " + str(len(combinations)) + " combinations on " +
+                                   str(clusters) + " clusters")
+        wsrep_extra = 'encryption' if encryption == 'YES' else 'none'
+        summaries = matrix.run(combinations, self.pquery_run, wsrep_extra, '--max-connections=1500')
+        failed = [summary for summary in summaries if summary['status'] != 'passed']
+        utility_cmd.check_testcase(len(failed), "PQUERY matrix run (summary: " + WORKDIR +
+                                   "/pquery_matrix/summary.log)")
 
 
 print("-----------------------")
@@ -93,4 +92,4 @@ random_pquery_qa = RandomPQueryQA()
 if not os.path.isfile(PQUERY_BIN):
     print(PQUERY_BIN + ' does not exist')
     exit(1)
-random_pquery_qa.data_load(WORKDIR + '/node1/mysql.sock', 'test')
+random_pquery_qa.data_load(args.clusters)
@@ -131,7 +131,7 @@ class SetupReplication:
     def data_load(self, db, socket, node):
         # Random data load
         if os.path.isfile(parent_dir + '/util/createsql.py'):
-            generate_sql = createsql.GenerateSQL('/tmp/dataload.sql', 1000)
+            generate_sql = createsql.GenerateSQL(WORKDIR + '/dataload.sql', 1000, 'tsv')
             generate_sql.OutFile()
             generate_sql.CreateTable()
             sys.stdout = sys.__stdout__
@@ -142,11 +142,7 @@ class SetupReplication:
                 print(create_db)
             result = os.system(create_db)
             utility_cmd.check_testcase(result, node + ": Replication QA sample DB creation")
-            data_load_query = self.basedir + "/bin/mysql --user=root --socket=" + \
-                socket + ' ' + db + ' -f <  /tmp/dataload.sql >/dev/null 2>&1'
-            if debug == 'YES':
-                print(data_load_query)
-            result = os.system(data_load_query)
+            result = generate_sql.LoadData(self.basedir, socket, db, debug)
             utility_cmd.check_testcase(result, node + ": Replication QA sample data load")
         # Add prepared statement SQLs
         create_ps = self.basedir + "/bin/mysql --user=root --socket=" + \
@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 import os
 import sys
-import time
 import argparse
 cwd = os.path.dirname(os.path.realpath(__file__))
 parent_dir = os.path.normpath(os.path.join(cwd, '../../'))
@@ -146,7 +145,7 @@ class SetupReplication:
     def data_load(self, db, socket, node):
         # Random data load
         if os.path.isfile(parent_dir + '/util/createsql.py'):
-            generate_sql = createsql.GenerateSQL('/tmp/dataload.sql', 1000)
+            generate_sql = createsql.GenerateSQL(WORKDIR + '/dataload.sql', 1000, 'tsv')
             generate_sql.OutFile()
             generate_sql.CreateTable()
             sys.stdout = sys.__stdout__
@@ -157,11 +156,7 @@ class SetupReplication:
                 print(create_db)
             result = os.system(create_db)
             utility_cmd.check_testcase(result, node + ": Replication QA sample DB creation")
-            data_load_query = self.basedir + "/bin/mysql --user=root --socket=" + \
-                socket + ' ' + db + ' -f <  /tmp/dataload.sql >/dev/null 2>&1'
-            if debug == 'YES':
-                print(data_load_query)
-            result = os.system(data_load_query)
+            result = generate_sql.LoadData(self.basedir, socket, db, debug)
             utility_cmd.check_testcase(result, node + ": Replication QA sample data load")
         # Add prepared statement SQLs
         create_ps = self.basedir + "/bin/mysql --user=root --socket=" + \
@@ -208,7 +203,8 @@ class SetupReplication:
             else:
                 utility_cmd.replication_io_status(BASEDIR, slave_socket, slave, comment)
                 utility_cmd.replication_sql_status(BASEDIR, slave_socket, slave, comment)
-            time.sleep(5)
+            result = utility_cmd.wait_for_cluster_sync(WORKDIR)
+            utility_cmd.check_testcase(result, "Cluster nodes are in sync")
             utility_cmd.check_gtid_consistency(BASEDIR, WORKDIR + '/node1/mysql.sock', WORKDIR + '/node2/mysql.sock')
             #utility_cmd.check_testcase(result, "GTID binlog state between cluster nodes")
             utility_cmd.stop_galera(WORKDIR, BASEDIR, NODE)
@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 import os
 import sys
-import itertools
 import argparse
 cwd = os.path.dirname(os.path.realpath(__file__))
 parent_dir = os.path.normpath(os.path.join(cwd, '../../'))
@@ -14,6 +13,8 @@ from util import rqg_datagen
 from util import galera_startup
 from util import db_connection
 from util import createsql
+from util import combinations
+from util import cnf_model
 
 # Read argument
 parser = argparse.ArgumentParser(prog='Galera replication test', usage='%(prog)s [options]')
@@ -52,17 +53,22 @@ class EncryptionTest:
         # Create data insert procedure
         rqg_dataload = rqg_datagen.RQGDataGen(BASEDIR, WORKDIR, USER, debug)
 
-        encryption_tmp_ts = ['innodb_temp_tablespace_encrypt=ON', 'innodb_temp_tablespace_encrypt=OFF']
-        encryption_bin_log = ['binlog_encryption=ON', 'binlog_encryption=OFF']
-        encryption_default_tbl = ['default_table_encryption=ON', 'default_table_encryption=OFF']
-        encryption_redo_log = ['innodb_redo_log_encrypt=ON', 'innodb_redo_log_encrypt=OFF']
-        encryption_undo_log = ['innodb_undo_log_encrypt=ON', 'innodb_undo_log_encrypt=OFF']
-        encryption_sys_ts = ['innodb_sys_tablespace_encrypt=ON', 'innodb_sys_tablespace_encrypt=OFF']
+        encryption_options = {
+            "encryption_tmp_ts": ['innodb_temp_tablespace_encrypt=ON', 'innodb_temp_tablespace_encrypt=OFF'],
+            "encryption_bin_log": ['binlog_encryption=ON', 'binlog_encryption=OFF'],
+            "encryption_default_tbl": ['default_table_encryption=ON', 'default_table_encryption=OFF'],
+            "encryption_redo_log": ['innodb_redo_log_encrypt=ON', 'innodb_redo_log_encrypt=OFF'],
+            "encryption_undo_log": ['innodb_undo_log_encrypt=ON', 'innodb_undo_log_encrypt=OFF'],
+            "encryption_sys_ts": ['innodb_sys_tablespace_encrypt=ON', 'innodb_sys_tablespace_encrypt=OFF']
+        }
 
-        for encryption_tmp_ts_value, encryption_bin_log_value, encryption_default_tbl_value, \
-            encryption_redo_log_value, encryption_undo_log_value, encryption_sys_ts_value in \
-            itertools.product(encryption_tmp_ts, encryption_bin_log, encryption_default_tbl,
-                              encryption_redo_log, encryption_undo_log, encryption_sys_ts):
+        for encryption_option in combinations.plan(encryption_options):
+            encryption_tmp_ts_value = encryption_option['encryption_tmp_ts']
+            encryption_bin_log_value = encryption_option['encryption_bin_log']
+            encryption_default_tbl_value = encryption_option['encryption_default_tbl']
+            encryption_redo_log_value = encryption_option['encryption_redo_log']
+            encryption_undo_log_value = encryption_option['encryption_undo_log']
+            encryption_sys_ts_value = encryption_option['encryption_sys_ts']
             encryption_combination = encryption_tmp_ts_value + " " + encryption_bin_log_value + \
                                      " " + encryption_default_tbl_value + " " + encryption_redo_log_value + \
                                      " " + encryption_undo_log_value + " " + encryption_sys_ts_value
@@ -86,11 +92,11 @@ class EncryptionTest:
             cnf_name.write(encryption_sys_ts_value + '\n')
             cnf_name.close()
             for i in range(1, int(NODE) + 1):
-                os.system("sed -i 's#pxc_encrypt_cluster_traffic = OFF#pxc_encrypt_cluster_traffic = ON#g' " +
-                          WORKDIR + '/conf/node' + str(i) + '.cnf')
-                n_name = open(WORKDIR + '/conf/node' + str(i) + '.cnf', 'a+')
-                n_name.write('!include ' + WORKDIR + '/conf/random_encryption.cnf\n')
-                n_name.close()
+                node_cnf = cnf_model.CnfFile.load(WORKDIR + '/conf/node' + str(i) + '.cnf')
+                if node_cnf.get('pxc_encrypt_cluster_traffic') == 'OFF':
+                    node_cnf.set('pxc_encrypt_cluster_traffic', 'ON')
+                node_cnf.include(WORKDIR + '/conf/random_encryption.cnf')
+                node_cnf.write(WORKDIR + '/conf/node' + str(i) + '.cnf')
 
             if encryption_sys_ts_value == "innodb_sys_tablespace_encrypt=ON":
                 init_extra = "--innodb_sys_tablespace_encrypt=ON " \
@@ -117,15 +123,11 @@ class EncryptionTest:
             utility_cmd.check_testcase(result, "Creating prepared statements")
             # Random data load
             if os.path.isfile(parent_dir + '/util/createsql.py'):
-                generate_sql = createsql.GenerateSQL('/tmp/dataload.sql', 1000)
+                generate_sql = createsql.GenerateSQL(WORKDIR + '/dataload.sql', 1000, 'tsv')
                 generate_sql.OutFile()
                 generate_sql.CreateTable()
                 sys.stdout = sys.__stdout__
-                data_load_query = BASEDIR + "/bin/mysql --user=root --socket=" + \
-                    WORKDIR + '/node1/mysql.sock' + ' test -f <  /tmp/dataload.sql >/dev/null 2>&1'
-                if debug == 'YES':
-                    print(data_load_query)
-                result = os.system(data_load_query)
+                result = generate_sql.LoadData(BASEDIR, WORKDIR + '/node1/mysql.sock', 'test', debug)
                 utility_cmd.check_testcase(result, "Sample data load")
             utility_cmd.stop_galera(WORKDIR, BASEDIR, NODE)
 
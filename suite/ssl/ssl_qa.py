@@ -90,7 +90,7 @@ class SSLCheck:
 
     def data_load(self, db, node1_socket):
         if os.path.isfile(parent_dir + '/util/createsql.py'):
-            generate_sql = createsql.GenerateSQL('/tmp/dataload.sql', 1000)
+            generate_sql = createsql.GenerateSQL(WORKDIR + '/dataload.sql', 1000, 'tsv')
             generate_sql.OutFile()
             generate_sql.CreateTable()
             sys.stdout = sys.__stdout__
@@ -101,11 +101,7 @@ class SSLCheck:
                 print(create_db)
             result = os.system(create_db)
             utility_cmd.check_testcase(result, "SSL QA sample DB creation")
-            data_load_query = self.basedir + "/bin/mysql --user=root --socket=" + \
-                node1_socket + ' ' + db + ' -f <  /tmp/dataload.sql >/dev/null 2>&1'
-            if debug == 'YES':
-                print(data_load_query)
-            result = os.system(data_load_query)
+            result = generate_sql.LoadData(self.basedir, node1_socket, db, debug)
             utility_cmd.check_testcase(result, "SSL QA sample data load")
 
 
@@ -127,9 +123,7 @@ if int(version) < int("080000"):
     checksum.sanity_check()
     checksum.data_consistency('test,mdg_dataload_db')
 else:
-    result = utility_cmd.check_table_count(BASEDIR, 'test', WORKDIR + '/node1/mysql.sock',
-                                           WORKDIR + '/node2/mysql.sock')
+    result = utility_cmd.check_cluster_consistency(BASEDIR, WORKDIR, NODE, 'test')
     utility_cmd.check_testcase(result, "Checksum run for DB: test")
-    result = utility_cmd.check_table_count(BASEDIR, 'mdg_dataload_db', WORKDIR + '/node1/mysql.sock',
-                                           WORKDIR + '/node2/mysql.sock')
+    result = utility_cmd.check_cluster_consistency(BASEDIR, WORKDIR, NODE, 'mdg_dataload_db')
     utility_cmd.check_testcase(result, "Checksum run for DB: mdg_dataload_db")
@@ -2,7 +2,6 @@
 import os
 import sys
 import argparse
-import time
 cwd = os.path.dirname(os.path.realpath(__file__))
 parent_dir = os.path.normpath(os.path.join(cwd, '../../'))
 sys.path.insert(0, parent_dir)
@@ -51,8 +50,7 @@ class SysbenchOLTPTest:
             result = sysbench.sanity_check(db)
             utility_cmd.check_testcase(result, "Sysbench run sanity check")
             sysbench.sysbench_custom_oltp_load(db, 5, thread, SYSBENCH_OLTP_TEST_TABLE_SIZE)
-            time.sleep(5)
-            result = utility_cmd.check_table_count(BASEDIR, db, socket, WORKDIR + '/node2/mysql.sock')
+            result = utility_cmd.check_cluster_consistency(BASEDIR, WORKDIR, NODE, db, 'merkle')
             utility_cmd.check_testcase(result, "Checksum run for DB: " + db)
 
 
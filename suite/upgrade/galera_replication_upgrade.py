@@ -2,7 +2,6 @@
 import os
 import sys
 import argparse
-import subprocess
 import time
 from datetime import datetime
 cwd = os.path.dirname(os.path.realpath(__file__))
@@ -13,8 +12,10 @@ from util import galera_startup
 from util import md_startup
 from util import db_connection
 from util import sysbench_run
+from util import sysbench_workload
 from util import utility
 from util import rqg_datagen
+from util import node_readiness
 
 # Read argument
 parser = argparse.ArgumentParser(prog='Galera upgrade test', usage='%(prog)s [options]')
@@ -99,41 +100,31 @@ class PXCUpgrade:
                                                   WORKDIR + '/node2/mysql.sock', debug)
         sysbench_node3 = sysbench_run.SysbenchRun(GALERA_LOWER_BASE, WORKDIR,
                                                   WORKDIR + '/node3/mysql.sock', debug)
-        if upgrade_type == 'readwrite':
-            result = sysbench_node1.sysbench_oltp_read_write(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
-                                                             SYSBENCH_NORMAL_TABLE_SIZE, 1000, 'Yes')
-            utility_cmd.check_testcase(result, "Initiated sysbench oltp run on node1")
-            result = sysbench_node2.sysbench_oltp_read_write(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
-                                              SYSBENCH_NORMAL_TABLE_SIZE, 1000, 'Yes')
-            utility_cmd.check_testcase(result, "Initiated sysbench oltp run on node2")
-            result = sysbench_node3.sysbench_oltp_read_write(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
-                                              SYSBENCH_NORMAL_TABLE_SIZE, 1000, 'Yes')
-            utility_cmd.check_testcase(result, "Initiated sysbench oltp run on node3")
-        elif upgrade_type == 'readonly':
-            result = sysbench_node1.sysbench_oltp_read_only(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
-                                              SYSBENCH_NORMAL_TABLE_SIZE, 1000, 'Yes')
-            utility_cmd.check_testcase(result, "Initiated sysbench readonly run on node1")
-            result = sysbench_node2.sysbench_oltp_read_only(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
-                                              SYSBENCH_NORMAL_TABLE_SIZE, 1000, 'Yes')
-            utility_cmd.check_testcase(result, "Initiated sysbench readonly run on node2")
-            result = sysbench_node3.sysbench_oltp_read_only(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
-                                              SYSBENCH_NORMAL_TABLE_SIZE, 1000, 'Yes')
-            utility_cmd.check_testcase(result, "Initiated sysbench readonly run on node3")
-
-    def startup_check(self, cluster_node):
+        # Background workloads, one per node in node order
+        workloads = []
+        for node, sysbench_node in enumerate([sysbench_node1, sysbench_node2, sysbench_node3], 1):
+            if upgrade_type == 'readwrite':
+                workload = sysbench_node.sysbench_oltp_read_write(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
+                                                                  SYSBENCH_NORMAL_TABLE_SIZE, 1000, 'Yes')
+                utility_cmd.check_testcase(workload.startup_status(),
+                                           "Initiated sysbench oltp run on node" + str(node))
+            elif upgrade_type == 'readonly':
+                workload = sysbench_node.sysbench_oltp_read_only(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
+                                                                 SYSBENCH_NORMAL_TABLE_SIZE, 1000, 'Yes')
+                utility_cmd.check_testcase(workload.startup_status(),
+                                           "Initiated sysbench readonly run on node" + str(node))
+            else:
+                continue
+            workloads.append(workload)
+        return workloads
+
+    def startup_check(self, cluster_node, waiter):
         """ This method will check the node
-            startup status.
+            startup status. waiter is the node_readiness
+            waiter created before the node was started.
         """
-        ping_query = GALERA_LOWER_BASE + '/bin/mysqladmin --user=root --socket=' + \
-            WORKDIR + '/node' + str(cluster_node) + \
-            '/mysql.sock ping > /dev/null 2>&1'
-        for startup_timer in range(120):
-            time.sleep(1)
-            ping_check = subprocess.call(ping_query, shell=True, stderr=subprocess.DEVNULL)
-            ping_status = ("{}".format(ping_check))
-            if int(ping_status) == 0:
-                utility_cmd.check_testcase(int(ping_status), "Node startup is successful")
-                break  # break the loop if mysqld is running
+        result = waiter.wait('synced', 120)
+        utility_cmd.check_testcase(result, "Node" + str(cluster_node) + " startup is successful")
 
     def rolling_upgrade(self, upgrade_type):
         """ This function will upgrade
@@ -141,16 +132,13 @@ class PXCUpgrade:
             latest version and perform
             table checksum.
         """
-        self.sysbench_run('/tmp/mdnode1.sock', 'sbtest', upgrade_type)
+        workloads = self.sysbench_run('/tmp/mdnode1.sock', 'sbtest', upgrade_type)
         time.sleep(10)
         for i in range(int(NODE), 0, -1):
-            query = "ps -ef | grep sysbench | grep -v gep | grep node" + \
-                                 str(i) + " | awk '{print $2}'"
-            sysbench_pid = os.popen(query).read().rstrip()
-            kill_sysbench = "kill -9 " + sysbench_pid + " > /dev/null 2>&1"
-            if debug == 'YES':
-                print("Terminating sysbench run : " + kill_sysbench)
-            os.system(kill_sysbench)
+            # The node1 workload runs on the MariaDB server socket, it is stopped with node1
+            if i <= len(workloads):
+                workloads[i - 1].stop()
+            sysbench_workload.stop_all(WORKDIR, WORKDIR + '/node' + str(i) + '/mysql.sock')
             shutdown_node = GALERA_LOWER_BASE + '/bin/mysqladmin --user=root --socket=' + \
                 WORKDIR + '/node' + str(i) + \
                 '/mysql.sock shutdown > /dev/null 2>&1'
@@ -168,8 +156,13 @@ class PXCUpgrade:
 
             if debug == 'YES':
                 print(startup_cmd)
+            # The upgraded node appends to its own error log
+            error_log = WORKDIR + '/log/upgrade_node' + str(i) + '.err'
+            waiter = node_readiness.NodeReadiness(WORKDIR + '/node' + str(i), WORKDIR + '/node' + str(i) +
+                                                  '/mysql.sock', error_log, debug,
+                                                  os.path.getsize(error_log) if os.path.isfile(error_log) else 0)
             os.system(startup_cmd)
-            self.startup_check(i)
+            self.startup_check(i, waiter)
             upgrade_cmd = GALERA_UPPER_BASE + '/bin/mysql_upgrade -uroot --socket=' + \
                 WORKDIR + '/node' + str(i) + \
                 '/mysql.sock --skip-write-binlog > ' + WORKDIR + '/log/node' + str(i) + '_upgrade.log 2>&1'
@@ -178,7 +171,8 @@ class PXCUpgrade:
             result = os.system(upgrade_cmd)
             utility_cmd.check_testcase(result, "Cluster node" + str(i) + " upgrade is successful")
 
-        time.sleep(10)
+        result = utility_cmd.wait_for_cluster_sync(WORKDIR)
+        utility_cmd.check_testcase(result, "Upgraded cluster nodes are in sync")
         utility_cmd.replication_io_status(BASEDIR, WORKDIR + '/node3/mysql.sock', 'Galera slave', 'none')
         utility_cmd.replication_sql_status(BASEDIR, WORKDIR + '/node3/mysql.sock', 'Galera slave', 'none')
         sysbench_node = sysbench_run.SysbenchRun(GALERA_LOWER_BASE, WORKDIR,
@@ -186,7 +180,6 @@ class PXCUpgrade:
         result = sysbench_node.sysbench_oltp_read_write('sbtest', SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
                                                         SYSBENCH_NORMAL_TABLE_SIZE, 100)
         utility_cmd.check_testcase(result, "Sysbench oltp run after upgrade")
-        time.sleep(15)
 
         result = utility_cmd.check_table_count(GALERA_UPPER_BASE, 'sbtest',
                                                WORKDIR + '/node1/mysql.sock',
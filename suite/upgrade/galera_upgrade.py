@@ -2,9 +2,7 @@
 import os
 import sys
 import argparse
-import subprocess
 import time
-import shutil
 from datetime import datetime
 cwd = os.path.dirname(os.path.realpath(__file__))
 parent_dir = os.path.normpath(os.path.join(cwd, '../../'))
@@ -13,8 +11,12 @@ from config import *
 from util import galera_startup
 from util import db_connection
 from util import sysbench_run
+from util import sysbench_workload
 from util import utility
+from util import cnf_model
+from util import port_allocator
 from util import rqg_datagen
+from util import node_readiness
 
 # Read argument
 parser = argparse.ArgumentParser(prog='Galera upgrade test', usage='%(prog)s [options]')
@@ -74,65 +76,26 @@ class GALERAUpgrade:
         result = dbconnection_check.connection_check()
         utility_cmd.check_testcase(result, "Database connection")
 
-    def startup_check(self, cluster_node):
+    def startup_check(self, cluster_node, waiter):
         """ This method will check the node
-            startup status.
+            startup status. waiter is the node_readiness
+            restart_waiter created before the node was started.
         """
-        ping_query = GALERA_LOWER_BASE + '/bin/mysqladmin --user=root --socket=' + \
-            WORKDIR + '/node' + str(cluster_node) + \
-            '/mysql.sock ping > /dev/null 2>&1'
-        for startup_timer in range(300):
-            time.sleep(1)
-            ping_check = subprocess.call(ping_query, shell=True, stderr=subprocess.DEVNULL)
-            ping_status = ("{}".format(ping_check))
-            if int(ping_status) == 0:
-                version = utility_cmd.version_check(GALERA_UPPER_BASE)
-                if int(version) > int("080000"):
-                    wsrep_status = ""
-                    while wsrep_status != "Synced":
-                        status_query = BASEDIR + '/bin/mysql --user=root --socket=' + \
-                            WORKDIR + '/node' + str(cluster_node) + \
-                            '/mysql.sock -Bse"show status like ' \
-                            "'wsrep_local_state_comment'\"  2>&1 | awk \'{print $2}\'"
-                        wsrep_status = os.popen(status_query).read().rstrip()
-                    utility_cmd.check_testcase(int(ping_status), "Node startup is successful"
-                                                                 "(Node status:" + wsrep_status + ")")
-                time.sleep(10)
-                break  # break the loop if mysqld is running
-            if startup_timer > 298:
-                utility_cmd.check_testcase(1, "STARTUP TIMEOUT ERROR! Node is not synced with cluster. "
-                                              "Check the error log to get more info")
-                exit(1)
+        if waiter.wait('synced', 300) != 0:
+            utility_cmd.check_testcase(1, "STARTUP TIMEOUT ERROR! Node" + str(cluster_node) + " is not synced with "
+                                          "cluster. Check the error log to get more info")
+        utility_cmd.check_testcase(0, "Node startup is successful(Node status:Synced)")
 
     def start_upper_version(self):
         # Start Galera cluster for upgrade test
-        shutil.copy(WORKDIR + '/conf/node3.cnf',
-                    WORKDIR + '/conf/node4.cnf')
         query = GALERA_LOWER_BASE + '/bin/mysql --user=root --socket=' + WORKDIR + \
             '/node3/mysql.sock -Bse"show variables like \'wsrep_cluster_address\';"' \
             ' 2>/dev/null | awk \'{print $2}\''
         wsrep_cluster_addr = os.popen(query).read().rstrip()
-        query = GALERA_LOWER_BASE + "/bin/mysql --user=root --socket=" + \
-            WORKDIR + '/node3/mysql.sock -Bse"select @@port" 2>&1'
-        port_no = os.popen(query).read().rstrip()
-        wsrep_port_no = int(port_no) + 108
-        port_no = int(port_no) + 100
-        os.system("sed -i 's#node3#node4#g' " + WORKDIR + '/conf/node4.cnf')
-        os.system("sed -i '/wsrep_sst_auth=root:/d' " + WORKDIR + '/conf/node4.cnf')
-        os.system("sed -i  '0,/^[ \\t]*wsrep_cluster_address[ \\t]*=.*$/s|" 
-                  "^[ \\t]*wsrep_cluster_address[ \\t]*=.*$|wsrep_cluster_address="
-                  + wsrep_cluster_addr + "127.0.0.1:" + str(wsrep_port_no) + "|' "
-                  + WORKDIR + '/conf/node4.cnf')
-        os.system("sed -i  '0,/^[ \\t]*port[ \\t]*=.*$/s|"
-                  "^[ \\t]*port[ \\t]*=.*$|port="
-                  + str(port_no) + "|' " + WORKDIR + '/conf/node4.cnf')
-        os.system('sed -i  "0,/^[ \\t]*wsrep_provider_options[ \\t]*=.*$/s|'
-                  "^[ \\t]*wsrep_provider_options[ \\t]*=.*$|wsrep_provider_options="
-                  "'gmcast.listen_addr=tcp://127.0.0.1:" + str(wsrep_port_no) + "'"
-                  '|" ' + WORKDIR + '/conf/node4.cnf')
-        os.system("sed -i  '0,/^[ \\t]*server_id[ \\t]*=.*$/s|"
-                  "^[ \\t]*server_id[ \\t]*=.*$|server_id="
-                  "14|' " + WORKDIR + '/conf/node4.cnf')
+        node4_ports = port_allocator.get_allocator(debug).lease(WORKDIR + '#node4', 1)
+        if node4_ports is None:
+            utility_cmd.check_testcase(1, "Port lease for node4")
+        cnf_model.write_joiner_config(WORKDIR, 'node3', 'node4', wsrep_cluster_addr, node4_ports[0])
         create_startup = 'sed  "s#' + GALERA_LOWER_BASE + '#' + GALERA_UPPER_BASE + \
                          '#g" ' + WORKDIR + '/log/startup3.sh > ' + \
                          WORKDIR + '/log/startup4.sh'
@@ -146,9 +109,10 @@ class GALERAUpgrade:
                           '/log/startup4.sh'
         if debug == 'YES':
             print(upgrade_startup)
+        waiter = node_readiness.restart_waiter(WORKDIR, 4, debug)
         result = os.system(upgrade_startup)
         utility_cmd.check_testcase(result, "Starting Galera cluster node4 for upgrade testing")
-        self.startup_check(4)
+        self.startup_check(4, waiter)
         upgrade_cmd = GALERA_UPPER_BASE + '/bin/mysql_upgrade -uroot --socket=' + \
             WORKDIR + '/node4/mysql.sock --skip-write-binlog > ' + \
             WORKDIR + '/log/node4_upgrade.log 2>&1'
@@ -171,25 +135,25 @@ class GALERAUpgrade:
         sysbench_node3 = sysbench_run.SysbenchRun(GALERA_LOWER_BASE, WORKDIR,
                                                   WORKDIR + '/node3/mysql.sock', debug)
         if upgrade_type == 'readwrite' or upgrade_type == 'readwrite_sst':
-            result = sysbench_node1.sysbench_oltp_read_write(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
+            workload = sysbench_node1.sysbench_oltp_read_write(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
                                                              SYSBENCH_NORMAL_TABLE_SIZE, 1000, 'Yes')
-            utility_cmd.check_testcase(result, "Initiated sysbench oltp run on node1")
-            result = sysbench_node2.sysbench_oltp_read_write(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
+            utility_cmd.check_testcase(workload.startup_status(), "Initiated sysbench oltp run on node1")
+            workload = sysbench_node2.sysbench_oltp_read_write(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
                                                              SYSBENCH_NORMAL_TABLE_SIZE, 1000, 'Yes')
-            utility_cmd.check_testcase(result, "Initiated sysbench oltp run on node2")
-            result = sysbench_node3.sysbench_oltp_read_write(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
+            utility_cmd.check_testcase(workload.startup_status(), "Initiated sysbench oltp run on node2")
+            workload = sysbench_node3.sysbench_oltp_read_write(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
                                                              SYSBENCH_NORMAL_TABLE_SIZE, 1000, 'Yes')
-            utility_cmd.check_testcase(result, "Initiated sysbench oltp run on node3")
+            utility_cmd.check_testcase(workload.startup_status(), "Initiated sysbench oltp run on node3")
         elif upgrade_type == 'readonly':
-            result = sysbench_node1.sysbench_oltp_read_only(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
+            workload = sysbench_node1.sysbench_oltp_read_only(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
                                                             SYSBENCH_NORMAL_TABLE_SIZE, 1000, 'Yes')
-            utility_cmd.check_testcase(result, "Initiated sysbench readonly run on node1")
-            result = sysbench_node2.sysbench_oltp_read_only(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
+            utility_cmd.check_testcase(workload.startup_status(), "Initiated sysbench readonly run on node1")
+            workload = sysbench_node2.sysbench_oltp_read_only(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
                                                             SYSBENCH_NORMAL_TABLE_SIZE, 1000, 'Yes')
-            utility_cmd.check_testcase(result, "Initiated sysbench readonly run on node2")
-            result = sysbench_node3.sysbench_oltp_read_only(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
+            utility_cmd.check_testcase(workload.startup_status(), "Initiated sysbench readonly run on node2")
+            workload = sysbench_node3.sysbench_oltp_read_only(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
                                                             SYSBENCH_NORMAL_TABLE_SIZE, 1000, 'Yes')
-            utility_cmd.check_testcase(result, "Initiated sysbench readonly run on node3")
+            utility_cmd.check_testcase(workload.startup_status(), "Initiated sysbench readonly run on node3")
 
     def rolling_upgrade(self, upgrade_type):
         """ This function will upgrade
@@ -200,13 +164,7 @@ class GALERAUpgrade:
         self.sysbench_run(WORKDIR + '/node1/mysql.sock', 'test', upgrade_type)
         time.sleep(5)
         for i in range(int(NODE), 0, -1):
-            query = "ps -ef | grep sysbench | grep -v gep | grep node" + \
-                                 str(i) + " | awk '{print $2}'"
-            sysbench_pid = os.popen(query).read().rstrip()
-            kill_sysbench = "kill -9 " + sysbench_pid + " > /dev/null 2>&1"
-            if debug == 'YES':
-                print("Terminating sysbench run : " + kill_sysbench)
-            os.system(kill_sysbench)
+            sysbench_workload.stop_all(WORKDIR, WORKDIR + '/node' + str(i) + '/mysql.sock')
             shutdown_node = GALERA_LOWER_BASE + '/bin/mysqladmin --user=root --socket=' + \
                 WORKDIR + '/node' + str(i) + \
                 '/mysql.sock shutdown > /dev/null 2>&1'
@@ -231,8 +189,9 @@ class GALERAUpgrade:
                                                           SYSBENCH_LOAD_TEST_TABLE_SIZE)
                     utility_cmd.check_testcase(result, "Sysbench data load(DB: test_three)")
 
-            os.system("sed -i '/basedir =/d' " + WORKDIR + '/conf/node' + str(i) + '.cnf')
-            os.system("sed -i '/wsrep-provider =/d' " + WORKDIR + '/conf/node' + str(i) + '.cnf')
+            # basedir and provider of the upper version are given on the command line
+            node_cnf = cnf_model.CnfFile.load(WORKDIR + '/conf/node' + str(i) + '.cnf')
+            node_cnf.remove('basedir').remove('wsrep-provider').write(WORKDIR + '/conf/node' + str(i) + '.cnf')
             startup_cmd = GALERA_UPPER_BASE + '/bin/mysqld --defaults-file=' + \
                 WORKDIR + '/conf/node' + str(i) + '.cnf --wsrep-provider=' + \
                 GALERA_UPPER_BASE + '/lib/libgalera_smm.so --datadir=' + \
@@ -242,8 +201,9 @@ class GALERAUpgrade:
 
             if debug == 'YES':
                 print(startup_cmd)
+            waiter = node_readiness.restart_waiter(WORKDIR, i, debug)
             os.system(startup_cmd)
-            self.startup_check(i)
+            self.startup_check(i, waiter)
             upgrade_cmd = GALERA_UPPER_BASE + '/bin/mysql_upgrade -uroot --socket=' + \
                 WORKDIR + '/node' + str(i) + \
                 '/mysql.sock --skip-write-binlog > ' + WORKDIR + '/log/node' + str(i) + '_upgrade.log 2>&1'
@@ -253,13 +213,13 @@ class GALERAUpgrade:
             print(result)
             utility_cmd.check_testcase(result, "Cluster node" + str(i) + " upgrade is successful")
 
-        time.sleep(10)
+        result = utility_cmd.wait_for_cluster_sync(WORKDIR)
+        utility_cmd.check_testcase(result, "Upgraded cluster nodes are in sync")
         sysbench_node = sysbench_run.SysbenchRun(GALERA_LOWER_BASE, WORKDIR,
                                                   WORKDIR + '/node1/mysql.sock', debug)
         result = sysbench_node.sysbench_oltp_read_write('test', SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
                                                 SYSBENCH_NORMAL_TABLE_SIZE, 100)
         utility_cmd.check_testcase(result, "Sysbench oltp run after upgrade")
-        time.sleep(5)
 
         result = utility_cmd.check_table_count(GALERA_UPPER_BASE, 'test',
                                                WORKDIR + '/node1/mysql.sock',
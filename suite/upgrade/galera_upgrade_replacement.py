@@ -2,9 +2,6 @@
 import os
 import sys
 import argparse
-import subprocess
-import time
-import shutil
 from datetime import datetime
 cwd = os.path.dirname(os.path.realpath(__file__))
 parent_dir = os.path.normpath(os.path.join(cwd, '../../'))
@@ -14,7 +11,10 @@ from util import galera_startup
 from util import db_connection
 from util import sysbench_run
 from util import utility
+from util import cnf_model
+from util import port_allocator
 from util import rqg_datagen
+from util import node_readiness
 
 # Read argument
 parser = argparse.ArgumentParser(prog='Galera upgrade test', usage='%(prog)s [options]')
@@ -65,72 +65,31 @@ class PXCUpgrade:
         result = dbconnection_check.connection_check()
         utility_cmd.check_testcase(result, "Database connection")
 
-    def startup_check(self, cluster_node):
+    def startup_check(self, cluster_node, waiter):
         """ This method will check the node
-            startup status.
+            startup status. waiter is the node_readiness
+            restart_waiter created before the node was started.
         """
-        # Check wsrep sync status
-        query_cluster_status = GALERA_LOWER_BASE + '/bin/mysql --user=root --socket=' + \
-            WORKDIR + '/node' + str(cluster_node) + \
-            '/mysql.sock -Bse"show status like \'wsrep_local_state_comment\';"' \
-            ' 2>/dev/null | awk \'{print $2}\''
-        # Get ping status
-        ping_query = GALERA_LOWER_BASE + '/bin/mysqladmin --user=root --socket=' + \
-            WORKDIR + '/node' + str(cluster_node) + \
-            '/mysql.sock ping > /dev/null 2>&1'
-        # check server live status - Timeout 300 sec
-        for startup_timer in range(300):
-            time.sleep(1)
-            ping_check = subprocess.call(ping_query, shell=True, stderr=subprocess.DEVNULL)
-            ping_status = ("{}".format(ping_check))
-            if int(ping_status) == 0:
-                wsrep_status = ""
-                while wsrep_status != "Synced":
-                    status_query = BASEDIR + '/bin/mysql --user=root --socket=' + \
-                        WORKDIR + '/node' + str(cluster_node) + \
-                        '/mysql.sock -Bse"show status like ' \
-                        "'wsrep_local_state_comment'\"  2>&1 | awk \'{print $2}\'"
-                    wsrep_status = os.popen(status_query).read().rstrip()
-                utility_cmd.check_testcase(int(ping_status), "Node startup is successful"
-                                           "(Node status:" + wsrep_status + ")")
-                break  # break the loop if mysqld is running
-            if startup_timer > 298:
-                utility_cmd.check_testcase(0, "ERROR! Node is not synced with cluster. "
-                                              "Check the error log to get more info")
-                exit(1)
+        # Timeout 300 sec
+        if waiter.wait('synced', 300) != 0:
+            utility_cmd.check_testcase(1, "ERROR! Node" + str(cluster_node) + " is not synced with cluster. "
+                                          "Check the error log to get more info")
+        utility_cmd.check_testcase(0, "Node startup is successful(Node status:Synced)")
 
     def start_upper_version(self):
         # Start Galera cluster for upgrade test
-        # Copy node3.cnf to node4.cnf
-        shutil.copy(WORKDIR + '/conf/node3.cnf',
-                    WORKDIR + '/conf/node4.cnf')
         # get cluster address
         query = GALERA_LOWER_BASE + '/bin/mysql --user=root --socket=' + WORKDIR + \
             '/node3/mysql.sock -Bse"show variables like \'wsrep_cluster_address\';"' \
             ' 2>/dev/null | awk \'{print $2}\''
         wsrep_cluster_addr = os.popen(query).read().rstrip()
         # get node3 port
-        query = GALERA_LOWER_BASE + "/bin/mysql --user=root --socket=" + \
-            WORKDIR + '/node3/mysql.sock -Bse"select @@port" 2>&1'
-        port_no = os.popen(query).read().rstrip()
-        wsrep_port_no = int(port_no) + 108      # node4 cluster connection port
-        port_no = int(port_no) + 100            # node4 port
-        # Update node4.cnf for startup
-        os.system("sed -i 's#node3#node4#g' " + WORKDIR + '/conf/node4.cnf')
-        os.system("sed -i  '0,/^[ \\t]*wsrep_cluster_address[ \\t]*=.*$/s|" 
-                  "^[ \\t]*wsrep_cluster_address[ \\t]*=.*$|wsrep_cluster_address="
-                  + wsrep_cluster_addr + "127.0.0.1:" + str(wsrep_port_no) + "|' "
-                  + WORKDIR + '/conf/node4.cnf')
-        os.system("sed -i  '0,/^[ \\t]*port[ \\t]*=.*$/s|"
-                  "^[ \\t]*port[ \\t]*=.*$|port="
-                  + str(port_no) + "|' " + WORKDIR + '/conf/node4.cnf')
-        os.system('sed -i  "0,/^[ \\t]*wsrep_provider_options[ \\t]*=.*$/s|'
-                  "^[ \\t]*wsrep_provider_options[ \\t]*=.*$|wsrep_provider_options="
-                  "'gmcast.listen_addr=tcp://127.0.0.1:" + str(wsrep_port_no) + "'"
-                  '|" ' + WORKDIR + '/conf/node4.cnf')
-        os.system("sed -i  '0,/^[ \\t]*server_id[ \\t]*=.*$/s|"
-                  "^[ \\t]*server_id[ \\t]*=.*$|server_id="
-                  "14|' " + WORKDIR + '/conf/node4.cnf')
+        node4_ports = port_allocator.get_allocator(debug).lease(WORKDIR + '#node4', 1)
+        if node4_ports is None:
+            utility_cmd.check_testcase(1, "Port lease for node4")
+        # Create node4.cnf from node3.cnf
+        cnf_model.write_joiner_config(WORKDIR, 'node3', 'node4', wsrep_cluster_addr, node4_ports[0],
+                                      drop_sst_auth=False)
         # Create startup script for node4
         create_startup = 'sed  "s#' + GALERA_LOWER_BASE + '#' + GALERA_UPPER_BASE + \
                          '#g" ' + WORKDIR + '/log/startup3.sh > ' + \
@@ -146,9 +105,10 @@ class PXCUpgrade:
                           '/log/startup4.sh'
         if debug == 'YES':
             print(upgrade_startup)
+        waiter = node_readiness.restart_waiter(WORKDIR, 4, debug)
         result = os.system(upgrade_startup)
         utility_cmd.check_testcase(result, "Starting Galera cluster node4 for upgrade testing")
-        self.startup_check(4)
+        self.startup_check(4, waiter)
 
         upgrade_cmd = GALERA_UPPER_BASE + '/bin/mysql_upgrade -uroot --socket=' + \
             WORKDIR + '/node4/mysql.sock --skip-write-binlog > ' + \
@@ -174,60 +134,39 @@ class PXCUpgrade:
                                                   WORKDIR + '/node3/mysql.sock', debug)
         # sysbench read/write run
         if upgrade_type == 'readwrite' or upgrade_type == 'readwrite_sst':
-            result = sysbench_node1.sysbench_oltp_read_write(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
+            workload = sysbench_node1.sysbench_oltp_read_write(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
                                                              SYSBENCH_NORMAL_TABLE_SIZE, 1000, 'Yes')
-            utility_cmd.check_testcase(result, "Initiated sysbench oltp run on node1")
-            result = sysbench_node2.sysbench_oltp_read_write(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
+            utility_cmd.check_testcase(workload.startup_status(), "Initiated sysbench oltp run on node1")
+            workload = sysbench_node2.sysbench_oltp_read_write(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
                                                              SYSBENCH_NORMAL_TABLE_SIZE, 1000, 'Yes')
-            utility_cmd.check_testcase(result, "Initiated sysbench oltp run on node2")
-            result = sysbench_node3.sysbench_oltp_read_write(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
+            utility_cmd.check_testcase(workload.startup_status(), "Initiated sysbench oltp run on node2")
+            workload = sysbench_node3.sysbench_oltp_read_write(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
                                                              SYSBENCH_NORMAL_TABLE_SIZE, 1000, 'Yes')
-            utility_cmd.check_testcase(result, "Initiated sysbench oltp run on node3")
+            utility_cmd.check_testcase(workload.startup_status(), "Initiated sysbench oltp run on node3")
         # sysbench readonly run
         elif upgrade_type == 'readonly':
-            result = sysbench_node1.sysbench_oltp_read_only(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
+            workload = sysbench_node1.sysbench_oltp_read_only(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
                                                             SYSBENCH_NORMAL_TABLE_SIZE, 1000, 'Yes')
-            utility_cmd.check_testcase(result, "Initiated sysbench readonly run on node1")
-            result = sysbench_node2.sysbench_oltp_read_only(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
+            utility_cmd.check_testcase(workload.startup_status(), "Initiated sysbench readonly run on node1")
+            workload = sysbench_node2.sysbench_oltp_read_only(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
                                                             SYSBENCH_NORMAL_TABLE_SIZE, 1000, 'Yes')
-            utility_cmd.check_testcase(result, "Initiated sysbench readonly run on node2")
-            result = sysbench_node3.sysbench_oltp_read_only(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
+            utility_cmd.check_testcase(workload.startup_status(), "Initiated sysbench readonly run on node2")
+            workload = sysbench_node3.sysbench_oltp_read_only(db, SYSBENCH_TABLE_COUNT, SYSBENCH_THREADS,
                                                             SYSBENCH_NORMAL_TABLE_SIZE, 1000, 'Yes')
-            utility_cmd.check_testcase(result, "Initiated sysbench readonly run on node3")
+            utility_cmd.check_testcase(workload.startup_status(), "Initiated sysbench readonly run on node3")
 
     def rolling_replacement(self):
         # Start Galera cluster for rolling replacement test
         for i in range(1, int(NODE) + 1):
-            shutil.copy(WORKDIR + '/conf/node' + str(int(i + 2)) + '.cnf',
-                        WORKDIR + '/conf/node' + str(int(i + 3)) + '.cnf')
             query = GALERA_LOWER_BASE + '/bin/mysql --user=root --socket=' + WORKDIR + \
                 '/node' + str(int(i + 2)) + '/mysql.sock -Bse"show variables like \'wsrep_cluster_address\';"' \
                 ' 2>/dev/null | awk \'{print $2}\''
             wsrep_cluster_addr = os.popen(query).read().rstrip()
-            query = GALERA_LOWER_BASE + "/bin/mysql --user=root --socket=" + \
-                WORKDIR + '/node' + str(int(i + 2)) + '/mysql.sock -Bse"select @@port" 2>&1'
-            port_no = os.popen(query).read().rstrip()
-            wsrep_port_no = int(port_no) + 108
-            port_no = int(port_no) + 100
-            os.system("sed -i 's#node" + str(int(i + 2)) +
-                      "#node" + str(int(i + 3)) + "#g' " +
-                      WORKDIR + '/conf/node' + str(int(i + 3)) + '.cnf')
-            os.system("sed -i '/wsrep_sst_auth=root:/d' " +
-                      WORKDIR + '/conf/node' + str(int(i + 3)) + '.cnf')
-            os.system("sed -i  '0,/^[ \\t]*wsrep_cluster_address[ \\t]*=.*$/s|"
-                      "^[ \\t]*wsrep_cluster_address[ \\t]*=.*$|wsrep_cluster_address="
-                      + wsrep_cluster_addr + "127.0.0.1:" + str(wsrep_port_no) + "|' "
-                      + WORKDIR + '/conf/node' + str(int(i + 3)) + '.cnf')
-            os.system("sed -i  '0,/^[ \\t]*port[ \\t]*=.*$/s|"
-                      "^[ \\t]*port[ \\t]*=.*$|port="
-                      + str(port_no) + "|' " + WORKDIR + '/conf/node' + str(int(i + 3)) + '.cnf')
-            os.system('sed -i  "0,/^[ \\t]*wsrep_provider_options[ \\t]*=.*$/s|'
-                      "^[ \\t]*wsrep_provider_options[ \\t]*=.*$|wsrep_provider_options="
-                      "'gmcast.listen_addr=tcp://127.0.0.1:" + str(wsrep_port_no) +
-                      "'|\" " + WORKDIR + '/conf/node' + str(int(i + 3)) + '.cnf')
-            os.system("sed -i  '0,/^[ \\t]*server_id[ \\t]*=.*$/s|"
-                      "^[ \\t]*server_id[ \\t]*=.*$|server_id="
-                      "14|' " + WORKDIR + '/conf/node' + str(int(i + 3)) + '.cnf')
+            new_node_ports = port_allocator.get_allocator(debug).lease(WORKDIR + '#node' + str(int(i + 3)), 1)
+            if new_node_ports is None:
+                utility_cmd.check_testcase(1, "Port lease for node" + str(int(i + 3)))
+            cnf_model.write_joiner_config(WORKDIR, 'node' + str(int(i + 2)), 'node' + str(int(i + 3)),
+                                          wsrep_cluster_addr, new_node_ports[0])
 
             create_startup = 'sed  "s#' + GALERA_LOWER_BASE + '#' + GALERA_UPPER_BASE + \
                 '#g" ' + WORKDIR + '/log/startup' + str(int(i + 2)) + '.sh > ' + \
@@ -258,13 +197,15 @@ class PXCUpgrade:
                                      "'wsrep_local_state_comment'\"  2>&1 | awk \'{print $2}\'"
             wsrep_status = os.popen(status_query).read().rstrip()
             print(wsrep_status)
-            time.sleep(10)
+            result = utility_cmd.wait_for_cluster_sync(WORKDIR)
+            utility_cmd.check_testcase(result, "Cluster nodes are in sync before node" + str(int(i + 3)) + " joins")
             if debug == 'YES':
                 print(upgrade_startup)
+            waiter = node_readiness.restart_waiter(WORKDIR, int(i + 3), debug)
             result = os.system(upgrade_startup)
             utility_cmd.check_testcase(result, "Starting Galera cluster node" +
                                        str(int(i + 3)) + " for upgrade testing")
-            self.startup_check(int(i + 3))
+            self.startup_check(int(i + 3), waiter)
 
             upgrade_cmd = GALERA_UPPER_BASE + '/bin/mysql_upgrade -uroot --socket=' + \
                 WORKDIR + '/node' + str(int(i + 3)) + \
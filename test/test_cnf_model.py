@@ -0,0 +1,65 @@
+import unittest
+from util import cnf_model
+from util import port_allocator
+
+node_cnf = """[mysqld]
+# Galera node
+basedir=/qa/base
+core-file
+wsrep-sst-method=mariabackup
+wsrep_sst_auth=root:
+wsrep_cluster_address=gcomm://127.0.0.1:10008,
+!include /qa/conf/custom.cnf
+[sst]
+encrypt=3
+"""
+
+
+class TestCnfModel(unittest.TestCase):
+
+    def test_render_round_trip(self):
+        self.assertEqual(cnf_model.CnfFile.parse(node_cnf).render(), node_cnf)
+
+    def test_parse(self):
+        cnf = cnf_model.CnfFile.parse(node_cnf)
+        self.assertEqual([section.name for section in cnf.sections], ['mysqld', 'sst'])
+        self.assertEqual(cnf.get('basedir'), '/qa/base')
+        self.assertIsNone(cnf.get('core-file'))
+        self.assertEqual(cnf.get('encrypt', 'sst'), '3')
+        self.assertIn(('!include', '/qa/conf/custom.cnf'), cnf.section('mysqld').entries)
+
+    def test_dash_and_underscore(self):
+        cnf = cnf_model.CnfFile.parse(node_cnf)
+        self.assertEqual(cnf.get('wsrep_sst_method'), 'mariabackup')
+        cnf.set('wsrep_sst_method', 'rsync')
+        self.assertIn('wsrep-sst-method=rsync\n', cnf.render())
+        cnf.remove('wsrep-sst-auth')
+        self.assertIsNone(cnf.get('wsrep_sst_auth'))
+
+    def test_set_keeps_place(self):
+        cnf = cnf_model.CnfFile.parse(node_cnf).set('basedir', '/qa/upper').set('port', '10000')
+        lines = cnf.render().split('\n')
+        self.assertEqual(lines[2], 'basedir=/qa/upper')
+        self.assertEqual(lines[8], 'port=10000')
+        self.assertEqual(lines[9], '[sst]')
+
+    def test_digest(self):
+        cnf = cnf_model.CnfFile.parse(node_cnf)
+        self.assertEqual(cnf.digest(), cnf.copy().digest())
+        self.assertNotEqual(cnf.digest(), cnf.copy().set('port', '10000').digest())
+
+    def test_joiner_config(self):
+        donor = cnf_model.CnfFile.parse(node_cnf.replace('/qa/base', '/qa/node3'))
+        cnf = cnf_model.joiner_config(donor, 'node3', 'node4', 'gcomm://127.0.0.1:10008,',
+                                      port_allocator.NodePorts(10300))
+        self.assertEqual(cnf.get('basedir'), '/qa/node4')
+        self.assertEqual(cnf.get('port'), '10300')
+        self.assertEqual(cnf.get('wsrep_cluster_address'), 'gcomm://127.0.0.1:10008,127.0.0.1:10308')
+        self.assertEqual(cnf.get('wsrep_sst_receive_address'), '127.0.0.1:10310')
+        self.assertIsNone(cnf.sections[0].index('wsrep_sst_auth'))
+        # The donor configuration is not changed
+        self.assertEqual(donor.get('basedir'), '/qa/node3')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import itertools
+import unittest
+from util import combinations
+
+options = {
+    'a': [1, 2, 3, 4],
+    'b': ['x', 'y', 'z', 'w', 'v'],
+    'c': ['on', 'off', 'auto'],
+    'd': [10, 20, 30, 40],
+}
+
+
+def covered(rows, keys):
+    # Value tuples of keys which appear in rows
+    return set(tuple(row[key] for key in keys) for row in rows)
+
+
+class TestCombinations(unittest.TestCase):
+
+    def test_full_product(self):
+        rows = combinations.full_product(options)
+        self.assertEqual(len(rows), 240)
+        self.assertEqual(len(set(tuple(sorted(row.items())) for row in rows)), 240)
+
+    def test_covering_array_covers_every_pair(self):
+        rows = combinations.covering_array(options, 2)
+        self.assertLess(len(rows), 240)
+        for keys in itertools.combinations(options, 2):
+            self.assertEqual(covered(rows, keys), set(itertools.product(*(options[key] for key in keys))),
+                             'pairs of ' + str(keys) + ' are not covered')
+
+    def test_covering_array_covers_every_triple(self):
+        rows = combinations.covering_array(options, 3)
+        for keys in itertools.combinations(options, 3):
+            self.assertEqual(covered(rows, keys), set(itertools.product(*(options[key] for key in keys))))
+
+    def test_covering_array_is_stable(self):
+        self.assertEqual(combinations.covering_array(options, 2), combinations.covering_array(options, 2))
+
+    def test_high_strength_is_full_product(self):
+        self.assertEqual(combinations.covering_array(options, 4), combinations.full_product(options))
+
+    def test_plan(self):
+        self.assertEqual(combinations.plan(options, 'full'), combinations.full_product(options))
+        self.assertEqual(combinations.plan(options, 2), combinations.covering_array(options, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+from util import perf_regression
+
+
+class TestPerfRegression(unittest.TestCase):
+
+    def test_t_critical(self):
+        # 97.5% quantiles of Student's t distribution
+        for df, quantile in [(5, 2.571), (10, 2.228), (30, 2.042), (1000, 1.962)]:
+            self.assertAlmostEqual(perf_regression.t_critical(df), quantile, places=2,
+                                   msg='t quantile for ' + str(df) + ' degrees of freedom')
+
+    def test_t_critical_decreasing(self):
+        values = [perf_regression.t_critical(df) for df in range(3, 100)]
+        self.assertEqual(values, sorted(values, reverse=True))
+        self.assertGreater(values[-1], perf_regression.Z_95)
+
+    def test_mean_difference(self):
+        # Equal variances and sizes, Welch degrees of freedom are 2 * (n - 1) = 6
+        baseline = [10, 10.5, 9.5, 10.2]
+        current = [9, 9.5, 8.5, 9.2]
+        difference, low, high = perf_regression.mean_difference(baseline, current)
+        margin = 2.447 * ((0.53 / 3 / 4) * 2) ** 0.5
+        self.assertAlmostEqual(difference, -1 / 10.05)
+        self.assertAlmostEqual(low, (-1 - margin) / 10.05, places=3)
+        self.assertAlmostEqual(high, (-1 + margin) / 10.05, places=3)
+
+    def test_mean_difference_without_variance(self):
+        self.assertEqual(perf_regression.mean_difference([10, 10], [11, 11]), (0.1, 0.1, 0.1))
+
+    def test_mean_difference_not_enough_samples(self):
+        self.assertIsNone(perf_regression.mean_difference([10], [11, 12]))
+        self.assertIsNone(perf_regression.mean_difference([10, 11], [12]))
+        self.assertIsNone(perf_regression.mean_difference([0, 0], [1, 2]))
+
+    def test_block_means(self):
+        self.assertEqual(perf_regression.block_means(list(range(10))), [0.5, 2.5, 4.5, 6.5, 8.5])
+        self.assertEqual(perf_regression.block_means([1, 2, 3]), [1, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+from util import sysbench_results
+
+run_output = """Threads started!
+
+[ 10s ] thds: 10 tps: 995.10 qps: 19904.09 (r/w/o: 13933.26/3980.62/1990.21) lat (ms,95%): 15.00 err/s: 0.00 reconn/s: 0.00
+[ 20s ] thds: 10 tps: 1004.90 qps: 20095.91 (r/w/o: 14066.74/4019.38/2009.79) lat (ms,95%): 14.46 err/s: 0.10 reconn/s: 0.00
+Latency histogram (values are in milliseconds)
+       value  ------------- distribution ------------- count
+       5.000 |****************************************  16000
+       9.910 |**                                        2800
+      14.460 |*                                         900
+      30.260 |*                                         300
+SQL statistics:
+    queries performed:
+        read:                            280000
+    transactions:                        20000  (1000.00 per sec.)
+    queries:                             400000 (20000.00 per sec.)
+    ignored errors:                      1      (0.05 per sec.)
+    reconnects:                          0      (0.00 per sec.)
+
+General statistics:
+    total time:                          20.0021s
+    total number of events:              20000
+
+Latency (ms):
+         min:                                    2.03
+         avg:                                   10.00
+         max:                                   80.12
+         95th percentile:                       14.46
+         sum:                               200000.00
+"""
+
+
+class TestSysbenchResults(unittest.TestCase):
+
+    def test_summary(self):
+        result = sysbench_results.parse(run_output)
+        self.assertEqual(result['transactions'], 20000)
+        self.assertEqual(result['tps'], 1000.0)
+        self.assertEqual(result['queries'], 400000)
+        self.assertEqual(result['qps'], 20000.0)
+        self.assertEqual(result['errors'], 1)
+        self.assertEqual(result['reconnects'], 0)
+        self.assertEqual(result['total_time'], 20.0021)
+        self.assertEqual((result['lat_min'], result['lat_avg'], result['lat_max']), (2.03, 10.0, 80.12))
+        self.assertEqual((result['percentile'], result['lat_pct']), (95, 14.46))
+        self.assertNotIn('partial', result)
+
+    def test_intervals(self):
+        result = sysbench_results.parse(run_output)
+        self.assertEqual(result['intervals'], [[10, 10, 995.1, 19904.09, 15.0, 0.0, 0.0],
+                                               [20, 10, 1004.9, 20095.91, 14.46, 0.1, 0.0]])
+
+    def test_histogram_percentiles(self):
+        result = sysbench_results.parse(run_output)
+        self.assertEqual(result['lat_p95'], 14.46)
+        self.assertEqual(result['lat_p99'], 30.26)
+
+    def test_p95_without_histogram(self):
+        output = run_output.split('Latency histogram')[0] + run_output.split('SQL statistics:')[1]
+        result = sysbench_results.parse(output)
+        self.assertEqual(result['lat_p95'], 14.46)
+        self.assertNotIn('lat_p99', result)
+
+    def test_stopped_run(self):
+        output = run_output.split('Latency histogram')[0]
+        self.assertIsNone(sysbench_results.parse(output))
+        result = sysbench_results.parse(output, partial=True)
+        self.assertTrue(result['partial'])
+        self.assertAlmostEqual(result['tps'], 1000.0)
+        self.assertAlmostEqual(result['qps'], 20000.0)
+        self.assertEqual(result['lat_pct'], 15.0)
+        self.assertEqual(result['total_time'], 20.0)
+
+    def test_failed_run(self):
+        self.assertIsNone(sysbench_results.parse("FATAL: unable to connect to MySQL server", partial=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
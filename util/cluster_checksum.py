@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# This will help us to compare every table of a database
+# across all cluster nodes.
+
+import mysql.connector
+from concurrent.futures import ThreadPoolExecutor
+from util import db_connection
+
+# CHECKSUM TABLE statements running at the same time on one node
+NODE_CONCURRENCY = 4
+
+
+class ClusterChecksum:
+    def __init__(self, sockets, debug, node_concurrency=NODE_CONCURRENCY):
+        self.sockets = sockets
+        self.debug = debug
+        self.node_concurrency = node_concurrency
+
+    def table_list(self, socket, db):
+        # Base tables of the database on one node
+        return [row[0] for row in db_connection.DbConnection('root', socket, self.debug).query(
+            "SELECT table_name FROM information_schema.tables "
+            "WHERE table_schema = %s AND table_type = 'BASE TABLE'", (db,))]
+
+    def table_checksum(self, socket, db, table):
+        # Checksum of one table, None if the table can not be read
+        try:
+            return db_connection.DbConnection('root', socket, self.debug).query(
+                "CHECKSUM TABLE `" + db + "`.`" + table + "`")[0][1]
+        except mysql.connector.Error as e:
+            if self.debug == 'YES':
+                print(socket + ': checksum of ' + db + '.' + table + ' failed: ' + str(e))
+            return None
+
+    def checksum_matrix(self, db):
+        """ Checksum every table of db on every node. All nodes
+            are checked at once, each node runs at most
+            node_concurrency CHECKSUM TABLE statements.
+            Returns {table: [checksum on node1, node2, ...]}, a table
+            missing on a node has checksum 'missing'.
+        """
+        with ThreadPoolExecutor(max_workers=len(self.sockets)) as executor:
+            node_tables = list(executor.map(lambda socket: set(self.table_list(socket, db)), self.sockets))
+        tables = sorted(set().union(*node_tables))
+        executors = [ThreadPoolExecutor(max_workers=self.node_concurrency) for _ in self.sockets]
+        try:
+            futures = {}
+            for table in tables:
+                for node, socket in enumerate(self.sockets):
+                    if table in node_tables[node]:
+                        futures[(table, node)] = executors[node].submit(self.table_checksum, socket, db, table)
+            matrix = {}
+            for table in tables:
+                matrix[table] = [futures[(table, node)].result() if (table, node) in futures else 'missing'
+                                 for node in range(len(self.sockets))]
+        finally:
+            for executor in executors:
+                executor.shutdown()
+        return matrix
+
+    def mismatches(self, db):
+        # Tables which do not have the same checksum on all nodes
+        return {table: checksums for table, checksums in self.checksum_matrix(db).items()
+                if len(set(checksums)) != 1 or checksums[0] is None}
+
+    def check(self, db):
+        """ Compare all tables of db across the nodes.
+            Returns 0 if every table is identical
+            on every node, otherwise 1.
+        """
+        try:
+            mismatches = self.mismatches(db)
+        except mysql.connector.Error as e:
+            print("ERROR! Could not read tables of " + db + " : " + str(e))
+            return 1
+        for table, checksums in mismatches.items():
+            print("\tTable(" + db + '.' + table + " ) checksum is different")
+            for node, checksum in enumerate(checksums):
+                print("\t\t" + self.sockets[node] + ' : ' + str(checksum))
+        if mismatches:
+            return 1
+        return 0
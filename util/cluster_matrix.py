@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# This will help us to run a test matrix on several independent
+# clusters at the same time. Every cluster gets its own workdir
+# (and so its own port leases), combinations are pulled from a
+# work queue and every combination keeps its own logs.
+
+import os
+import re
+import time
+import queue
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from util import galera_startup
+from util import db_connection
+from util import port_allocator
+
+# Error log lines of a crashed or asserting server
+CRASH_PATTERN = re.compile(r'mysqld got signal|Assertion failure|Assertion `|Segmentation fault|'
+                           r'WSREP: FSM: no such a transition|terminate called after', re.I)
+
+
+def combination_name(combination):
+    # Log directory name of a combination: key1_value1_key2_value2
+    return '_'.join(str(key) + '_' + str(value) for key, value in combination.items())
+
+
+class ClusterMatrix:
+    def __init__(self, scriptdir, basedir, workdir, node, clusters, debug):
+        self.scriptdir = scriptdir
+        self.basedir = basedir
+        self.workdir = workdir
+        self.node = int(node)
+        self.clusters = int(clusters)
+        self.debug = debug
+
+    def cluster_workdir(self, cluster):
+        return self.workdir + '/cluster' + str(cluster)
+
+    def log_dir(self, combination):
+        return self.workdir + '/' + combination_name(combination)
+
+    def start_cluster(self, cluster_workdir, wsrep_extra, my_extra):
+        """ Start a fresh cluster in cluster_workdir.
+            Returns 0/1, failures do not stop the other
+            clusters of the matrix.
+        """
+        if not os.path.exists(cluster_workdir):
+            os.makedirs(cluster_workdir)
+        server_startup = galera_startup.StartCluster(self.scriptdir, cluster_workdir, self.basedir,
+                                                     self.node, self.debug)
+        for step in (server_startup.sanity_check,
+                     lambda: server_startup.create_config(wsrep_extra),
+                     server_startup.initialize_cluster,
+                     lambda: server_startup.start_cluster(my_extra)):
+            if step() != 0:
+                return 1
+        return db_connection.DbConnection('root', cluster_workdir + '/node1/mysql.sock',
+                                          self.debug).connection_check()
+
+    def stop_cluster(self, cluster_workdir):
+        # Nodes which crashed are already gone, ignore the shutdown status
+        for i in range(self.node, 0, -1):
+            socket = cluster_workdir + '/node' + str(i) + '/mysql.sock'
+            db_connection.DbConnection('root', socket).close_all()
+            shutdown_node = self.basedir + '/bin/mysqladmin --user=root --socket=' + \
+                socket + ' shutdown > /dev/null 2>&1'
+            if self.debug == 'YES':
+                print(shutdown_node)
+            os.system(shutdown_node)
+
+    def crashed_nodes(self, cluster_workdir):
+        """ Nodes which are not answering or which have
+            a crash or assertion in their error log
+        """
+        crashed = []
+        for i in range(1, self.node + 1):
+            node_dir = cluster_workdir + '/node' + str(i)
+            ping = os.system(self.basedir + '/bin/mysqladmin --user=root --socket=' + node_dir +
+                             '/mysql.sock ping > /dev/null 2>&1')
+            crash = False
+            error_log = node_dir + '/node' + str(i) + '.err'
+            if os.path.isfile(error_log):
+                with open(error_log, errors='replace') as log:
+                    crash = any(CRASH_PATTERN.search(line) for line in log)
+            if ping != 0 or crash:
+                crashed.append(i)
+        return crashed
+
+    def save_logs(self, cluster_workdir, log_dir):
+        # Keep the node error logs and startup logs with the combination
+        for i in range(1, self.node + 1):
+            error_log = cluster_workdir + '/node' + str(i) + '/node' + str(i) + '.err'
+            if os.path.isfile(error_log):
+                shutil.copy(error_log, log_dir)
+        if os.path.isdir(cluster_workdir + '/log'):
+            for file in os.listdir(cluster_workdir + '/log'):
+                if file.startswith('startup'):
+                    shutil.copy(cluster_workdir + '/log/' + file, log_dir)
+
+    def run_combination(self, combination, cluster_workdir, job, wsrep_extra, my_extra):
+        """ Run job(combination, cluster_workdir, log_dir) on a
+            fresh cluster. Returns the summary of the combination.
+        """
+        log_dir = self.log_dir(combination)
+        if os.path.exists(log_dir):
+            shutil.rmtree(log_dir, ignore_errors=True)
+        os.makedirs(log_dir)
+        start = time.time()
+        summary = {'combination': combination, 'cluster': cluster_workdir, 'log_dir': log_dir, 'crashed': []}
+        if self.start_cluster(cluster_workdir, wsrep_extra, my_extra) != 0:
+            summary['status'] = 'startup failed'
+        else:
+            result = job(combination, cluster_workdir, log_dir)
+            summary['crashed'] = self.crashed_nodes(cluster_workdir)
+            if summary['crashed']:
+                summary['status'] = 'crashed'
+            elif result != 0:
+                summary['status'] = 'failed'
+            else:
+                summary['status'] = 'passed'
+        self.stop_cluster(cluster_workdir)
+        self.save_logs(cluster_workdir, log_dir)
+        summary['duration'] = time.time() - start
+        print("\t" + combination_name(combination) + " on " + os.path.basename(cluster_workdir) + ": " +
+              summary['status'] + " (" + str(int(summary['duration'])) + "s)")
+        return summary
+
+    def run(self, combinations, job, wsrep_extra='none', my_extra=None):
+        """ Run job for every combination, self.clusters
+            combinations at a time. Each running combination has
+            a cluster of its own. Returns the list of summaries
+            in combination order, a combination which raised an
+            exception has status 'error'.
+        """
+        if not os.path.exists(self.workdir):
+            os.makedirs(self.workdir)
+        work = queue.Queue()
+        for index, combination in enumerate(combinations):
+            work.put((index, combination))
+        summaries = [None] * work.qsize()
+
+        def worker(cluster):
+            cluster_workdir = self.cluster_workdir(cluster)
+            while True:
+                try:
+                    index, combination = work.get_nowait()
+                except queue.Empty:
+                    break
+                start = time.time()
+                try:
+                    summaries[index] = self.run_combination(combination, cluster_workdir, job, wsrep_extra,
+                                                            my_extra)
+                except Exception as e:
+                    # One broken combination must not stop the matrix
+                    print("\t" + combination_name(combination) + " on " + os.path.basename(cluster_workdir) +
+                          ": error (" + str(e) + ")")
+                    try:
+                        self.stop_cluster(cluster_workdir)
+                    except Exception:
+                        pass
+                    summaries[index] = {'combination': combination, 'cluster': cluster_workdir,
+                                        'log_dir': self.log_dir(combination), 'crashed': [], 'status': 'error',
+                                        'duration': time.time() - start}
+            port_allocator.get_allocator(self.debug).release(cluster_workdir)
+
+        with ThreadPoolExecutor(max_workers=self.clusters) as executor:
+            list(executor.map(worker, range(1, self.clusters + 1)))
+        self.write_summary(summaries)
+        return summaries
+
+    def write_summary(self, summaries):
+        # Central summary of all combinations, printed and kept in the matrix workdir
+        lines = []
+        for summary in summaries:
+            crashed = ''
+            if summary['crashed']:
+                crashed = ' (node' + ', node'.join(str(i) for i in summary['crashed']) + ')'
+            lines.append(f"{combination_name(summary['combination']):60}" + f"{summary['status']:16}" +
+                         '{:8.0f}s  '.format(summary['duration']) + summary['log_dir'] + crashed)
+        counts = {}
+        for summary in summaries:
+            counts[summary['status']] = counts.get(summary['status'], 0) + 1
+        lines.append(', '.join(str(count) + ' ' + status for status, count in sorted(counts.items())))
+        with open(self.workdir + '/summary.log', 'w') as summary_file:
+            summary_file.write('\n'.join(lines) + '\n')
+        print('\n'.join(lines))
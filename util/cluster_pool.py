@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# This will help us to keep started clusters warm between test files.
+# qa_framework.py leases a clean cluster to a test through QA_WORKDIR,
+# Utility.start_galera uses it instead of booting a new one, and after
+# the test the pool resets the cluster (or boots a new one) in the
+# background.
+
+import os
+import glob
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import mysql.connector
+from config import *
+from util import galera_startup
+from util import db_connection
+from util import port_allocator
+from util import wsrep_sync
+from util import dataset_cache
+
+# Marker files in the cluster workdir: ready to lease, in use by a test
+READY_FILE = 'cluster_pool.ready'
+LEASED_FILE = 'cluster_pool.leased'
+
+
+def profile(node, encryption, my_extra):
+    # Cluster configuration a test asks for, warm clusters must match it
+    return str(int(node)) + ' ' + encryption + ' ' + ' '.join((my_extra or '').split())
+
+
+def node_pids(workdir, node):
+    """ mysqld pids of the cluster nodes, None if a node has
+        no pid file. A rebooted cluster has different pids.
+    """
+    pids = []
+    for i in range(1, int(node) + 1):
+        pid_files = glob.glob(workdir + '/node' + str(i) + '/*.pid')
+        if not pid_files:
+            return None
+        with open(pid_files[0]) as pid_file:
+            pids.append(pid_file.read().strip())
+    return ' '.join(pids)
+
+
+def read_marker(workdir, marker):
+    # (profile, pids) of a marker file, None if there is none
+    if not os.path.isfile(workdir + '/' + marker):
+        return None
+    with open(workdir + '/' + marker) as marker_file:
+        lines = marker_file.read().split('\n')
+    return lines[0], lines[1] if len(lines) > 1 else ''
+
+
+def lease_warm_cluster(workdir, node, encryption, my_extra):
+    """ True if workdir holds a warm pool cluster with the
+        requested configuration. The cluster is then marked
+        as used by the test.
+    """
+    if os.environ.get('QA_CLUSTER_POOL') != workdir:
+        return False
+    marker = read_marker(workdir, READY_FILE)
+    if marker is None or marker[0] != profile(node, encryption, my_extra):
+        return False
+    if marker[1] != node_pids(workdir, node):
+        return False
+    os.replace(workdir + '/' + READY_FILE, workdir + '/' + LEASED_FILE)
+    return True
+
+
+def is_leased(workdir, node):
+    # True if the test is still running on the warm cluster it leased
+    marker = read_marker(workdir, LEASED_FILE)
+    return marker is not None and marker[1] == node_pids(workdir, node)
+
+
+class ClusterPool:
+    def __init__(self, scriptdir, basedir, pool_dir, size, node, encryption, my_extra, debug):
+        self.scriptdir = scriptdir
+        self.basedir = basedir
+        self.pool_dir = pool_dir
+        self.size = int(size)
+        self.node = int(node)
+        self.encryption = encryption
+        self.my_extra = my_extra
+        self.debug = debug
+        self.profile = profile(node, encryption, my_extra)
+        self.ready = []
+        self.warming = 0
+        self.condition = threading.Condition()
+        self.executor = ThreadPoolExecutor(max_workers=self.size)
+        # Schemas, users and global variables of a freshly booted cluster
+        self.baseline = {}
+
+    def cluster_workdir(self, cluster):
+        return self.pool_dir + '/cluster' + str(cluster)
+
+    def sockets(self, workdir):
+        return [workdir + '/node' + str(i) + '/mysql.sock' for i in range(1, self.node + 1)]
+
+    def write_ready(self, workdir):
+        for marker in (READY_FILE, LEASED_FILE):
+            if os.path.exists(workdir + '/' + marker):
+                os.remove(workdir + '/' + marker)
+        with open(workdir + '/' + READY_FILE, 'w') as marker_file:
+            marker_file.write(self.profile + '\n' + node_pids(workdir, self.node))
+
+    def users(self, socket):
+        return set(db_connection.DbConnection('root', socket, self.debug).query(
+            "SELECT user, host FROM mysql.user"))
+
+    def schemas(self, socket):
+        # Schemas a test may have created or changed
+        return [row[0] for row in db_connection.DbConnection('root', socket, self.debug).query(
+            "SELECT schema_name FROM information_schema.schemata") if row[0] not in dataset_cache.SYSTEM_SCHEMAS]
+
+    def run_allowed(self, connection, statement):
+        # Statements which may be refused, e.g. RESET MASTER without binary log
+        try:
+            connection.run(statement)
+        except mysql.connector.Error as e:
+            if self.debug == 'YES':
+                print("Cluster pool: " + statement + " : " + str(e))
+
+    def boot(self, workdir):
+        # Start a new default cluster in workdir, returns 0/1
+        if not os.path.exists(workdir):
+            os.makedirs(workdir)
+        server_startup = galera_startup.StartCluster(self.scriptdir, workdir, self.basedir, self.node, self.debug)
+        for step in (server_startup.sanity_check,
+                     lambda: server_startup.create_config('encryption' if self.encryption == 'YES' else 'none'),
+                     server_startup.initialize_cluster,
+                     lambda: server_startup.start_cluster('--max-connections=1500 ' + self.my_extra)):
+            if step() != 0:
+                return 1
+        sockets = self.sockets(workdir)
+        if db_connection.DbConnection('root', sockets[0], self.debug).connection_check() != 0:
+            return 1
+        self.baseline[workdir] = {}
+        for socket in sockets:
+            connection = db_connection.DbConnection('root', socket, self.debug)
+            self.baseline[workdir][socket] = (self.schemas(socket), self.users(socket), connection.global_variables())
+        return 0
+
+    def reset(self, workdir):
+        """ Bring a used cluster back to the state after boot:
+            drop the test schemas and users, reset binary log
+            and GTID positions and changed global variables.
+            Returns 1 if the cluster has to be booted again.
+        """
+        sockets = self.sockets(workdir)
+        if workdir not in self.baseline:
+            return 1
+        try:
+            for socket in sockets:
+                connection = db_connection.DbConnection('root', socket, self.debug)
+                if connection.scalar("SELECT VARIABLE_VALUE FROM information_schema.GLOBAL_STATUS "
+                                     "WHERE VARIABLE_NAME = 'wsrep_local_state_comment'") != 'Synced':
+                    return 1
+            node1 = db_connection.DbConnection('root', sockets[0], self.debug)
+            schemas, users = self.baseline[workdir][sockets[0]][:2]
+            # Schemas of the fresh cluster (like test) are created again empty
+            for schema in self.schemas(sockets[0]):
+                node1.run("DROP DATABASE `" + schema + "`")
+            for schema in schemas:
+                node1.run("CREATE DATABASE `" + schema + "`")
+            for user, host in self.users(sockets[0]) - users:
+                node1.run("DROP USER %s@%s", (user, host))
+            if wsrep_sync.wait_for_apply(sockets[0], sockets, 300, self.debug) != 0:
+                return 1
+            for socket in sockets:
+                connection = db_connection.DbConnection('root', socket, self.debug)
+                # Binary logs and GTID positions are node local
+                self.run_allowed(connection, "RESET MASTER")
+                self.run_allowed(connection, "SET GLOBAL gtid_slave_pos = ''")
+                if connection.restore_global_variables(self.baseline[workdir][socket][2]):
+                    return 1
+        except mysql.connector.Error as e:
+            if self.debug == 'YES':
+                print("Cluster pool: reset of " + workdir + " failed: " + str(e))
+            return 1
+        return 0
+
+    def warm(self, workdir):
+        """ Make the cluster in workdir ready to lease. A cluster
+            which is still the one the pool booted is reset, any
+            other is booted again.
+        """
+        pids = node_pids(workdir, self.node)
+        markers = [read_marker(workdir, READY_FILE), read_marker(workdir, LEASED_FILE)]
+        same_cluster = pids is not None and any(marker is not None and marker[1] == pids for marker in markers)
+        if same_cluster and self.reset(workdir) == 0:
+            result = 0
+        else:
+            if self.debug == 'YES':
+                print("Cluster pool: booting " + workdir)
+            result = self.boot(workdir)
+        if result == 0:
+            self.write_ready(workdir)
+        else:
+            print("ERROR! Cluster pool could not start a cluster in " + workdir)
+        with self.condition:
+            self.warming -= 1
+            if result == 0:
+                self.ready.append(workdir)
+            self.condition.notify_all()
+        return result
+
+    def start(self):
+        # Warm every pool cluster in the background
+        for cluster in range(1, self.size + 1):
+            self.release(self.cluster_workdir(cluster))
+
+    def clear_logs(self, workdir):
+        # Logs of the tests which ran on the cluster before, the startup scripts are kept
+        for file in glob.glob(workdir + '/log/*') + [workdir + '/test_run.log']:
+            if os.path.isfile(file) and not os.path.basename(file).startswith('startup'):
+                os.remove(file)
+
+    def lease(self):
+        """ Wait for a warm cluster and return its workdir. None
+            if no cluster is ready and none is being warmed. The
+            logs of earlier tests are removed from the workdir.
+        """
+        with self.condition:
+            while not self.ready and self.warming > 0:
+                self.condition.wait()
+            if not self.ready:
+                return None
+            workdir = self.ready.pop(0)
+        self.clear_logs(workdir)
+        return workdir
+
+    def release(self, workdir):
+        # Give a cluster back, it is reset or booted again in the background
+        with self.condition:
+            self.warming += 1
+        self.executor.submit(self.warm, workdir)
+
+    def shutdown(self):
+        # Stop every pool cluster once all tests are done
+        self.executor.shutdown(wait=True)
+        for cluster in range(1, self.size + 1):
+            workdir = self.cluster_workdir(cluster)
+            for socket in reversed(self.sockets(workdir)):
+                db_connection.DbConnection('root', socket).close_all()
+                shutdown_node = self.basedir + '/bin/mysqladmin --user=root --socket=' + \
+                    socket + ' shutdown > /dev/null 2>&1'
+                if self.debug == 'YES':
+                    print(shutdown_node)
+                os.system(shutdown_node)
+            for marker in (READY_FILE, LEASED_FILE):
+                if os.path.exists(workdir + '/' + marker):
+                    os.remove(workdir + '/' + marker)
+            port_allocator.get_allocator(self.debug).release(workdir)
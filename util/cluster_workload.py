@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# This will help us to run sysbench on all cluster nodes at the same
+# time, so write sets from different nodes conflict in certification.
+
+import os
+import sys
+import time
+cwd = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.normpath(os.path.join(cwd, '../'))
+sys.path.insert(0, parent_dir)
+from util import sysbench_run
+from util import db_connection
+
+DISTRIBUTIONS = ['round-robin', 'weighted', 'hot-node']
+# Share of the threads which goes to the hot node
+HOT_NODE_SHARE = 0.8
+# Server counters sampled before and after the run
+STATUS_COUNTERS = ['wsrep_local_cert_failures', 'wsrep_local_bf_aborts', 'Innodb_deadlocks',
+                   'wsrep_flow_control_paused_ns', 'wsrep_flow_control_sent']
+
+
+def node_threads(threads, node, distribution='round-robin', weights=None, hot_node=1):
+    """ Split sysbench threads between the nodes. Returns
+        the thread count of each node, node1 first.
+    """
+    if distribution == 'round-robin':
+        weights = [1] * node
+    elif distribution == 'hot-node':
+        if node == 1:
+            return [threads]
+        weights = [(1 - HOT_NODE_SHARE) / (node - 1)] * node
+        weights[hot_node - 1] = HOT_NODE_SHARE
+    elif distribution == 'weighted':
+        if weights is None or len(weights) != node:
+            raise ValueError('weighted distribution needs one weight per node')
+    else:
+        raise ValueError('Unknown workload distribution ' + distribution)
+    total = float(sum(weights))
+    shares = [threads * weight / total for weight in weights]
+    split = [int(share) for share in shares]
+    # Largest remainder first, so the split adds up to threads
+    for i in sorted(range(node), key=lambda i: split[i] - shares[i])[:threads - sum(split)]:
+        split[i] += 1
+    return split
+
+
+class ClusterWorkload:
+    def __init__(self, basedir, workdir, node, debug):
+        self.basedir = basedir
+        self.workdir = workdir
+        self.debug = debug
+        self.sockets = [workdir + '/node' + str(i) + '/mysql.sock' for i in range(1, int(node) + 1)]
+        self.workloads = {}
+        self.log_offsets = {}
+        self.distribution = None
+        self.sampler = None
+        self.counters = {}
+        self.start_time = None
+        self.end_time = None
+
+    def status_counters(self, socket):
+        connection = db_connection.DbConnection('root', socket, self.debug)
+        rows = connection.query("SHOW GLOBAL STATUS WHERE Variable_name IN (" +
+                                ', '.join(["%s"] * len(STATUS_COUNTERS)) + ")", tuple(STATUS_COUNTERS))
+        counters = dict.fromkeys(STATUS_COUNTERS, 0)
+        for row in rows or []:
+            for name in STATUS_COUNTERS:
+                if row[0].lower() == name.lower():
+                    counters[name] = int(row[1])
+        return counters
+
+    def start(self, lua, workload, db, tables, threads, table_size, time_limit,
+              distribution='round-robin', weights=None, hot_node=1):
+        """ Start sysbench on every node which gets threads.
+            Returns 0 if all runs started, otherwise 1.
+        """
+        split = node_threads(int(threads), len(self.sockets), distribution, weights, hot_node)
+        self.distribution = distribution
+        self.workloads = {}
+        if self.debug == 'YES':
+            print(workload + ' ' + distribution + ' thread split: ' + str(split))
+        for node, socket in enumerate(self.sockets, 1):
+            self.counters[node] = self.status_counters(socket)
+        self.start_time = time.time()
+        for node, socket in enumerate(self.sockets, 1):
+            if split[node - 1] == 0:
+                continue
+            sysbench = sysbench_run.SysbenchRun(self.basedir, self.workdir, socket, self.debug)
+            log_file = self.workdir + '/log/cluster_' + workload + '_node' + str(node) + '.log'
+            self.log_offsets[node] = (sysbench, sysbench.log_size(log_file))
+            self.workloads[node] = sysbench.oltp_run(lua, workload, log_file, db, tables, split[node - 1],
+                                                     table_size, time_limit, "Yes", sample=False)
+        # One sampler for the whole cluster instead of one per sysbench run
+        self.sampler = sysbench_run.SysbenchRun(self.basedir, self.workdir, self.sockets[0], self.debug). \
+            wsrep_sampler('cluster_' + workload + '_' + str(threads) + '_' + distribution)
+        if self.sampler is not None:
+            self.sampler.start()
+        result = 0
+        for node, handle in self.workloads.items():
+            if handle.startup_status() != 0:
+                print("ERROR!: sysbench " + workload + " run on node" + str(node) + " did not start")
+                result = 1
+        return result
+
+    def wait(self):
+        # Wait for the runs to finish, returns 1 if any sysbench run failed
+        result = 0
+        for node, handle in self.workloads.items():
+            if handle.wait() != 0:
+                print("ERROR!: sysbench " + handle.workload + " run on node" + str(node) + " is failed")
+                result = 1
+                continue
+            # Per node results are kept apart from single node runs of the same workload
+            sysbench, log_offset = self.log_offsets[node]
+            sysbench.save_result(handle.workload, handle.config + ", node:" + str(node) + "/" +
+                                 str(len(self.sockets)) + ", distribution:" + self.distribution,
+                                 handle.threads, handle.log_file, log_offset)
+        self.end_time = time.time()
+        self.stop_sampler()
+        return result
+
+    def stop(self):
+        for handle in self.workloads.values():
+            handle.stop()
+        self.end_time = time.time()
+        self.stop_sampler()
+        return 0
+
+    def stop_sampler(self):
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.sampler = None
+
+    def report(self):
+        """ Per node throughput, sysbench ignored errors and the
+            certification failure, brute force abort and deadlock
+            rates of the last run. Returns a dict keyed by node.
+        """
+        elapsed = max((self.end_time or time.time()) - self.start_time, 1)
+        report = {}
+        for node, socket in enumerate(self.sockets, 1):
+            counters = self.status_counters(socket)
+            delta = dict((name, counters[name] - self.counters[node][name]) for name in STATUS_COUNTERS)
+            result = None
+            if node in self.workloads:
+                result = self.workloads[node].result()
+            tps = result['tps'] if result else 0.0
+            transactions = result.get('transactions', tps * elapsed) if result else 0
+            report[node] = {
+                'threads': self.workloads[node].threads if node in self.workloads else 0,
+                'tps': tps,
+                'qps': result['qps'] if result else 0.0,
+                'errors': result.get('errors', 0) if result else 0,
+                'cert_failures_per_sec': delta['wsrep_local_cert_failures'] / elapsed,
+                'bf_aborts_per_sec': delta['wsrep_local_bf_aborts'] / elapsed,
+                'deadlocks_per_sec': delta['Innodb_deadlocks'] / elapsed,
+                # Certification failures per 1000 local commits
+                'cert_failure_rate': delta['wsrep_local_cert_failures'] * 1000.0 / transactions
+                if transactions else 0.0,
+                'flow_control_paused': delta['wsrep_flow_control_paused_ns'] / 1e9 / elapsed,
+                'flow_control_sent': delta['wsrep_flow_control_sent'],
+            }
+        print("node  threads        tps        qps  errors  cert_fail/s  cert_fail/1k  bf_abort/s  "
+              "deadlock/s  fc_paused")
+        for node, values in sorted(report.items()):
+            print('{:<4}  {:>7}  {:>9.2f}  {:>9.2f}  {:>6}  {:>11.2f}  {:>12.2f}  {:>10.2f}  {:>10.2f}  {:>8.1%}'
+                  .format('node' + str(node), values['threads'], values['tps'], values['qps'], values['errors'],
+                          values['cert_failures_per_sec'], values['cert_failure_rate'],
+                          values['bf_aborts_per_sec'], values['deadlocks_per_sec'], values['flow_control_paused']))
+        return report
+
+    def run(self, lua, workload, db, tables, threads, table_size, time_limit,
+            distribution='round-robin', weights=None, hot_node=1):
+        """ Run sysbench on all nodes until time_limit and print
+            the per node report. Returns 0/1 and the report.
+        """
+        if self.start(lua, workload, db, tables, threads, table_size, time_limit,
+                      distribution, weights, hot_node) != 0:
+            self.stop()
+            return 1, None
+        result = self.wait()
+        return result, self.report()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# This will help us to build node configuration files in memory. A cnf
+# is a list of sections, every section keeps its options in order, so
+# node, joiner and upgrade configurations are derived from one object
+# and every file is rendered and written once.
+
+import os
+import hashlib
+
+
+def option_key(name):
+    # mysqld treats - and _ in option names the same
+    return name.strip().replace('-', '_')
+
+
+class CnfSection:
+    def __init__(self, name):
+        self.name = name
+        # (option, value) entries, value None for flags like core-file.
+        # Comments are kept as ('#', text) and includes as ('!include', path).
+        self.entries = []
+
+    def index(self, option):
+        for position, (name, value) in enumerate(self.entries):
+            if name not in ('#', '!include') and option_key(name) == option_key(option):
+                return position
+        return None
+
+
+class CnfFile:
+    def __init__(self):
+        self.sections = []
+
+    @classmethod
+    def parse(cls, text):
+        # Options before the first [section] go to an unnamed section
+        cnf = cls()
+        section = None
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('[') and line.endswith(']'):
+                section = cnf.section(line[1:-1].strip())
+                continue
+            if section is None:
+                section = cnf.section('')
+            if line.startswith('#'):
+                section.entries.append(('#', line[1:]))
+            elif line.startswith('!include'):
+                section.entries.append(('!include', line[len('!include'):].strip()))
+            elif '=' in line:
+                name, value = line.split('=', 1)
+                section.entries.append((name.strip(), value.strip()))
+            else:
+                section.entries.append((line, None))
+        return cnf
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as cnf_file:
+            return cls.parse(cnf_file.read())
+
+    def copy(self):
+        return CnfFile.parse(self.render())
+
+    def section(self, name):
+        # Section by name, created at the end if it does not exist
+        for section in self.sections:
+            if section.name == name:
+                return section
+        section = CnfSection(name)
+        self.sections.append(section)
+        return section
+
+    def get(self, option, section='mysqld'):
+        section = self.section(section)
+        position = section.index(option)
+        if position is None:
+            return None
+        return section.entries[position][1]
+
+    def set(self, option, value=None, section='mysqld'):
+        """ Set option in section. An existing option keeps its
+            place, a new one is added at the end of the section.
+        """
+        section = self.section(section)
+        position = section.index(option)
+        if position is None:
+            section.entries.append((option, value))
+        else:
+            section.entries[position] = (section.entries[position][0], value)
+        return self
+
+    def remove(self, option, section='mysqld'):
+        section = self.section(section)
+        section.entries = [entry for entry in section.entries
+                           if entry[0] in ('#', '!include') or option_key(entry[0]) != option_key(option)]
+        return self
+
+    def include(self, path, section='mysqld'):
+        self.section(section).entries.append(('!include', path))
+        return self
+
+    def replace_values(self, old, new):
+        # Replace text in every option value and include path, e.g. node3 with node4
+        for section in self.sections:
+            section.entries = [(name, value.replace(old, new) if value is not None and name != '#' else value)
+                               for name, value in section.entries]
+        return self
+
+    def render(self):
+        lines = []
+        for section in self.sections:
+            if section.name:
+                lines.append('[' + section.name + ']')
+            for name, value in section.entries:
+                if name == '#':
+                    lines.append('#' + value)
+                elif name == '!include':
+                    lines.append('!include ' + value)
+                elif value is None:
+                    lines.append(name)
+                else:
+                    lines.append(name + '=' + value)
+        return '\n'.join(lines) + '\n'
+
+    def digest(self):
+        # Same configuration, same digest
+        return hashlib.sha1(self.render().encode()).hexdigest()
+
+    def write(self, path):
+        # Write the whole file at once, readers never see a partial file
+        tmp_file = path + '.tmp'
+        with open(tmp_file, 'w') as cnf_file:
+            cnf_file.write(self.render())
+        os.replace(tmp_file, path)
+        return 0
+
+
+def joiner_config(donor_cnf, donor, joiner, cluster_address, ports, drop_sst_auth=True):
+    """ Configuration of a node joining the cluster, derived
+        from the donor configuration. ports are the NodePorts
+        leased for the joiner.
+    """
+    cnf = donor_cnf.copy().replace_values(donor, joiner)
+    if drop_sst_auth:
+        cnf.remove('wsrep_sst_auth')
+    cnf.set('wsrep_cluster_address', cluster_address + '127.0.0.1:' + str(ports.gcomm))
+    cnf.set('port', str(ports.client))
+    cnf.set('wsrep_provider_options', "'gmcast.listen_addr=tcp://127.0.0.1:" + str(ports.gcomm) + "'")
+    cnf.set('server_id', '14')
+    cnf.set('wsrep_sst_receive_address', '127.0.0.1:' + str(ports.sst))
+    return cnf
+
+
+def write_joiner_config(workdir, donor, joiner, cluster_address, ports, drop_sst_auth=True):
+    # Write conf/<joiner>.cnf of workdir from conf/<donor>.cnf
+    donor_cnf = CnfFile.load(workdir + '/conf/' + donor + '.cnf')
+    return joiner_config(donor_cnf, donor, joiner, cluster_address, ports,
+                         drop_sst_auth).write(workdir + '/conf/' + joiner + '.cnf')
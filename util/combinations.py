@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# This will help us to cut down option combination sweeps. Instead of
+# the full Cartesian product we run a t-way covering array: every
+# combination of values of any t options is still tested at least once.
+
+import itertools
+from config import *
+
+
+def full_product(options):
+    # Every combination of the option values, as a list of dicts
+    keys = list(options.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*(options[key] for key in keys))]
+
+
+def covering_array(options, strength=2):
+    """ Greedy t-way covering array of options (option name ->
+        list of values). Rows are built one at a time, each value
+        is picked to cover the most uncovered t-tuples. The result
+        is the same on every run.
+    """
+    keys = list(options.keys())
+    if strength >= len(keys):
+        return full_product(options)
+    # t-tuple: ((option index, value index), ...) sorted by option index
+    uncovered = set()
+    for columns in itertools.combinations(range(len(keys)), strength):
+        for values in itertools.product(*(range(len(options[keys[column]])) for column in columns)):
+            uncovered.add(tuple(zip(columns, values)))
+    rows = []
+    while uncovered:
+        row = dict(min(uncovered))
+        for column in range(len(keys)):
+            if column in row:
+                continue
+            best_value, best_gain = 0, -1
+            for value in range(len(options[keys[column]])):
+                row[column] = value
+                gain = 0
+                for others in itertools.combinations(sorted(c for c in row if c != column), strength - 1):
+                    if tuple(sorted([(c, row[c]) for c in others] + [(column, value)])) in uncovered:
+                        gain += 1
+                if gain > best_gain:
+                    best_value, best_gain = value, gain
+            row[column] = best_value
+        for columns in itertools.combinations(range(len(keys)), strength):
+            uncovered.discard(tuple((column, row[column]) for column in columns))
+        rows.append(row)
+    return [dict((keys[column], options[keys[column]][row[column]]) for column in range(len(keys)))
+            for row in rows]
+
+
+def plan(options, strength=None):
+    """ Option combinations to test. strength is the t of the
+        covering array, 'full' (or 0) runs the full product.
+        Defaults to combination_strength from config.ini.
+    """
+    if strength is None:
+        strength = COMBINATION_STRENGTH
+    if str(strength) in ('full', '0'):
+        return full_product(options)
+    return covering_array(options, int(strength))
@@ -1,4 +1,7 @@
+import os
 import random
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from util import datagen
 import sys
 
@@ -14,16 +17,55 @@ column_names = ['c1', 'c2', 'c3', 'c4', 'c5', 'c6', 'c7', 'c8', 'c9', 'c10']
 varchar_count = [32, 64, 126, 256, 1024]
 
 
+# Rows per multi row INSERT
+insert_batch_size = 1000
+# Rows generated per column batch
+column_batch_size = 10000
+# Tables loaded at the same time
+load_jobs = 4
+# Rows with a primary key value which is already in the table are skipped
+ON_DUPLICATE = " ON DUPLICATE KEY UPDATE c1 = c1"
+
+
+def chunk_seed(seed, table_name, chunk):
+    # Seed of one data chunk, the same for any number of worker processes
+    return int(hashlib.sha256((str(seed) + ':' + table_name + ':' + str(chunk)).encode()).hexdigest()[:16], 16)
+
+
+def chunk_text(table_name, typearray, count, seed, output_format='sql'):
+    """ count random rows of a table as multi row INSERTs
+        or as TSV lines
+    """
+    rng = random.Random(seed)
+    rows = list(zip(*[datagen.column_data(column_description, count, rng) for column_description in typearray]))
+    if output_format == 'tsv':
+        return "\n".join("\t".join(row) for row in rows) + "\n"
+    # Like LOAD DATA ... IGNORE, a duplicate key or a bad value skips only its own row
+    # instead of the whole multi row INSERT
+    return "".join("INSERT IGNORE INTO " + table_name + " values (" +
+                   "), (".join("'" + "', '".join(row) + "'" for row in rows[start:start + insert_batch_size]) +
+                   ");\n" for start in range(0, len(rows), insert_batch_size))
+
+
 class GenerateSQL:
-    def __init__(self, filename, lines):
+    def __init__(self, filename, lines, output_format='sql', seed=None):
         self.filename = filename
         self.lines = lines
-        self.table_count = random.randint(1, len(table_names))
-        self.column_count = random.randint(1, len(column_names))
+        # sql: multi row INSERTs after the CREATE TABLE, tsv: one data file per table
+        self.output_format = output_format
+        # Same seed, same tables and data
+        if seed is None:
+            seed = random.SystemRandom().randrange(1 << 63)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.table_count = self.rng.randint(1, len(table_names))
+        self.column_count = self.rng.randint(1, len(column_names))
         self.insert_sql_count = int(((self.lines / self.table_count) - 1))
+        # (table name, column count) of the created tables
+        self.tables = []
         
     def OutFile(self):
-        sys.stdout = open(self.filename, "w")
+        sys.stdout = open(self.filename, "w", buffering=1 << 20)
 
     def OptSelection(self, myextra):
         if myextra == "pk":
@@ -33,15 +75,22 @@ class GenerateSQL:
         else:
             return ""
 
-    def CreateTable(self):
-        # Create table with random data.
+    def TableFile(self, table_name):
+        # TSV data file of a table, next to the SQL file
+        return os.path.splitext(self.filename)[0] + "_" + table_name + ".tsv"
+
+    def TableSchemas(self):
+        """ Random column types of every table. Returns a list
+            of (table name, column types, CREATE TABLE statement)
+        """
+        schemas = []
         for i in range(self.table_count):
             data_types = ""
             index_length = ""
             typearray = []
             table_name = table_names[i]
             for j in range(self.column_count):
-                column_description = random.choice(data_type)
+                column_description = self.rng.choice(data_type)
                 typearray.append(column_description)
                 if j == 0:
                     if column_description == "text":
@@ -49,19 +98,125 @@ class GenerateSQL:
                 if column_description == "char":
                     column_description = column_description + " (1)"
                 if column_description == "varchar":
-                    column_description = column_description + " (" + format(random.choice(varchar_count)) + ")"
+                    column_description = column_description + " (" + format(self.rng.choice(varchar_count)) + ")"
                 if column_description == "timestamp":
                     column_description = column_description + " DEFAULT CURRENT_TIMESTAMP "
                 data_types += column_names[j] + " " + column_description + ", "
-            print("CREATE TABLE IF NOT EXISTS " + table_name + "( " + data_types + 
-                  " primary key (c1" + index_length + ") );")
-            for j in range(self.insert_sql_count):
-                data_value = ""
-                for column_description in typearray:
-                    text = datagen.DataGenerator(column_description)
-                    data_value += "'" + text.getData() + "', "
-                data_value = data_value[:-2]
-                print("INSERT INTO " + table_name + " values (" + data_value + ");")
+            schemas.append((table_name, typearray, "CREATE TABLE IF NOT EXISTS " + table_name + "( " +
+                            data_types + " primary key (c1" + index_length + ") );"))
+        return schemas
+
+    def TableChunks(self, table_name, typearray):
+        """ Data chunks of a table as (table name, column types,
+            row count, seed), column_batch_size rows each
+        """
+        return [(table_name, typearray, min(column_batch_size, self.insert_sql_count - start),
+                 chunk_seed(self.seed, table_name, chunk))
+                for chunk, start in enumerate(range(0, self.insert_sql_count, column_batch_size))]
+
+    def CreateTable(self):
+        # Create table with random data.
+        for table_name, typearray, create_table in self.TableSchemas():
+            print(create_table)
+            self.tables.append((table_name, len(typearray)))
+            if self.output_format == 'tsv':
+                with open(self.TableFile(table_name), "w", buffering=1 << 20) as tsv_file:
+                    for chunk in self.TableChunks(table_name, typearray):
+                        tsv_file.write(chunk_text(*chunk, output_format='tsv'))
+            else:
+                for chunk in self.TableChunks(table_name, typearray):
+                    sys.stdout.write(chunk_text(*chunk))
+        sys.stdout.flush()
+
+    def LoadTable(self, basedir, socket, db, table_name, column_count, method, debug):
+        """ Load the TSV file of one table, with LOAD DATA LOCAL INFILE
+            through the mysql client or with multi row INSERTs
+            over a pooled connection
+        """
+        table_file = self.TableFile(table_name)
+        if method == 'load_data':
+            load_query = basedir + "/bin/mysql --user=root --local-infile=1 --socket=" + socket + " " + db + \
+                " -e\"LOAD DATA LOCAL INFILE '" + table_file + "' IGNORE INTO TABLE " + table_name + \
+                "\" > /dev/null 2>&1"
+            if debug == 'YES':
+                print(load_query)
+            return 0 if os.system(load_query) == 0 else 1
+        # The standalone data_generator.py works without the connector
+        import mysql.connector
+        from util import db_connection
+        connection = db_connection.DbConnection('root', socket, debug)
+        insert_query = "INSERT INTO " + db + "." + table_name + " VALUES (" + \
+            ", ".join(["%s"] * column_count) + ")" + ON_DUPLICATE
+
+        def insert(rows):
+            # A failed batch is inserted again row by row, so that a bad
+            # value loses only its own row as with mysql -f
+            try:
+                return connection.execute_many(insert_query, rows), 0
+            except mysql.connector.Error:
+                pass
+            loaded, failed = 0, 0
+            for row in rows:
+                try:
+                    loaded += connection.run(insert_query, row)
+                except (mysql.connector.InterfaceError, mysql.connector.OperationalError):
+                    raise
+                except mysql.connector.Error as e:
+                    if debug == 'YES':
+                        print("Row of table " + table_name + " skipped: " + str(e))
+                    failed += 1
+            return loaded, failed
+
+        loaded, failed, rows = 0, 0, []
+        try:
+            with open(table_file) as tsv_file:
+                for line in tsv_file:
+                    rows.append(line.rstrip("\n").split("\t"))
+                    if len(rows) == insert_batch_size:
+                        batch_loaded, batch_failed = insert(rows)
+                        loaded, failed, rows = loaded + batch_loaded, failed + batch_failed, []
+            if rows:
+                batch_loaded, batch_failed = insert(rows)
+                loaded, failed = loaded + batch_loaded, failed + batch_failed
+        except mysql.connector.Error as e:
+            print("ERROR! Data load of table " + table_name + " failed: " + str(e))
+            return 1
+        if failed:
+            print("\tTable " + table_name + ": " + str(failed) + " rows skipped, " + str(loaded) + " rows loaded")
+        return 1 if failed and not loaded else 0
+
+    def RowCount(self, basedir, socket, db, debug):
+        # Rows in the created tables, None if they could not be counted
+        count_query = basedir + "/bin/mysql --user=root --socket=" + socket + " -Bse\"SELECT " + \
+            " + ".join("(SELECT COUNT(*) FROM " + db + "." + table[0] + ")" for table in self.tables) + \
+            "\" 2>/dev/null"
+        if debug == 'YES':
+            print(count_query)
+        try:
+            return int(os.popen(count_query).read().strip())
+        except ValueError:
+            return None
+
+    def LoadData(self, basedir, socket, db, debug, method='load_data'):
+        """ Create the tables from the SQL file and load the
+            TSV data files, load_jobs tables at a time.
+            method is load_data or insert.
+        """
+        data_load_query = basedir + "/bin/mysql --user=root --socket=" + \
+            socket + ' ' + db + ' -f < ' + self.filename + ' >/dev/null 2>&1'
+        if debug == 'YES':
+            print(data_load_query)
+        result = 0 if os.system(data_load_query) == 0 else 1
+        if result == 0 and self.output_format == 'tsv':
+            with ThreadPoolExecutor(max_workers=load_jobs) as executor:
+                results = list(executor.map(lambda table: self.LoadTable(basedir, socket, db, table[0], table[1],
+                                                                         method, debug), self.tables))
+            result = max(results + [0])
+        if self.tables:
+            # Duplicate keys and bad values are skipped, show how much data the test really has
+            print("\tData load: " + str(self.RowCount(basedir, socket, db, debug)) + " of " +
+                  str(self.insert_sql_count * len(self.tables)) + " generated rows loaded into " + db)
+        return result
 
     def DropTable(self):
         for i in range(self.table_count):
@@ -1,56 +1,123 @@
-#!/usr/bin/env python3.7
-import getopt
+#!/usr/bin/env python3
+import os
 import sys
-import createsql
+import gzip
+import getopt
+import subprocess
+from multiprocessing import Pool
+cwd = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.normpath(os.path.join(cwd, '../'))
+sys.path.insert(0, parent_dir)
+from util import createsql
+
+COMPRESSION = ['none', 'gzip', 'zstd']
 
 
 def usage():
     print("Usage: [ options ]")
-    print("  pgsql-generator.py --lines=1000 --outfile=pgsql.sql")
+    print("  data_generator.py --lines=1000 --outfile=/tmp/dataload.sql")
     print("")
     print("Options:")
     print("  -l, --lines=<number>      Specify number of lines to generate")
     print("  -o, --outfile=<filename>  Specify SQL output file name")
+    print("  -s, --seed=<number>       Random seed, the same seed generates the same file")
+    print("  -j, --jobs=<number>       Number of generator processes")
+    print("  -c, --compress=<type>     Compress the output (none/gzip/zstd)")
     print("  -v, --version             print version number")
     print("  -h, --help                print usage info")
 
 
-try:
-    opts, args = getopt.getopt(sys.argv[1:], "l:o:vh", ["lines=", "outfile=", "version", "help"])
-except getopt.GetoptError as err:
-    print('ERROR:', err)
-    print("")
-    usage()
-    sys.exit(2)
-lines = ""
-outfile = ""
-
-if len(sys.argv) == 1:
-    usage()
-    sys.exit()
-
-for opt, arg in opts:
-    if opt in ("-v", "--version"):
-        print ('1.0')
-        sys.exit()
-    elif opt in ("-h", "--help"):
+def compress(data, compression):
+    """ Compress one output chunk. Concatenated gzip members
+        and zstd frames form a valid compressed file.
+    """
+    if compression == 'gzip':
+        # No timestamp in the header, output depends on the seed only
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    elif compression == 'zstd':
+        return subprocess.run(['zstd', '-q', '-c', '-3'], input=data, stdout=subprocess.PIPE, check=True).stdout
+    return data
+
+
+def generate_chunk(task):
+    # Worker process: render and compress one data chunk
+    chunk, compression = task
+    return compress(createsql.chunk_text(*chunk).encode(), compression)
+
+
+def generate_file(outfile, line_count, seed, jobs, compression):
+    """ Write CREATE TABLE statements, random INSERTs and DROP
+        TABLE statements to outfile. Chunks are generated by jobs
+        processes and written in order as they complete.
+    """
+    generate_sql = createsql.GenerateSQL(outfile, line_count, seed=seed)
+    schemas = generate_sql.TableSchemas()
+    tasks = [(chunk, compression) for table_name, typearray, create_table in schemas
+             for chunk in generate_sql.TableChunks(table_name, typearray)]
+    with open(outfile, 'wb') as output:
+        output.write(compress(("\n".join(create_table for table_name, typearray, create_table in schemas) +
+                               "\n").encode(), compression))
+        with Pool(jobs) as pool:
+            for data in pool.imap(generate_chunk, tasks):
+                output.write(data)
+        output.write(compress(("\n".join("DROP TABLE IF EXISTS " + table_name + ";" for table_name, typearray,
+                                         create_table in schemas) + "\n").encode(), compression))
+    return generate_sql.seed
+
+
+if __name__ == '__main__':
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "l:o:s:j:c:vh", ["lines=", "outfile=", "seed=", "jobs=",
+                                                                 "compress=", "version", "help"])
+    except getopt.GetoptError as err:
+        print('ERROR:', err)
+        print("")
+        usage()
+        sys.exit(2)
+    lines = ""
+    outfile = ""
+    seed = None
+    jobs = os.cpu_count()
+    compression = 'none'
+
+    if len(sys.argv) == 1:
         usage()
         sys.exit()
-    elif opt in ("-l", "--lines"):
-        lines = int(arg)
-    elif opt in ("-o", "--outfile"):
-        outfile = arg
-
-if lines == "":
-    LINE_COUNT = 100
-else:
-    LINE_COUNT = lines
-
-# Generate random data
-OUTFILE = "/tmp/" + outfile
-generate_sql = createsql.GenerateSQL(OUTFILE, LINE_COUNT)
-generate_sql.OutFile()
-generate_sql.CreateTable()
-generate_sql.DropTable()
-sys.stdout = sys.__stdout__
-print("DONE! Generated " + OUTFILE)
+
+    for opt, arg in opts:
+        if opt in ("-v", "--version"):
+            print('2.0')
+            sys.exit()
+        elif opt in ("-h", "--help"):
+            usage()
+            sys.exit()
+        elif opt in ("-l", "--lines"):
+            lines = int(arg)
+        elif opt in ("-o", "--outfile"):
+            outfile = arg
+        elif opt in ("-s", "--seed"):
+            seed = int(arg)
+        elif opt in ("-j", "--jobs"):
+            jobs = int(arg)
+        elif opt in ("-c", "--compress"):
+            compression = arg
+
+    if lines == "":
+        LINE_COUNT = 100
+    else:
+        LINE_COUNT = lines
+    if compression not in COMPRESSION:
+        print('ERROR: Unknown compression ' + compression)
+        usage()
+        sys.exit(2)
+    if outfile == "":
+        outfile = "dataload.sql"
+    # File names without a directory go to /tmp as before
+    if os.path.dirname(outfile) == "":
+        OUTFILE = "/tmp/" + outfile
+    else:
+        OUTFILE = outfile
+
+    # Generate random data
+    seed = generate_file(OUTFILE, LINE_COUNT, seed, jobs, compression)
+    print("DONE! Generated " + OUTFILE + " (seed: " + str(seed) + ")")
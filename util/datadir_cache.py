@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# This will help us to initialize a node data directory once
+# and clone it for every node of every test.
+
+import os
+import fcntl
+import hashlib
+import shutil
+import subprocess
+
+
+class DatadirCache:
+    def __init__(self, cache_dir, basedir, debug):
+        self.cache_dir = cache_dir
+        self.basedir = basedir
+        self.debug = debug
+
+    def cache_key(self, init_options):
+        """ Template is keyed by the server build (version string,
+            binary size and mtime) and the initialization options.
+        """
+        mysqld = self.basedir + '/bin/mysqld'
+        version_info = os.popen(mysqld + ' --version 2>&1').read().rstrip()
+        stat = os.stat(mysqld)
+        key = version_info + '|' + str(stat.st_size) + '|' + str(int(stat.st_mtime)) + '|' + init_options
+        return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+    def template(self, init_options, initialize):
+        """ Return the template data directory for init_options.
+            initialize(datadir) is only called if the template
+            does not exist yet. Concurrent tests wait on a lock
+            instead of initializing the same template twice.
+        """
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+        template_dir = self.cache_dir + '/' + self.cache_key(init_options)
+        if os.path.isdir(template_dir):
+            return template_dir
+        with open(template_dir + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if os.path.isdir(template_dir):
+                return template_dir
+            build_dir = template_dir + '.build'
+            if os.path.exists(build_dir):
+                shutil.rmtree(build_dir, ignore_errors=True)
+            os.mkdir(build_dir)
+            if self.debug == 'YES':
+                print('Creating datadir template ' + template_dir)
+            if initialize(build_dir) != 0:
+                shutil.rmtree(build_dir, ignore_errors=True)
+                return None
+            os.rename(build_dir, template_dir)
+        return template_dir
+
+    def clone(self, template_dir, datadir):
+        """ Copy the template into datadir. Reflinks are used where
+            the filesystem supports them. Hardlinks are not an option,
+            InnoDB writes its files in place and would change the template.
+        """
+        if os.path.exists(datadir):
+            shutil.rmtree(datadir, ignore_errors=True)
+        clone_cmd = ['cp', '-a', '--reflink=auto', template_dir, datadir]
+        if self.debug == 'YES':
+            print(' '.join(clone_cmd))
+        return subprocess.call(clone_cmd, stderr=subprocess.DEVNULL)
+
+    def purge(self):
+        # Remove all cached templates
+        if os.path.exists(self.cache_dir):
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+        return 0
@@ -1,16 +1,20 @@
 import random
 import string
+import itertools
 from datetime import datetime, timedelta
 
 date_format = ["%Y-%m-%d", "%y-%m-%d"]
 time_format = ["%T", "%H:%M", "%H", "%T.%f"]
+# Last year of generated dates. A fixed year, so the same seed gives the
+# same data whenever it runs.
+MAX_YEAR = 2025
 
 
 class DataGenerator:
     def __init__(self, data_type):
         self.data_type = data_type
         
-    def gen_datetime(self, min_year=1970, max_year=datetime.now().year):
+    def gen_datetime(self, min_year=1970, max_year=MAX_YEAR):
         # generate a datetime in format yyyy-mm-dd hh:mm:ss.000000
         start = datetime(min_year, 1, 1, 00, 00, 00)
         years = max_year - min_year + 1
@@ -52,3 +56,80 @@ class DataGenerator:
             return data
         else:
             return "sampledata"
+
+
+# Batched generation: values of a whole column are made at once instead of
+# one DataGenerator object per value. Strings are sliced out of one random
+# string, dates are looked up in a table of formatted days.
+LETTERS = string.ascii_letters
+ALPHANUMERIC = string.ascii_letters + string.digits
+EPOCH = datetime(1970, 1, 1)
+_date_table = {}
+
+
+def random_strings(rng, alphabet, lengths):
+    # One random string per length
+    offsets = [0] + list(itertools.accumulate(lengths))
+    text = ''.join(rng.choices(alphabet, k=offsets[-1]))
+    return [text[start:end] for start, end in zip(offsets, offsets[1:])]
+
+
+def date_table(days, fmt):
+    # Formatted dates of the days since 1970-01-01
+    key = (days, fmt)
+    if key not in _date_table:
+        _date_table[key] = [(EPOCH + timedelta(days=day)).strftime(fmt) for day in range(days)]
+    return _date_table[key]
+
+
+def random_times(rng, count):
+    # Same formats as time_format: %T, %H:%M, %H and %T.%f
+    seconds = rng.choices(range(86400), k=count)
+    formats = rng.choices(range(4), k=count)
+    times = []
+    for second, fmt in zip(seconds, formats):
+        hour, minute, sec = second // 3600, second // 60 % 60, second % 60
+        if fmt == 0:
+            times.append('%02d:%02d:%02d' % (hour, minute, sec))
+        elif fmt == 1:
+            times.append('%02d:%02d' % (hour, minute))
+        elif fmt == 2:
+            times.append('%02d' % hour)
+        else:
+            times.append('%02d:%02d:%02d.%06d' % (hour, minute, sec, rng.randrange(1000000)))
+    return times
+
+
+def random_dates(rng, count, max_year=MAX_YEAR):
+    days = (datetime(max_year + 1, 1, 1) - EPOCH).days
+    tables = [date_table(days, fmt) for fmt in date_format]
+    return [tables[fmt][day] for day, fmt in
+            zip(rng.choices(range(days), k=count), rng.choices(range(len(date_format)), k=count))]
+
+
+def column_data(data_type, count, rng=random):
+    """ count random values of data_type as strings, with the
+        same value ranges as DataGenerator.getData
+    """
+    if data_type == "int":
+        return random_strings(rng, string.digits, rng.choices(range(1, 10), k=count))
+    elif data_type == "bigint":
+        return random_strings(rng, string.digits, rng.choices(range(1, 16), k=count))
+    elif data_type == "float":
+        return [str(round(rng.random() * 1000.9, digits)) for digits in rng.choices(range(1, 11), k=count)]
+    elif data_type == "double":
+        return [str(round(rng.random() * 10000.9, digits)) for digits in rng.choices(range(1, 16), k=count)]
+    elif data_type == "char":
+        return rng.choices(LETTERS, k=count)
+    elif data_type == "varchar":
+        return random_strings(rng, LETTERS, rng.choices(range(1, 32), k=count))
+    elif data_type == "text":
+        return random_strings(rng, ALPHANUMERIC, rng.choices(range(1, 51), k=count))
+    elif data_type == "date":
+        return random_dates(rng, count)
+    elif data_type == "time":
+        return random_times(rng, count)
+    elif data_type == "timestamp":
+        return [date + " " + time for date, time in zip(random_dates(rng, count), random_times(rng, count))]
+    else:
+        return ["sampledata"] * count
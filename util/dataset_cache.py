@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# This will help us to load a sysbench dataset once and restore
+# the node data directories from a snapshot in later tests.
+
+import os
+import re
+import fcntl
+import glob
+import hashlib
+import shutil
+import subprocess
+from util import cnf_model
+from util import db_connection
+from util import node_readiness
+from util import sysbench_results
+
+# Files which belong to the running server, not to the dataset
+RUNTIME_FILES = ['mysql.sock', 'mysql.sock.lock', '*.pid', '*.err', 'gvwstate.dat']
+SYSTEM_SCHEMAS = ['mysql', 'information_schema', 'performance_schema', 'sys']
+# Node options with leased ports, they are not part of the server configuration
+LEASED_OPTIONS = ['port', 'wsrep_cluster_address', 'wsrep_sst_receive_address']
+
+
+class DatasetCache:
+    def __init__(self, cache_dir, basedir, workdir, debug):
+        self.cache_dir = cache_dir
+        self.basedir = basedir
+        self.workdir = workdir
+        self.debug = debug
+
+    def running_nodes(self):
+        # Number of cluster nodes with a socket, counted from node1
+        node = 0
+        while os.path.exists(self.workdir + '/node' + str(node + 1) + '/mysql.sock'):
+            node += 1
+        return node
+
+    def server_config(self, node):
+        """ Digest of the server configuration: the node cnf files
+            with their includes (custom.cnf, encryption) and the
+            mysqld options of the startup scripts (my_extra).
+            Workdir paths and leased ports differ between test
+            runs and are left out.
+        """
+        config = []
+        for i in range(1, node + 1):
+            cnf_file = self.workdir + '/conf/node' + str(i) + '.cnf'
+            if os.path.isfile(cnf_file):
+                cnf = cnf_model.CnfFile.load(cnf_file)
+                for option in LEASED_OPTIONS:
+                    cnf.remove(option)
+                config.append(cnf.render())
+                for section in cnf.sections:
+                    for name, path in section.entries:
+                        if name == '!include' and os.path.isfile(path):
+                            config.append(cnf_model.CnfFile.load(path).render())
+            startup = self.workdir + '/log/startup' + str(i) + '.sh'
+            if os.path.isfile(startup):
+                with open(startup) as startup_script:
+                    config.append(startup_script.read().replace(' --wsrep-new-cluster', ''))
+        config = '\n'.join(config).replace(self.workdir, '')
+        config = re.sub(r'(gmcast\.listen_addr=tcp://|ist\.recv_addr=)[^;\']*', r'\1', config)
+        return hashlib.sha1(config.encode()).hexdigest()
+
+    def cache_key(self, lua, db, tables, table_size, node):
+        """ Snapshot is keyed by the sysbench script and its
+            options, the server build and configuration and the
+            node count.
+        """
+        key = '|'.join([lua, db, str(tables), str(table_size), sysbench_results.build_version(self.basedir),
+                        self.server_config(node), str(node)])
+        return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+    def is_fresh(self, socket, db):
+        """ A snapshot replaces the whole data directory, so it is
+            only used if the server has no tables outside db yet.
+        """
+        tables = db_connection.DbConnection('root', socket, self.debug).scalar(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema NOT IN (" +
+            ', '.join(["%s"] * (len(SYSTEM_SCHEMAS) + 1)) + ")", tuple(SYSTEM_SCHEMAS) + (db,))
+        return tables == 0
+
+    def stop_cluster(self, node):
+        # Clean shutdown, node1 goes last so it is safe to bootstrap from
+        for i in range(node, 0, -1):
+            socket = self.workdir + '/node' + str(i) + '/mysql.sock'
+            db_connection.DbConnection('root', socket).close_all()
+            shutdown_node = self.basedir + '/bin/mysqladmin --user=root --socket=' + socket + \
+                ' shutdown > /dev/null 2>&1'
+            if self.debug == 'YES':
+                print(shutdown_node)
+            if os.system(shutdown_node) != 0:
+                return 1
+        return 0
+
+    def start_cluster(self, node):
+        # Start the nodes with their saved startup scripts, node1 bootstraps
+        for i in range(1, node + 1):
+            grastate = self.workdir + '/node' + str(i) + '/grastate.dat'
+            if i == 1 and os.path.isfile(grastate):
+                os.system("sed -i 's/^safe_to_bootstrap:.*/safe_to_bootstrap: 1/' " + grastate)
+            startup = 'bash ' + self.workdir + '/log/startup' + str(i) + '.sh'
+            if self.debug == 'YES':
+                print(startup)
+            waiter = node_readiness.restart_waiter(self.workdir, i, self.debug)
+            os.system(startup)
+            if waiter.wait('synced', 300) != 0:
+                print('ERROR! Cluster node' + str(i) + ' did not start after dataset restore')
+                return 1
+        return 0
+
+    def save_variables(self, node):
+        # SET GLOBAL state of the running nodes, a restart would lose it
+        return [db_connection.DbConnection('root', self.workdir + '/node' + str(i) + '/mysql.sock',
+                                           self.debug).global_variables() for i in range(1, node + 1)]
+
+    def restore_variables(self, saved):
+        # Set the global variables of the test back after the restart
+        for i, variables in enumerate(saved, 1):
+            failed = db_connection.DbConnection('root', self.workdir + '/node' + str(i) + '/mysql.sock',
+                                                self.debug).restore_global_variables(variables)
+            if failed:
+                print('WARNING! Could not set global variables of node' + str(i) + ' back after dataset restore: ' +
+                      ', '.join(failed))
+
+    def copy_datadir(self, source, target):
+        if os.path.exists(target):
+            shutil.rmtree(target, ignore_errors=True)
+        copy_cmd = ['cp', '-a', '--reflink=auto', source, target]
+        if self.debug == 'YES':
+            print(' '.join(copy_cmd))
+        return subprocess.call(copy_cmd, stderr=subprocess.DEVNULL)
+
+    def snapshot(self, key, node):
+        """ Stop the cluster, copy the node data directories
+            into the cache and start the cluster again with the
+            global variables it had.
+        """
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+        snapshot_dir = self.cache_dir + '/' + key
+        variables = self.save_variables(node)
+        if self.stop_cluster(node) != 0:
+            print('ERROR! Could not stop the cluster for dataset snapshot')
+            return 1
+        result = 0
+        with open(snapshot_dir + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if not os.path.isdir(snapshot_dir):
+                build_dir = snapshot_dir + '.build'
+                shutil.rmtree(build_dir, ignore_errors=True)
+                os.mkdir(build_dir)
+                for i in range(1, node + 1):
+                    result = self.copy_datadir(self.workdir + '/node' + str(i), build_dir + '/node' + str(i))
+                    if result != 0:
+                        break
+                    for pattern in RUNTIME_FILES:
+                        for file in glob.glob(build_dir + '/node' + str(i) + '/' + pattern):
+                            os.remove(file)
+                if result == 0:
+                    os.rename(build_dir, snapshot_dir)
+                else:
+                    shutil.rmtree(build_dir, ignore_errors=True)
+        if self.start_cluster(node) != 0:
+            return 1
+        self.restore_variables(variables)
+        return result
+
+    def has_snapshot(self, key):
+        return os.path.isdir(self.cache_dir + '/' + key)
+
+    def restore(self, key, node):
+        """ Stop the cluster, replace the node data directories
+            with the snapshot and start the cluster again with the
+            global variables it had.
+        """
+        snapshot_dir = self.cache_dir + '/' + key
+        if not self.has_snapshot(key):
+            return 1
+        variables = self.save_variables(node)
+        if self.stop_cluster(node) != 0:
+            print('ERROR! Could not stop the cluster for dataset restore')
+            return 1
+        for i in range(1, node + 1):
+            if self.copy_datadir(snapshot_dir + '/node' + str(i), self.workdir + '/node' + str(i)) != 0:
+                print('ERROR! Could not restore node' + str(i) + ' data directory from ' + snapshot_dir)
+                return 1
+        if self.start_cluster(node) != 0:
+            return 1
+        self.restore_variables(variables)
+        return 0
+
+    def purge(self):
+        # Remove all dataset snapshots
+        if os.path.exists(self.cache_dir):
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+        return 0
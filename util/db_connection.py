@@ -1,10 +1,169 @@
+import re
+import threading
+from collections import namedtuple
 import mysql.connector
 
+# Idle connections kept per (user, socket)
+POOL_SIZE = 8
+# Global variables which change on their own or are reset separately
+SKIP_VARIABLES = ('gtid_', 'wsrep_start_position')
+# Size suffixes are accepted in my.cnf but not by SET GLOBAL
+SIZE_SUFFIX = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+
+
+def sql_value(value):
+    """ Option or variable value as SET GLOBAL parameter.
+        Numbers are passed as numbers, size suffixes are
+        expanded.
+    """
+    if re.match(r'^-?\d+$', value):
+        return int(value)
+    size = re.match(r'^(\d+)([KMG])$', value, re.I)
+    if size:
+        return int(size.group(1)) * SIZE_SUFFIX[size.group(2).upper()]
+    if re.match(r'^-?\d+\.\d+$', value):
+        return float(value)
+    return value
+
 
 class DbConnection:
-    def __init__(self, user, socket):
+    # Connection pool shared by every DbConnection object of the process,
+    # keyed by (user, socket). A connection is used by one thread at a time.
+    _pool = {}
+    _pool_lock = threading.Lock()
+    _row_types = {}
+
+    def __init__(self, user, socket, debug=None):
         self.user = user
         self.socket = socket
+        self.debug = debug
+        self.key = (user, socket)
+
+    def connect(self):
+        # New autocommit connection through the unix socket
+        return mysql.connector.connect(host='localhost', user=self.user, unix_socket=self.socket,
+                                       autocommit=True)
+
+    def acquire(self):
+        with DbConnection._pool_lock:
+            idle = DbConnection._pool.get(self.key)
+            if idle:
+                return idle.pop()
+        return self.connect()
+
+    def release(self, connection):
+        with DbConnection._pool_lock:
+            idle = DbConnection._pool.setdefault(self.key, [])
+            if len(idle) < POOL_SIZE:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def close_all(self):
+        """ Close the pooled connections of this socket. Used
+            before a server is stopped or restarted so the next
+            query does not pick up a dead connection.
+        """
+        with DbConnection._pool_lock:
+            idle = DbConnection._pool.pop(self.key, [])
+        for connection in idle:
+            try:
+                connection.close()
+            except mysql.connector.Error:
+                pass
+
+    def row_type(self, columns):
+        # Result rows are namedtuples, columns like @@port are renamed to _0.._n
+        columns = tuple(columns)
+        with DbConnection._pool_lock:
+            if columns not in DbConnection._row_types:
+                DbConnection._row_types[columns] = namedtuple('Row', columns, rename=True)
+            return DbConnection._row_types[columns]
+
+    def run(self, statement, params=None, many=False):
+        """ Run one statement on a pooled connection. A connection
+            which was closed by a server restart is replaced once.
+        """
+        if self.debug == 'YES':
+            print(self.socket + ': ' + statement)
+        for attempt in range(2):
+            connection = self.acquire()
+            try:
+                cursor = connection.cursor()
+                if many:
+                    cursor.executemany(statement, params)
+                else:
+                    cursor.execute(statement, params)
+                if cursor.with_rows:
+                    row_type = self.row_type(cursor.column_names)
+                    result = [row_type(*row) for row in cursor.fetchall()]
+                else:
+                    result = cursor.rowcount
+                cursor.close()
+            except (mysql.connector.InterfaceError, mysql.connector.OperationalError):
+                stale = not connection.is_connected()
+                connection.close()
+                if attempt == 0 and stale:
+                    continue
+                raise
+            except mysql.connector.Error:
+                self.release(connection)
+                raise
+            self.release(connection)
+            return result
+
+    def query(self, statement, params=None):
+        # Return the result set as a list of rows
+        result = self.run(statement, params)
+        if isinstance(result, list):
+            return result
+        return []
+
+    def scalar(self, statement, params=None):
+        # Return the first column of the first row, None if there is no row
+        rows = self.query(statement, params)
+        if not rows:
+            return None
+        return rows[0][0]
+
+    def execute(self, statement, params=None):
+        """ Run a statement without result set. Returns 0 on
+            success and 1 on error, like the mysql client exit code.
+        """
+        try:
+            self.run(statement, params)
+        except mysql.connector.Error as e:
+            print("ERROR! Query execution failed: " + statement + " : " + str(e))
+            return 1
+        return 0
+
+    def execute_many(self, statement, seq_params):
+        # Run statement for every parameter set, returns the affected row count
+        return self.run(statement, seq_params, many=True)
+
+    def global_variables(self):
+        # Global variables a test can change with SET GLOBAL, name -> value
+        rows = self.query("SELECT LOWER(VARIABLE_NAME), GLOBAL_VALUE FROM information_schema.SYSTEM_VARIABLES "
+                          "WHERE READ_ONLY = 'NO' AND VARIABLE_SCOPE != 'SESSION ONLY'")
+        return dict((row[0], row[1]) for row in rows if not row[0].startswith(SKIP_VARIABLES))
+
+    def restore_global_variables(self, saved):
+        """ SET GLOBAL every variable whose value differs from
+            saved (a global_variables() result). Returns the
+            names of the variables which could not be set.
+        """
+        failed = []
+        for name, current in self.global_variables().items():
+            if name not in saved or saved[name] == current:
+                continue
+            value = saved[name]
+            try:
+                self.run("SET GLOBAL " + name + " = %s", (value if value is None else sql_value(value),))
+            except mysql.connector.Error as e:
+                if self.debug == 'YES':
+                    print(self.socket + ': could not set ' + name + ' back: ' + str(e))
+                failed.append(name)
+        return failed
 
     def connection_check(self):
         """ Method to test the cluster database connection.
@@ -14,7 +173,7 @@ class DbConnection:
             without password.
         """
         # Database connection string
-        connection = mysql.connector.connect(host='localhost', user=self.user, unix_socket=self.socket)
+        connection = self.connect()
         try:
             if connection.is_connected():
                 # db_info = connection.get_server_info()
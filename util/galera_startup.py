@@ -3,11 +3,23 @@
 # This will help us to start Percona XtraDB Cluster
 
 import os
+import re
 import subprocess
-import random
 import shutil
 import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from util import sanity
+from util import port_allocator
+from util import datadir_cache
+from util import node_readiness
+from util import cnf_model
+from config import *
+
+# Seconds a node may take to start and sync
+NODE_STARTUP_TIMEOUT = 120
+# SST methods which block the donor for the whole transfer
+BLOCKING_SST_METHODS = ('rsync', 'mysqldump')
 
 
 class StartCluster:
@@ -17,6 +29,7 @@ class StartCluster:
         self.basedir = basedir
         self.node = node
         self.debug = debug
+        self.node_timings = {}
 
     def sanity_check(self):
         """ Sanity check method will remove existing
@@ -48,71 +61,80 @@ class StartCluster:
         if wsrep_provider_option is None:
             wsrep_provider_option = ''
         version = sanity.version_check(self.basedir)
-        port = random.randint(44, 55) * 100
+        node_ports = port_allocator.get_allocator(self.debug).lease(self.workdir, int(self.node))
+        if node_ports is None:
+            return 1
         port_list = []
         addr_list = ''
         for j in range(1, int(self.node) + 1):
-            port_list += [port + (j * 100)]
-            addr_list = addr_list + '127.0.0.1:' + str(port + (j * 100) + 8) + ','
+            port_list += [node_ports[j - 1].client]
+            addr_list = addr_list + '127.0.0.1:' + str(node_ports[j - 1].gcomm) + ','
         if not os.path.isfile(self.scriptdir + '/conf/mdg.cnf'):
             print('Default mdg.cnf is missing in ' + self.scriptdir + '/conf')
             return 1
         else:
             shutil.copy(self.scriptdir + '/conf/custom.cnf', self.workdir + '/conf/custom.cnf')
+        default_cnf = cnf_model.CnfFile.load(self.scriptdir + '/conf/mdg.cnf')
+        if wsrep_extra != "none":
+            sanity.create_ssl_certificate(self.workdir)
+            sanity.add_ssl_config(self.workdir, wsrep_extra)
+        hostname = None
+        if wsrep_extra == "encrypt2":
+            hostname = os.popen('hostname').read().rstrip()
         for i in range(1, self.node + 1):
-            shutil.copy(self.scriptdir + '/conf/mdg.cnf',
-                        self.workdir + '/conf/node' + str(i) + '.cnf')
-            cnf_name = open(self.workdir + '/conf/node' + str(i) + '.cnf', 'a+')
-            if self.debug == 'YES':
-                cnf_name.write('wsrep-debug=1\n')
-            cnf_name.write('wsrep_cluster_address=gcomm://' + addr_list + '\n')
-            cnf_name.write('port=' + str(port_list[i - 1]) + '\n')
-            cnf_name.write('wsrep-provider = ' + self.basedir + '/lib/libgalera_smm.so\n')
-            cnf_name.write('basedir = ' + self.basedir + '\n')
-            cnf_name.write('datadir = ' + self.workdir + '/node' + str(i) + '\n')
-            cnf_name.write('socket = ' + self.workdir + '/node' + str(i) + '/mysql.sock\n')
-            cnf_name.write('log_error = ' + self.workdir + '/node' + str(i) + '/node' + str(i) + '.err\n')
-            cnf_name.write('server_id=' + str(10 + i) + '\n')
-            #if wsrep_extra == "gtid":
-            #    cnf_name.write('gtid_domain_id=' + str(20 + i) + '\n')
-            cnf_name.write('!include ' + self.workdir + '/conf/custom.cnf\n')
-            if wsrep_extra != "none":
-                cnf_name.write("wsrep_provider_options='gmcast.listen_addr=tcp://127.0.0.1:"
-                               + str(port_list[i - 1] + 8) + ';' + wsrep_provider_option + 'socket.ssl_key='
-                               + self.workdir + '/cert/server-key.pem;socket.ssl_cert='
-                               + self.workdir + '/cert/server-cert.pem;socket.ssl_ca='
-                               + self.workdir + "/cert/ca.pem'\n")
-                #if int(version) >= int("1006"):
-                #    cnf_name.write('wsrep-ssl-mode=SERVER\n')
-                sanity.create_ssl_certificate(self.workdir)
-                sanity.add_ssl_config(self.workdir, wsrep_extra)
-                cnf_name.write('ssl-ca = ' + self.workdir + '/cert/ca.pem\n')
-                cnf_name.write('ssl-cert = ' + self.workdir + '/cert/server-cert.pem\n')
-                cnf_name.write('ssl-key = ' + self.workdir + '/cert/server-key.pem\n')
-                if wsrep_extra == "encrypt2":
-                    cnf_name.write('[sst]\n')
-                    cnf_name.write('encrypt = 2\n')
-                    cnf_name.write('tca = ' + self.workdir + '/cert/sst_encypt2.crt\n')
-                    cnf_name.write('tcert = ' + self.workdir + '/cert/sst_encypt2.pem\n')
-                elif wsrep_extra == "encrypt3":
-                    cnf_name.write('[sst]\n')
-                    cnf_name.write('encrypt = 3\n')
-                    cnf_name.write('tcert = ' + self.workdir + '/cert/server-cert.pem\n')
-                    cnf_name.write('tkey = ' + self.workdir + '/cert/server-key.pem\n')
-            else:
-                #if int(version) >= int("1006"):
-                    #cnf_name.write('wsrep-ssl-mode=PROVIDER\n')
-                cnf_name.write("wsrep_provider_options='gmcast.listen_addr=tcp://127.0.0.1:"
-                               + str(port_list[i - 1] + 8) + ';' + wsrep_provider_option + "'\n")
-            cnf_name.close()
-            if wsrep_extra == "encrypt2":
-                hostname = os.popen('hostname').read().rstrip()
-                os.system("sed -i 's|wsrep_node_address=127.0.0.1|wsrep_node_address="
-                          + hostname + "|' " + self.workdir + '/conf/node' + str(i) + '.cnf')
-                os.system("sed -i 's|wsrep_node_incoming_address=127.0.0.1|wsrep_node_incoming_address="
-                          + hostname + "|' " + self.workdir + '/conf/node' + str(i) + '.cnf')
+            cnf = self.node_config(default_cnf, i, node_ports[i - 1], addr_list, port_list[i - 1],
+                                   wsrep_extra, wsrep_provider_option, hostname)
+            cnf.write(self.workdir + '/conf/node' + str(i) + '.cnf')
         return 0
 
+    def node_config(self, default_cnf, i, ports, addr_list, port, wsrep_extra, wsrep_provider_option, hostname):
+        """ Configuration of cluster node i, built from the
+            defaults in conf/mdg.cnf
+        """
+        cnf = default_cnf.copy()
+        if self.debug == 'YES':
+            cnf.set('wsrep-debug', '1')
+        cnf.set('wsrep_cluster_address', 'gcomm://' + addr_list)
+        cnf.set('port', str(port))
+        cnf.set('wsrep-provider', self.basedir + '/lib/libgalera_smm.so')
+        cnf.set('basedir', self.basedir)
+        cnf.set('datadir', self.workdir + '/node' + str(i))
+        cnf.set('socket', self.workdir + '/node' + str(i) + '/mysql.sock')
+        cnf.set('log_error', self.workdir + '/node' + str(i) + '/node' + str(i) + '.err')
+        cnf.set('server_id', str(10 + i))
+        cnf.set('wsrep_sst_receive_address', '127.0.0.1:' + str(ports.sst))
+        #if wsrep_extra == "gtid":
+        #    cnf.set('gtid_domain_id', str(20 + i))
+        cnf.include(self.workdir + '/conf/custom.cnf')
+        provider_options = 'gmcast.listen_addr=tcp://127.0.0.1:' + str(ports.gcomm) + \
+            ';ist.recv_addr=127.0.0.1:' + str(ports.ist) + ';' + wsrep_provider_option
+        if wsrep_extra != "none":
+            cnf.set('wsrep_provider_options', "'" + provider_options + 'socket.ssl_key=' + self.workdir +
+                    '/cert/server-key.pem;socket.ssl_cert=' + self.workdir +
+                    '/cert/server-cert.pem;socket.ssl_ca=' + self.workdir + "/cert/ca.pem'")
+            #if int(version) >= int("1006"):
+            #    cnf.set('wsrep-ssl-mode', 'SERVER')
+            cnf.set('ssl-ca', self.workdir + '/cert/ca.pem')
+            cnf.set('ssl-cert', self.workdir + '/cert/server-cert.pem')
+            cnf.set('ssl-key', self.workdir + '/cert/server-key.pem')
+            if wsrep_extra == "encrypt2":
+                cnf.set('encrypt', '2', 'sst')
+                cnf.set('tca', self.workdir + '/cert/sst_encypt2.crt', 'sst')
+                cnf.set('tcert', self.workdir + '/cert/sst_encypt2.pem', 'sst')
+                # Nodes and SST address with the host name, it is in the certificate
+                cnf.set('wsrep_node_address', hostname)
+                cnf.set('wsrep_node_incoming_address', hostname)
+                cnf.set('wsrep_sst_receive_address', hostname + ':' + str(ports.sst))
+            elif wsrep_extra == "encrypt3":
+                cnf.set('encrypt', '3', 'sst')
+                cnf.set('tcert', self.workdir + '/cert/server-cert.pem', 'sst')
+                cnf.set('tkey', self.workdir + '/cert/server-key.pem', 'sst')
+        else:
+            #if int(version) >= int("1006"):
+            #    cnf.set('wsrep-ssl-mode', 'PROVIDER')
+            cnf.set('wsrep_provider_options', "'" + provider_options + "'")
+        return cnf
+
     def add_myextra_configuration(self, config_file):
         """ Adding extra configurations
             based on the testcase
@@ -127,11 +149,30 @@ class StartCluster:
         cnf_name.close()
         return 0
 
+    def initialize_datadir(self, datadir, log_file, init_extra, version):
+        # Initialize one data directory
+        if int(version) < int("1004"):
+            if not os.path.exists(datadir):
+                os.mkdir(datadir)
+            initialize_node = self.basedir + '/scripts/mysql_install_db --no-defaults --force ' \
+                                             '--basedir=' + self.basedir + ' --datadir=' + \
+                                             datadir + ' > ' + log_file + ' 2>&1'
+        else:
+            initialize_node = self.basedir + '/scripts/mariadb-install-db --no-defaults --force ' \
+                            ' --auth-root-authentication-method=normal ' + init_extra + \
+                            ' --basedir=' + self.basedir + \
+                            ' --datadir=' + datadir + ' > ' + log_file + ' 2>&1'
+        if self.debug == 'YES':
+            print(initialize_node)
+        return subprocess.call(initialize_node, shell=True, stderr=subprocess.DEVNULL)
+
     def initialize_cluster(self, init_extra=None):
         """ Method to initialize the cluster database
             directories. This will initialize the cluster
             using --initialize-insecure option for
-            passwordless authentication.
+            passwordless authentication. If datadir_cache
+            is set in config.ini, the data directory is
+            initialized once and cloned for every node.
         """
         result = ""
         if init_extra is None:
@@ -139,84 +180,131 @@ class StartCluster:
         # This is for encryption testing. Encryption features are not fully supported
         # if wsrep_extra == "encryption":
         #    init_opt = '--innodb_undo_tablespaces=2 '
+        version = sanity.version_check(self.basedir)
+        template_dir = None
+        if DATADIR_CACHE:
+            cache = datadir_cache.DatadirCache(DATADIR_CACHE, self.basedir, self.debug)
+            template_dir = cache.template(init_extra, lambda datadir: self.initialize_datadir(
+                datadir, self.workdir + '/log/startup_template.log', init_extra, version))
+            if template_dir is None:
+                print('Could not create data directory template, check ' +
+                      self.workdir + '/log/startup_template.log')
+                return 1
         for i in range(1, self.node + 1):
-            if os.path.exists(self.workdir + '/node' + str(i)):
-                os.system('rm -rf ' + self.workdir + '/node' + str(i) + '>/dev/null 2>&1')
             if not os.path.isfile(self.workdir + '/conf/node' + str(i) + '.cnf'):
                 print('Could not find config file /conf/node' + str(i) + '.cnf')
                 exit(1)
-            version = sanity.version_check(self.basedir)
-            if int(version) < int("1004"):
-                os.mkdir(self.workdir + '/node' + str(i))
-                initialize_node = self.basedir + '/scripts/mysql_install_db --no-defaults --force ' \
-                                                 '--basedir=' + self.basedir + ' --datadir=' + \
-                                                 self.workdir + '/node' + str(i) + ' > ' + \
-                                                 self.workdir + '/log/startup' + str(i) + '.log 2>&1'
+
+        def initialize_node(i):
+            # Data directories are independent, so every node can be initialized at once
+            node_start = time.time()
+            if os.path.exists(self.workdir + '/node' + str(i)):
+                os.system('rm -rf ' + self.workdir + '/node' + str(i) + '>/dev/null 2>&1')
+            if template_dir is not None:
+                run_query = cache.clone(template_dir, self.workdir + '/node' + str(i))
             else:
-                initialize_node = self.basedir + '/scripts/mariadb-install-db --no-defaults --force ' \
-                                ' --auth-root-authentication-method=normal ' + init_extra + \
-                                ' --basedir=' + self.basedir + \
-                                ' --datadir=' + self.workdir + '/node' + str(i) + ' > ' + \
-                                self.workdir + '/log/startup' + str(i) + '.log 2>&1'
-            if self.debug == 'YES':
-                print(initialize_node)
-            run_query = subprocess.call(initialize_node, shell=True, stderr=subprocess.DEVNULL)
-            result = ("{}".format(run_query))
+                run_query = self.initialize_datadir(self.workdir + '/node' + str(i),
+                                                    self.workdir + '/log/startup' + str(i) + '.log',
+                                                    init_extra, version)
+            self.node_timings['node' + str(i) + ' initialize'] = time.time() - node_start
+            return run_query
+
+        if PARALLEL_STARTUP == 'yes':
+            with ThreadPoolExecutor(max_workers=self.node) as executor:
+                results = list(executor.map(initialize_node, range(1, self.node + 1)))
+        else:
+            results = [initialize_node(i) for i in range(1, self.node + 1)]
+        self.print_timings('initialize')
+        result = ("{}".format(max(results)))
         return int(result)
 
+    def print_timings(self, phase):
+        # Print per node timings of the given startup phase
+        for name in sorted(self.node_timings):
+            if name.endswith(' ' + phase):
+                now = datetime.now().strftime("%H:%M:%S ")
+                text = 'Cluster ' + name + ' time'
+                print(now + ' ' + f'{text:100}' + '[ ' + '{:.2f}'.format(self.node_timings[name]) + 's ]')
+
+    def start_node(self, i, my_extra, repl_opts, rr_check, timeout=NODE_STARTUP_TIMEOUT):
+        """ Start one cluster node and wait till it
+            accepts connections and is synced. Node1
+            bootstraps the cluster with --wsrep-new-cluster.
+        """
+        node_start = time.time()
+        ping_status = ""
+        gtid_domain_id = ""
+        if repl_opts == "msr":
+            gtid_domain_id = ' --gtid_domain_id=2' + str(i)
+        if i == 1:
+            if rr_check == "NO":
+                startup = self.basedir + '/bin/mysqld --defaults-file=' + self.workdir + '/conf/node' + str(i) + \
+                      '.cnf ' + my_extra + gtid_domain_id + ' --wsrep-new-cluster > ' + self.workdir + \
+                      '/node' + str(i) + '/node' + str(i) + '.err 2>&1 &'
+            else:
+                if os.path.exists(self.workdir + '/rr'):
+                    os.system('rm -rf ' + self.workdir + '/rr >/dev/null 2>&1')
+                os.mkdir(self.workdir + '/rr')
+                startup = 'export_RR_TRACE_DIR = "' + self.workdir + '/rr' \
+                          '" ; /usr/bin/rr record --chaos ' + \
+                          self.basedir + '/bin/mysqld --defaults-file=' + self.workdir + '/conf/node' + str(i) + \
+                          '.cnf ' + my_extra + gtid_domain_id + ' --wsrep-new-cluster > ' + self.workdir + \
+                          '/node' + str(i) + '/node' + str(i) + '.err 2>&1 &'
+        else:
+            startup = self.basedir + '/bin/mysqld --defaults-file=' + self.workdir + '/conf/node' + str(i) + \
+                '.cnf ' + my_extra + gtid_domain_id + ' > ' + self.workdir + '/node' + str(i) + '/node' + \
+                str(i) + '.err 2>&1 &'
+
+        save_startup = 'echo "' + startup + '" > ' + self.workdir + \
+                       '/log/startup' + str(i) + '.sh'
+        os.system(save_startup)
+        if self.debug == 'YES':
+            print(startup)
+        subprocess.call(startup, shell=True, stderr=subprocess.DEVNULL)
+        ping_status = node_readiness.wait_for_node(self.workdir, i, self.debug, 'synced', timeout)
+        if int(ping_status) == 0:
+            query = self.basedir + '/bin/mysql --user=root ' \
+                                   '--socket=' + self.workdir + '/node' + str(i) + '/mysql.sock -Bse"' \
+                                   "SET SESSION sql_log_bin=0;delete from mysql.user where user='';" \
+                                   '" > /dev/null 2>&1'
+            if self.debug == 'YES':
+                print(query)
+            os.system(query)
+        self.node_timings['node' + str(i) + ' startup'] = time.time() - node_start
+        return int(ping_status)
+
+    def sst_method(self, i):
+        # wsrep_sst_method in the cnf of node i, rsync is the server default
+        cnf = cnf_model.CnfFile.load(self.workdir + '/conf/node' + str(i) + '.cnf')
+        return (cnf.get('wsrep_sst_method') or 'rsync').strip()
+
     def start_cluster(self, my_extra=None, repl_opts=None):
         """ Method to start the cluster nodes. This method
-            will also check the startup status.
+            will also check the startup status. With
+            parallel_startup enabled, the joiners are
+            started together once node1 is up. Every joiner
+            needs a full SST from node1, so they are started
+            one by one for SST methods which block the donor,
+            otherwise their wait grows with the number of
+            joiners queued on the donor.
         """
-        ping_status = ""
         rr_check = "NO"
-        gtid_domain_id = ""
         if my_extra is None:
             my_extra = ''
         if repl_opts is None:
             repl_opts = ''
-        for i in range(1, self.node + 1):
-            if repl_opts == "msr":
-                gtid_domain_id = ' --gtid_domain_id=2' + str(i)
-            if i == 1:
-                if rr_check == "NO":
-                    startup = self.basedir + '/bin/mysqld --defaults-file=' + self.workdir + '/conf/node' + str(i) + \
-                          '.cnf ' + my_extra + gtid_domain_id + ' --wsrep-new-cluster > ' + self.workdir + \
-                          '/node' + str(i) + '/node' + str(i) + '.err 2>&1 &'
-                else:
-                    if os.path.exists(self.workdir + '/rr'):
-                        os.system('rm -rf ' + self.workdir + '/rr >/dev/null 2>&1')
-                    os.mkdir(self.workdir + '/rr')
-                    startup = 'export_RR_TRACE_DIR = "' + self.workdir + '/rr' \
-                              '" ; /usr/bin/rr record --chaos ' + \
-                              self.basedir + '/bin/mysqld --defaults-file=' + self.workdir + '/conf/node' + str(i) + \
-                              '.cnf ' + my_extra + gtid_domain_id + ' --wsrep-new-cluster > ' + self.workdir + \
-                              '/node' + str(i) + '/node' + str(i) + '.err 2>&1 &'
+        ping_status = self.start_node(1, my_extra, repl_opts, rr_check)
+        if int(ping_status) == 0 and self.node > 1:
+            joiners = range(2, self.node + 1)
+            sst_method = re.search(r'--wsrep[-_]sst[-_]method=(\S+)', my_extra)
+            sst_method = sst_method.group(1) if sst_method else self.sst_method(2)
+            if PARALLEL_STARTUP == 'yes' and sst_method not in BLOCKING_SST_METHODS:
+                timeout = NODE_STARTUP_TIMEOUT * len(joiners)
+                with ThreadPoolExecutor(max_workers=self.node - 1) as executor:
+                    results = list(executor.map(lambda i: self.start_node(i, my_extra, repl_opts, rr_check,
+                                                                          timeout), joiners))
             else:
-                startup = self.basedir + '/bin/mysqld --defaults-file=' + self.workdir + '/conf/node' + str(i) + \
-                    '.cnf ' + my_extra + gtid_domain_id + ' > ' + self.workdir + '/node' + str(i) + '/node' + \
-                    str(i) + '.err 2>&1 &'
-
-            save_startup = 'echo "' + startup + '" > ' + self.workdir + \
-                           '/log/startup' + str(i) + '.sh'
-            os.system(save_startup)
-            if self.debug == 'YES':
-                print(startup)
-            subprocess.call(startup, shell=True, stderr=subprocess.DEVNULL)
-            ping_query = self.basedir + '/bin/mysqladmin --user=root --socket=' + self.workdir + \
-                '/node' + str(i) + '/mysql.sock ping > /dev/null 2>&1'
-            for startup_timer in range(120):
-                ping_check = subprocess.call(ping_query, shell=True, stderr=subprocess.DEVNULL)
-                ping_status = ("{}".format(ping_check))
-                if int(ping_status) == 0:
-                    query = self.basedir + '/bin/mysql --user=root ' \
-                                           '--socket=' + self.workdir + '/node' + str(i) + '/mysql.sock -Bse"' \
-                                           "SET SESSION sql_log_bin=0;delete from mysql.user where user='';" \
-                                           '" > /dev/null 2>&1'
-                    if self.debug == 'YES':
-                        print(query)
-                    os.system(query)
-                    break  # break the loop if mysqld is running
-                time.sleep(1)
-
+                results = [self.start_node(i, my_extra, repl_opts, rr_check) for i in joiners]
+            ping_status = max(results)
+        self.print_timings('startup')
         return int(ping_status)
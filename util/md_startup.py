@@ -4,10 +4,10 @@
 
 import os
 import subprocess
-import random
 import shutil
 import time
 from util import sanity
+from util import port_allocator
 
 
 class StartPerconaServer:
@@ -56,10 +56,12 @@ class StartPerconaServer:
             in conf/custom.conf.
         """
         version = sanity.version_check(self.basedir)    # Get server version
-        port = random.randint(35, 43) * 100
+        server_ports = port_allocator.get_allocator(self.debug).lease(self.workdir + '#md', int(self.node))
+        if server_ports is None:
+            return 1
         port_list = []
         for j in range(1, self.node + 1):
-            port_list += [port + (j * 100)]
+            port_list += [server_ports[j - 1].client]
         # Create PS configuration file
         if not os.path.isfile(self.scriptdir + '/conf/md.cnf'):
             print('Default mdg.cnf is missing in ' + self.scriptdir + '/conf')
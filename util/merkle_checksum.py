@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# This will help us to find the divergent primary key ranges of
+# big tables without pt-table-checksum. Every node hashes primary
+# key ranges, only the ranges which differ are split and hashed again.
+
+from concurrent.futures import ThreadPoolExecutor
+import mysql.connector
+from util import db_connection
+from util import cluster_checksum
+
+INTEGER_TYPES = ['tinyint', 'smallint', 'mediumint', 'int', 'bigint']
+# Number of child ranges a mismatching range is split into
+FANOUT = 16
+# Ranges with at most this many keys are reported instead of split
+LEAF_SIZE = 1000
+
+
+class MerkleChecksum:
+    def __init__(self, sockets, debug, fanout=FANOUT, leaf_size=LEAF_SIZE):
+        self.sockets = sockets
+        self.debug = debug
+        self.fanout = fanout
+        self.leaf_size = leaf_size
+        self.executor = None
+
+    def connection(self, socket):
+        return db_connection.DbConnection('root', socket, self.debug)
+
+    def primary_key(self, db, table):
+        # Single column integer primary key of the table, None otherwise
+        rows = self.connection(self.sockets[0]).query(
+            "SELECT s.column_name, c.data_type FROM information_schema.statistics s "
+            "JOIN information_schema.columns c ON c.table_schema = s.table_schema "
+            "AND c.table_name = s.table_name AND c.column_name = s.column_name "
+            "WHERE s.table_schema = %s AND s.table_name = %s AND s.index_name = 'PRIMARY'",
+            (db, table))
+        if len(rows) != 1 or rows[0][1].lower() not in INTEGER_TYPES:
+            return None
+        return rows[0][0]
+
+    def row_hash(self, db, table):
+        """ Row hash expression. NULL and empty string have to
+            hash differently, so the NULL flags of all columns
+            are added like pt-table-checksum does.
+        """
+        columns = ['`' + row[0] + '`' for row in self.connection(self.sockets[0]).query(
+            "SELECT column_name FROM information_schema.columns WHERE table_schema = %s "
+            "AND table_name = %s ORDER BY ordinal_position", (db, table))]
+        null_flags = 'CONCAT(' + ', '.join('ISNULL(' + column + ')' for column in columns) + ')'
+        return "CAST(CONV(LEFT(MD5(CONCAT_WS('#', " + ', '.join(columns) + ', ' + \
+            null_flags + ')), 16), 16, 10) AS UNSIGNED)'
+
+    def node_results(self, function, *args):
+        # Run function(socket, *args) on all nodes at once
+        return list(self.executor.map(lambda socket: function(socket, *args), self.sockets))
+
+    def key_bounds(self, socket, db, table, pk):
+        return tuple(self.connection(socket).query(
+            "SELECT MIN(`" + pk + "`), MAX(`" + pk + "`) FROM `" + db + "`.`" + table + "`")[0])
+
+    def range_hash(self, socket, db, table, pk, hash_expr, key_range):
+        # Row count and XOR of the row hashes of pk in [low, high)
+        return tuple(self.connection(socket).query(
+            "SELECT COUNT(*), COALESCE(BIT_XOR(" + hash_expr + "), 0) FROM `" + db + "`.`" +
+            table + "` WHERE `" + pk + "` >= %s AND `" + pk + "` < %s", key_range)[0])
+
+    def diff_ranges(self, db, table, pk):
+        """ Return the list of [low, high) primary key ranges
+            which are not identical on all nodes, with the row
+            count of each node.
+        """
+        hash_expr = self.row_hash(db, table)
+        bounds = [bound for bound in self.node_results(self.key_bounds, db, table, pk) if bound[0] is not None]
+        if not bounds:
+            return []
+        level = [(min(bound[0] for bound in bounds), max(bound[1] for bound in bounds) + 1)]
+        diffs = []
+        while level:
+            futures = [(key_range, [self.executor.submit(self.range_hash, socket, db, table, pk,
+                                                         hash_expr, key_range)
+                                    for socket in self.sockets]) for key_range in level]
+            next_level = []
+            for key_range, node_futures in futures:
+                hashes = [future.result() for future in node_futures]
+                if len(set(hashes)) == 1:
+                    continue
+                low, high = key_range
+                if high - low <= self.leaf_size:
+                    diffs.append([low, high, [row_count for row_count, _ in hashes]])
+                    continue
+                step = -(-(high - low) // self.fanout)
+                next_level += [(start, min(start + step, high)) for start in range(low, high, step)]
+            if self.debug == 'YES':
+                print(db + '.' + table + ': ' + str(len(next_level)) + ' ranges to compare')
+            level = next_level
+        # Merge neighbour ranges
+        merged = []
+        for diff in sorted(diffs):
+            if merged and merged[-1][1] == diff[0]:
+                merged[-1][1] = diff[1]
+                merged[-1][2] = [a + b for a, b in zip(merged[-1][2], diff[2])]
+            else:
+                merged.append(diff)
+        return merged
+
+    def check(self, db):
+        """ Compare all tables of db across the nodes. Tables
+            without a single column integer primary key are
+            compared with CHECKSUM TABLE. Returns 0 if all tables
+            are identical, otherwise 1.
+        """
+        table_check = cluster_checksum.ClusterChecksum(self.sockets, self.debug)
+        result = 0
+        try:
+            tables = sorted(set().union(*[table_check.table_list(socket, db) for socket in self.sockets]))
+        except mysql.connector.Error as e:
+            print("ERROR! Could not compare " + db + " : " + str(e))
+            return 1
+        self.executor = ThreadPoolExecutor(max_workers=len(self.sockets) * cluster_checksum.NODE_CONCURRENCY)
+        try:
+            for table in tables:
+                try:
+                    pk = self.primary_key(db, table)
+                    if pk is None:
+                        checksums = self.node_results(table_check.table_checksum, db, table)
+                        if len(set(checksums)) != 1 or checksums[0] is None:
+                            print("\tTable(" + db + '.' + table + " ) checksum is different : " + str(checksums))
+                            result = 1
+                        continue
+                    for low, high, row_counts in self.diff_ranges(db, table, pk):
+                        print("\tTable(" + db + '.' + table + " ) rows " + pk + " >= " + str(low) + " AND " +
+                              pk + " < " + str(high) + " are different (row count per node : " +
+                              str(row_counts) + ")")
+                        result = 1
+                except mysql.connector.Error as e:
+                    # e.g. the table is missing on one node
+                    print("\tTable(" + db + '.' + table + " ) is different : " + str(e))
+                    result = 1
+        finally:
+            self.executor.shutdown()
+        return result
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# This will help us to wait for cluster node startup without
+# forking mysqladmin/mysql clients in a loop.
+
+import os
+import re
+import time
+import select
+import socket
+import ctypes
+import ctypes.util
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+# Error log lines which tell us the node state
+STATE_PATTERNS = [
+    ('joined', re.compile(r'WSREP: (Server status change \S+ -> joined|Shifting \S+ -> JOINED)', re.I)),
+    ('synced', re.compile(r'WSREP: (Server status change \S+ -> synced|Synchronized with group)', re.I)),
+    ('aborted', re.compile(r'\[ERROR\] Aborting|mysqld got signal', re.I)),
+]
+
+try:
+    _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    _libc.inotify_init1.argtypes = [ctypes.c_int]
+    _libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+except (OSError, AttributeError):
+    _libc = None
+
+
+def handshake(socket_file, timeout=2):
+    """ Read the server greeting from the unix socket. The node
+        accepts connections if it sends a protocol v10 handshake
+        packet (an error packet starts with 0xff).
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        client.connect(socket_file)
+        header = client.recv(4)
+        if len(header) < 4:
+            return 1
+        payload = client.recv(header[0] | header[1] << 8 | header[2] << 16)
+        if len(payload) > 0 and payload[0] == 10:
+            return 0
+        return 1
+    except OSError:
+        return 1
+    finally:
+        client.close()
+
+
+class NodeReadiness:
+    def __init__(self, datadir, socket_file, error_log, debug, log_offset=0):
+        self.datadir = datadir
+        self.socket_file = socket_file
+        self.error_log = error_log
+        self.debug = debug
+        self.log_offset = log_offset
+        self.state = ''
+        # Time (seconds since wait started) when the node reached each state
+        self.events = {}
+
+    def watch(self):
+        """ Watch the data directory for socket creation and error
+            log writes. Returns -1 if inotify is not available.
+        """
+        if _libc is None or not os.path.isdir(self.datadir):
+            return -1
+        fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return -1
+        if _libc.inotify_add_watch(fd, self.datadir.encode(),
+                                   IN_CREATE | IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            os.close(fd)
+            return -1
+        return fd
+
+    def read_log(self, start_time):
+        # Read new error log lines and record state changes
+        if not os.path.isfile(self.error_log):
+            return
+        if os.path.getsize(self.error_log) < self.log_offset:
+            # Log file was truncated by a restart, states seen so far
+            # belong to the previous run
+            self.log_offset = 0
+            self.state = ''
+            for state, pattern in STATE_PATTERNS:
+                self.events.pop(state, None)
+        with open(self.error_log, 'rb') as log:
+            log.seek(self.log_offset)
+            for raw_line in log:
+                if not raw_line.endswith(b'\n'):
+                    break   # wait till the line is complete
+                self.log_offset += len(raw_line)
+                line = raw_line.decode(errors='replace')
+                for state, pattern in STATE_PATTERNS:
+                    if pattern.search(line):
+                        self.state = state
+                        self.events.setdefault(state, time.time() - start_time)
+                        if self.debug == 'YES':
+                            print(self.error_log + ': node state ' + state)
+
+    def wait(self, wait_state='synced', timeout=120, max_backoff=1.0):
+        """ Wait until the node accepts connections (wait_state
+            'ready') or accepts connections and is synced with the
+            cluster (wait_state 'synced'). Returns 0 on success,
+            1 on timeout or if the node aborted.
+        """
+        start_time = time.time()
+        fd = self.watch()
+        backoff = 0.05
+        try:
+            while True:
+                self.read_log(start_time)
+                if self.state == 'aborted':
+                    return 1
+                if 'ready' not in self.events and os.path.exists(self.socket_file):
+                    self.events.setdefault('socket', time.time() - start_time)
+                    if handshake(self.socket_file) == 0:
+                        self.events['ready'] = time.time() - start_time
+                if 'ready' in self.events and (wait_state == 'ready' or self.state == 'synced'):
+                    return 0
+                remaining = timeout - (time.time() - start_time)
+                if remaining <= 0:
+                    return 1
+                if fd < 0:
+                    fd = self.watch()   # data directory may not exist yet
+                if fd >= 0:
+                    # Sleep until something changes in the data directory
+                    ready, _, _ = select.select([fd], [], [], min(remaining, max_backoff))
+                    if ready:
+                        try:
+                            os.read(fd, 65536)
+                        except BlockingIOError:
+                            pass
+                else:
+                    time.sleep(min(remaining, backoff))
+                    backoff = min(backoff * 2, max_backoff)
+        finally:
+            if fd >= 0:
+                os.close(fd)
+
+
+def node_waiter(workdir, node, debug, log_offset=0):
+    # Readiness waiter for cluster node <workdir>/node<N>
+    node_dir = workdir + '/node' + str(node)
+    return NodeReadiness(node_dir, node_dir + '/mysql.sock',
+                         node_dir + '/node' + str(node) + '.err', debug, log_offset)
+
+
+def rotate_log(workdir, node):
+    """ Move the error log of a node which is about to be
+        restarted to <workdir>/log/node<N>.err.<run>, so the
+        new run starts with an empty log.
+    """
+    error_log = workdir + '/node' + str(node) + '/node' + str(node) + '.err'
+    if not os.path.isfile(error_log):
+        return
+    if not os.path.isdir(workdir + '/log'):
+        os.makedirs(workdir + '/log')
+    run = 1
+    while os.path.exists(workdir + '/log/node' + str(node) + '.err.' + str(run)):
+        run += 1
+    os.replace(error_log, workdir + '/log/node' + str(node) + '.err.' + str(run))
+
+
+def restart_waiter(workdir, node, debug):
+    """ Readiness waiter for a node restarted after this call.
+        The error log of the previous run is rotated first, so
+        its joined/synced lines are never taken for the new run.
+    """
+    rotate_log(workdir, node)
+    return node_waiter(workdir, node, debug)
+
+
+def wait_for_node(workdir, node, debug, wait_state='synced', timeout=120, log_offset=0):
+    # Wait for cluster node <workdir>/node<N> startup
+    return node_waiter(workdir, node, debug, log_offset).wait(wait_state, timeout)
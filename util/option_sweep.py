@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# This will help us to test a long list of mysqld options with few
+# cluster boots. Dynamic options are set with SET GLOBAL on one running
+# cluster, static options are tested in groups per boot. A failing
+# group is split in halves until the failing options are found.
+
+import os
+import shutil
+import mysql.connector
+from util import galera_startup
+from util import db_connection
+from util import utility
+
+# Static options per cluster boot
+STATIC_GROUP_SIZE = 8
+# Dynamic options set together before the check runs
+DYNAMIC_GROUP_SIZE = 16
+
+
+def read_options(option_file):
+    # Option lines (name=value) of an option file
+    with open(option_file) as options:
+        return [line.strip() for line in options if line.strip() and not line.startswith('#')]
+
+
+def option_name(option):
+    return option.split('=')[0].strip()
+
+
+def option_value(option):
+    return option.split('=', 1)[1].strip() if '=' in option else ''
+
+
+def variable_name(option):
+    # my.cnf option name as system variable name
+    return option_name(option).replace('-', '_').lower()
+
+
+def option_groups(options, group_size):
+    """ Split options in groups of up to group_size. A group
+        never has two values of the same option.
+    """
+    groups = []
+    for option in options:
+        for group in groups:
+            if len(group) < group_size and option_name(option) not in [option_name(o) for o in group]:
+                group.append(option)
+                break
+        else:
+            groups.append([option])
+    return groups
+
+
+class OptionSweep:
+    def __init__(self, scriptdir, basedir, workdir, node, wsrep_extra, check, debug, db='test'):
+        self.scriptdir = scriptdir
+        self.basedir = basedir
+        self.workdir = workdir
+        self.node = int(node)
+        self.wsrep_extra = wsrep_extra
+        # check(socket) runs the test load into db, returns 0/1
+        self.check = check
+        self.debug = debug
+        self.db = db
+        self.utility_cmd = utility.Utility(debug)
+        self.socket = workdir + '/node1/mysql.sock'
+        self.error_dir = workdir + '/random_mysql_error'
+        self.boots = 0
+        self.failed = []
+        self.groups = 0
+        # Variables which could not be set back, the running cluster is not clean anymore
+        self.unrestored = []
+
+    def sockets(self):
+        return [self.workdir + '/node' + str(i) + '/mysql.sock' for i in range(1, self.node + 1)]
+
+    def start_cluster(self, options):
+        # Fresh cluster with options added to custom.cnf, returns 0/1
+        self.boots += 1
+        server_startup = galera_startup.StartCluster(self.scriptdir, self.workdir, self.basedir, self.node,
+                                                     self.debug)
+        if server_startup.sanity_check() != 0 or server_startup.create_config(self.wsrep_extra) != 0:
+            return 1
+        with open(self.workdir + '/conf/custom.cnf', 'a+') as cnf_name:
+            cnf_name.write('\n')
+            for option in options:
+                cnf_name.write(option + '\n')
+        if server_startup.initialize_cluster() != 0:
+            return 1
+        if server_startup.start_cluster('--max-connections=1500') != 0:
+            return 1
+        return db_connection.DbConnection('root', self.socket, self.debug).connection_check()
+
+    def stop_cluster(self):
+        # Crashed nodes are already gone, ignore the shutdown status
+        for socket in reversed(self.sockets()):
+            db_connection.DbConnection('root', socket).close_all()
+            shutdown_node = self.basedir + '/bin/mysqladmin --user=root --socket=' + \
+                socket + ' shutdown > /dev/null 2>&1'
+            if self.debug == 'YES':
+                print(shutdown_node)
+            os.system(shutdown_node)
+
+    def cluster_alive(self):
+        return all(os.system(self.basedir + '/bin/mysqladmin --user=root --socket=' + socket +
+                             ' ping > /dev/null 2>&1') == 0 for socket in self.sockets())
+
+    def dynamic_variables(self):
+        # Global variables which can be changed on the running server
+        rows = db_connection.DbConnection('root', self.socket, self.debug).query(
+            "SELECT LOWER(VARIABLE_NAME) FROM information_schema.SYSTEM_VARIABLES "
+            "WHERE READ_ONLY = 'NO' AND VARIABLE_SCOPE != 'SESSION ONLY'")
+        return set(row[0] for row in rows)
+
+    def keep_logs(self, opt_dir, options, reason):
+        # Copy the configuration and logs of the current run to opt_dir
+        if os.path.exists(opt_dir):
+            shutil.rmtree(opt_dir, ignore_errors=True)
+        os.makedirs(opt_dir)
+        with open(opt_dir + '/reason.txt', 'w') as reason_file:
+            reason_file.write('\n'.join(options) + '\n' + reason + '\n')
+        shutil.copy(self.workdir + '/conf/custom.cnf', opt_dir + '/custom.cnf')
+        shutil.copytree(self.workdir + '/log', opt_dir + '/log')
+        for i in range(1, self.node + 1):
+            error_log = self.workdir + '/node' + str(i) + '/node' + str(i) + '.err'
+            if os.path.isfile(error_log):
+                shutil.copy(error_log, opt_dir)
+
+    def save_failure(self, option, reason):
+        """ Keep the configuration and logs of a failing option
+            in random_mysql_error/<option>_<value>
+        """
+        self.failed.append(option)
+        print("Random mysqld option failed: " + option + " (" + reason + ")")
+        self.keep_logs(self.error_dir + '/' + option_name(option) + '_' + option_value(option), [option], reason)
+
+    def group_dir(self):
+        # Logs of a failing group are kept until the bisection is done
+        self.groups += 1
+        return self.error_dir + '/group' + str(self.groups)
+
+    def save_group_failure(self, group, group_dir):
+        """ Record a failing group if none of its halves failed on
+            their own: the failure needs options of both halves or
+            did not happen again.
+        """
+        reason = 'group failed, not reproducible in halves'
+        self.failed.append(' '.join(group))
+        print("Random mysqld option group failed: " + ', '.join(group) + " (" + reason + ")")
+        with open(group_dir + '/reason.txt', 'w') as reason_file:
+            reason_file.write('\n'.join(group) + '\n' + reason + '\n')
+
+    def test_static(self, group):
+        """ Boot the cluster with a group of static options and
+            run the check. Failing groups are bisected.
+        """
+        result = self.start_cluster(group)
+        reason = 'cluster startup failed'
+        if result == 0:
+            result = self.check(self.socket)
+            reason = 'test load failed'
+        group_dir = None
+        if result != 0 and len(group) == 1:
+            self.save_failure(group[0], reason)
+        elif result != 0:
+            group_dir = self.group_dir()
+            self.keep_logs(group_dir, group, reason)
+        self.stop_cluster()
+        if group_dir is not None:
+            if self.debug == 'YES':
+                print("Bisecting static option group: " + ', '.join(group))
+            failed = len(self.failed)
+            self.test_static(group[:len(group) // 2])
+            self.test_static(group[len(group) // 2:])
+            if len(self.failed) == failed:
+                self.save_group_failure(group, group_dir)
+            else:
+                shutil.rmtree(group_dir, ignore_errors=True)
+
+    def set_global(self, option):
+        """ SET GLOBAL option on every node. Returns the previous
+            values, or the error message if the value was refused.
+        """
+        variable = variable_name(option)
+        previous = []
+        for socket in self.sockets():
+            connection = db_connection.DbConnection('root', socket, self.debug)
+            try:
+                previous.append(connection.scalar("SELECT @@GLOBAL." + variable))
+                connection.run("SET GLOBAL " + variable + " = %s", (db_connection.sql_value(option_value(option)),))
+            except mysql.connector.Error as e:
+                self.restore_global(variable, previous)
+                return str(e)
+        return previous
+
+    def restore_global(self, variable, previous):
+        # Set variable back on every node, a failure is kept in self.unrestored
+        for socket, value in zip(self.sockets(), previous):
+            try:
+                db_connection.DbConnection('root', socket, self.debug). \
+                    run("SET GLOBAL " + variable + " = %s", (value,))
+            except mysql.connector.Error as e:
+                if self.debug == 'YES':
+                    print(socket + ': could not set ' + variable + ' back: ' + str(e))
+                self.unrestored.append(variable)
+
+    def restart_cluster(self):
+        # Fresh cluster without random options, returns 0/1
+        self.stop_cluster()
+        self.unrestored = []
+        if self.start_cluster([]) != 0:
+            print("ERROR! Could not restart the cluster for dynamic option tests")
+            return 1
+        return 0
+
+    def test_dynamic(self, group):
+        """ Set a group of dynamic options on the running cluster
+            and run the check. Refused values fail right away,
+            failing groups are bisected. The nodes have to be
+            consistent after the check. The cluster is restarted
+            after a crash, an inconsistency or a value which could
+            not be set back, so the next group starts clean.
+            Returns 1 if the cluster could not be restarted.
+        """
+        applied = []
+        for option in group:
+            previous = self.set_global(option)
+            if isinstance(previous, str):
+                self.save_failure(option, 'SET GLOBAL failed: ' + previous)
+            else:
+                applied.append((option, previous))
+        if not applied:
+            return self.restart_cluster() if self.unrestored else 0
+        # Pooled sessions were opened before SET GLOBAL and would keep the old session values
+        for socket in self.sockets():
+            db_connection.DbConnection('root', socket).close_all()
+        result = self.check(self.socket)
+        alive = self.cluster_alive()
+        reason = 'test load failed' if alive else 'cluster node crashed'
+        consistent = True
+        if result == 0 and alive and \
+                self.utility_cmd.check_cluster_consistency(self.basedir, self.workdir, self.node, self.db) != 0:
+            result, reason, consistent = 1, 'cluster nodes are not consistent', False
+        group_dir = None
+        if result != 0 and len(applied) == 1:
+            self.save_failure(applied[0][0], reason)
+        elif result != 0:
+            group_dir = self.group_dir()
+            self.keep_logs(group_dir, [option for option, previous in applied], reason)
+        if alive:
+            for option, previous in reversed(applied):
+                self.restore_global(variable_name(option), previous)
+        if self.unrestored and self.debug == 'YES':
+            print("Restarting the cluster, could not set back: " + ', '.join(sorted(set(self.unrestored))))
+        if not alive or not consistent or self.unrestored or \
+                self.utility_cmd.wait_for_cluster_sync(self.workdir) != 0:
+            if self.restart_cluster() != 0:
+                return 1
+        if group_dir is not None:
+            options = [option for option, previous in applied]
+            if self.debug == 'YES':
+                print("Bisecting dynamic option group: " + ', '.join(options))
+            failed = len(self.failed)
+            if self.test_dynamic(options[:len(options) // 2]) != 0:
+                return 1
+            if self.test_dynamic(options[len(options) // 2:]) != 0:
+                return 1
+            if len(self.failed) == failed:
+                self.save_group_failure(options, group_dir)
+            else:
+                shutil.rmtree(group_dir, ignore_errors=True)
+        return 0
+
+    def run(self, options):
+        """ Test every option. Returns 0 if the sweep ran, the
+            failing options are in self.failed and random_mysql_error
+        """
+        if os.path.exists(self.error_dir):
+            shutil.rmtree(self.error_dir, ignore_errors=True)
+        os.makedirs(self.error_dir)
+        if self.start_cluster([]) != 0:
+            print("ERROR! Could not start the cluster without random options")
+            return 1
+        dynamic = self.dynamic_variables()
+        dynamic_options = [option for option in options if variable_name(option) in dynamic]
+        static_options = [option for option in options if variable_name(option) not in dynamic]
+        print("Random mysqld options: " + str(len(dynamic_options)) + " dynamic, " +
+              str(len(static_options)) + " static")
+        for group in option_groups(dynamic_options, DYNAMIC_GROUP_SIZE):
+            if self.test_dynamic(group) != 0:
+                return 1
+        self.stop_cluster()
+        for group in option_groups(static_options, STATIC_GROUP_SIZE):
+            self.test_static(group)
+        print("Tested " + str(len(options)) + " options with " + str(self.boots) + " cluster boots, " +
+              str(len(self.failed)) + " failed")
+        return 0
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# This will help us to find performance regressions between server
+# builds. Sysbench results of the current build are compared with the
+# previous build which ran the same workload (util/sysbench_results).
+
+import os
+import sys
+import math
+cwd = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.normpath(os.path.join(cwd, '../'))
+sys.path.insert(0, parent_dir)
+from config import *
+from util import sysbench_results
+
+# Two sided 95% confidence
+Z_95 = 1.959964
+# Samples per sysbench run: report intervals are averaged in this many
+# consecutive blocks, block means are close to independent
+MEAN_BLOCKS = 5
+
+
+def block_means(values):
+    # Means of MEAN_BLOCKS consecutive blocks of values
+    blocks = min(MEAN_BLOCKS, len(values))
+    means = []
+    for block in range(blocks):
+        part = values[block * len(values) // blocks:(block + 1) * len(values) // blocks]
+        means.append(sum(part) / len(part))
+    return means
+
+
+def t_critical(df):
+    """ 97.5% quantile of Student's t distribution
+        (Cornish-Fisher expansion around the normal quantile)
+    """
+    z = Z_95
+    return z + (z ** 3 + z) / (4 * df) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2) + \
+        (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * df ** 3)
+
+
+def mean_variance(samples):
+    mean = sum(samples) / len(samples)
+    return mean, sum((sample - mean) ** 2 for sample in samples) / (len(samples) - 1)
+
+
+def mean_difference(baseline, current):
+    """ Welch's t interval for mean(current) - mean(baseline).
+        Returns (difference, low, high) relative to the baseline
+        mean, None if there are not enough samples.
+    """
+    if len(baseline) < 2 or len(current) < 2:
+        return None
+    base_mean, base_var = mean_variance(baseline)
+    cur_mean, cur_var = mean_variance(current)
+    if base_mean == 0:
+        return None
+    base_se = base_var / len(baseline)
+    cur_se = cur_var / len(current)
+    std_error = math.sqrt(base_se + cur_se)
+    if std_error == 0:
+        margin = 0
+    else:
+        df = (base_se + cur_se) ** 2 / ((base_se ** 2) / (len(baseline) - 1) + (cur_se ** 2) / (len(current) - 1))
+        margin = t_critical(df) * std_error
+    difference = cur_mean - base_mean
+    return difference / base_mean, (difference - margin) / base_mean, (difference + margin) / base_mean
+
+
+class PerfRegression:
+    def __init__(self, results_db, threshold, debug):
+        self.results_db = results_db
+        # Slowdowns smaller than threshold percent are not reported
+        self.threshold = float(threshold) / 100
+        self.debug = debug
+
+    def samples(self, store, test, version):
+        """ Throughput and latency samples of one build, grouped by
+            workload signature (workload, configuration, threads).
+            Report intervals follow each other and are correlated,
+            so every run gives MEAN_BLOCKS block means of its
+            intervals. Runs with fewer intervals contribute their
+            summary values. Tail latency is reported per run only,
+            every complete run gives one p99 sample.
+        """
+        samples = {}
+        for run in store.runs(test, version):
+            signature = (run['workload'], run['config'], run['threads'])
+            tps, latency, tail_latency = samples.setdefault(signature, ([], [], []))
+            if run['lat_p99'] is not None and not run['partial']:
+                tail_latency.append(run['lat_p99'])
+            intervals = store.connection.execute(
+                "SELECT tps, lat_pct FROM sysbench_intervals WHERE run_id = ? ORDER BY second",
+                (run['id'],)).fetchall()
+            if len(intervals) >= MEAN_BLOCKS:
+                tps += block_means([interval[0] for interval in intervals])
+                latency += block_means([interval[1] for interval in intervals if interval[1] is not None])
+            else:
+                tps.append(run['tps'])
+                latency.append(run['lat_pct'])
+        return samples
+
+    def baseline_version(self, store, test, version):
+        # Newest other build which has results for the test
+        row = store.connection.execute(
+            "SELECT version FROM sysbench_runs WHERE test = ? AND version != ? "
+            "ORDER BY run_at DESC LIMIT 1", (test, version)).fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def compare(self, test, version):
+        """ Compare the build under test with the previous build.
+            Returns the number of regressed workloads.
+        """
+        if not os.path.isfile(self.results_db):
+            return 0
+        store = sysbench_results.ResultStore(self.results_db)
+        regressions = 0
+        try:
+            baseline = self.baseline_version(store, test, version)
+            if baseline is None:
+                if self.debug == 'YES':
+                    print(test + ': no baseline build to compare with')
+                return 0
+            base_samples = self.samples(store, test, baseline)
+            for signature, (tps, latency, tail_latency) in sorted(self.samples(store, test, version).items()):
+                if signature not in base_samples:
+                    continue
+                workload, config, threads = signature
+                name = test + ' ' + workload + ' (' + config + ', threads:' + str(threads) + ')'
+                # Throughput regression: the whole interval is below -threshold
+                tps_change = mean_difference(base_samples[signature][0], tps)
+                # Latency regression: the whole interval is above +threshold
+                latency_change = mean_difference([value for value in base_samples[signature][1] if value is not None],
+                                                 [value for value in latency if value is not None])
+                tail_latency_change = mean_difference(base_samples[signature][2], tail_latency)
+                for metric, change, regressed in [
+                        ('tps', tps_change, tps_change is not None and tps_change[2] < -self.threshold),
+                        ('latency', latency_change, latency_change is not None and
+                         latency_change[1] > self.threshold),
+                        ('p99 latency', tail_latency_change, tail_latency_change is not None and
+                         tail_latency_change[1] > self.threshold)]:
+                    if change is None:
+                        continue
+                    if regressed:
+                        regressions += 1
+                    if regressed or self.debug == 'YES':
+                        print(('REGRESSION ' if regressed else '') + name + ' ' + metric + ' change ' +
+                              '{:+.1f}% (95% CI {:+.1f}% .. {:+.1f}%)'.format(*[value * 100 for value in change]) +
+                              ' against ' + baseline)
+        finally:
+            store.close()
+        return regressions
+
+
+def check_regressions(tests, basedir, debug):
+    """ Check the given test files for performance
+        regressions of the build in basedir.
+        Returns 1 if any workload regressed.
+    """
+    version = sysbench_results.build_version(basedir)
+    regression = PerfRegression(SYSBENCH_RESULTS_DB, PERF_REGRESSION_THRESHOLD, debug)
+    regressions = 0
+    for test in tests:
+        regressions += regression.compare(test, version)
+    if regressions:
+        print(str(regressions) + ' performance regression(s) found, see ' + SYSBENCH_RESULTS_DB)
+        return 1
+    return 0
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# This will help us to hand out non-overlapping port blocks
+# to every cluster node started on this host.
+
+import os
+import fcntl
+import socket
+from config import *
+
+# Every node gets its own block of ports. The offsets inside the
+# block keep the old layout (client port, client port + 8 for gcomm).
+NODE_PORT_BLOCK = 100
+CLIENT_PORT_OFFSET = 0
+GCOMM_PORT_OFFSET = 8
+IST_PORT_OFFSET = 9
+SST_PORT_OFFSET = 10
+# Outgoing connections take their local port from this range
+EPHEMERAL_PORT_RANGE = '/proc/sys/net/ipv4/ip_local_port_range'
+
+
+def ephemeral_ports():
+    # (first, last) port of the kernel ephemeral range, None if unknown
+    try:
+        with open(EPHEMERAL_PORT_RANGE) as range_file:
+            first, last = range_file.read().split()
+        return int(first), int(last)
+    except (OSError, ValueError):
+        return None
+
+
+class NodePorts:
+    def __init__(self, base):
+        self.base = base
+        self.client = base + CLIENT_PORT_OFFSET
+        self.gcomm = base + GCOMM_PORT_OFFSET
+        self.ist = base + IST_PORT_OFFSET
+        self.sst = base + SST_PORT_OFFSET
+
+    def all_ports(self):
+        return [self.client, self.gcomm, self.ist, self.sst]
+
+
+class PortAllocator:
+    def __init__(self, lease_dir, port_start, port_end, debug):
+        self.lease_dir = lease_dir
+        self.port_start = int(port_start)
+        self.port_end = int(port_end)
+        self.debug = debug
+        self.lease_file = lease_dir + '/port_leases'
+        self.lock_file = lease_dir + '/port_leases.lock'
+
+    def read_leases(self):
+        """ Lease file has one line per node block :
+            <block base> <owner pid> <owner>
+        """
+        leases = []
+        if not os.path.isfile(self.lease_file):
+            return leases
+        with open(self.lease_file) as lease_file:
+            for line in lease_file:
+                fields = line.split(' ', 2)
+                if len(fields) == 3:
+                    leases.append([int(fields[0]), int(fields[1]), fields[2].rstrip('\n')])
+        return leases
+
+    def write_leases(self, leases):
+        tmp_file = self.lease_file + '.tmp'
+        with open(tmp_file, 'w') as lease_file:
+            for base, pid, owner in leases:
+                lease_file.write(str(base) + ' ' + str(pid) + ' ' + owner + '\n')
+        os.replace(tmp_file, self.lease_file)
+
+    def pid_alive(self, pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def port_free(self, port):
+        """ Bind probe, the port may be used by a process we do not
+            know about. mysqld and gcomm listen on all addresses, so
+            the probe does too (with SO_REUSEADDR like mysqld, so a
+            TIME_WAIT connection does not count as used).
+        """
+        probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            probe.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            probe.bind(('0.0.0.0', port))
+        except OSError:
+            return False
+        finally:
+            probe.close()
+        return True
+
+    def is_stale(self, lease):
+        """ A lease is stale if the process which took it is gone
+            and nothing is listening on the leased ports anymore.
+        """
+        if self.pid_alive(lease[1]):
+            return False
+        return all(self.port_free(port) for port in NodePorts(lease[0]).all_ports())
+
+    def lease(self, owner, node_count):
+        """ Lease port blocks for node_count nodes. Owner is the
+            cluster workdir (or workdir#nodeN for a joiner). Asking
+            again with the same owner returns the existing lease.
+        """
+        if not os.path.exists(self.lease_dir):
+            os.makedirs(self.lease_dir)
+        with open(self.lock_file, 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            leases = [lease for lease in self.read_leases() if not self.is_stale(lease)]
+            owned = sorted(lease[0] for lease in leases if lease[2] == owner)
+            if len(owned) == node_count:
+                self.write_leases(leases)
+                return [NodePorts(base) for base in owned]
+            leases = [lease for lease in leases if lease[2] != owner]
+            used = set(lease[0] for lease in leases)
+            # A port of the ephemeral range can be taken by any outgoing connection later
+            ephemeral = ephemeral_ports()
+            blocks = []
+            base = self.port_start
+            while len(blocks) < node_count and base + NODE_PORT_BLOCK <= self.port_end:
+                if ephemeral is not None and base <= ephemeral[1] and base + NODE_PORT_BLOCK > ephemeral[0]:
+                    base += NODE_PORT_BLOCK
+                    continue
+                if base not in used and all(self.port_free(port) for port in NodePorts(base).all_ports()):
+                    blocks.append(base)
+                base += NODE_PORT_BLOCK
+            if len(blocks) < node_count:
+                print('ERROR! Could not find ' + str(node_count) + ' free port blocks between ' +
+                      str(self.port_start) + ' and ' + str(self.port_end))
+                self.write_leases(leases)
+                return None
+            for base in blocks:
+                leases.append([base, os.getpid(), owner])
+            self.write_leases(leases)
+            if self.debug == 'YES':
+                print('Leased port blocks ' + str(blocks) + ' for ' + owner)
+            return [NodePorts(base) for base in blocks]
+
+    def release(self, owner):
+        # Release all leases of owner and of its joiners (owner#nodeN)
+        if not os.path.exists(self.lease_dir):
+            return 0
+        with open(self.lock_file, 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            leases = [lease for lease in self.read_leases()
+                      if lease[2] != owner and not lease[2].startswith(owner + '#')]
+            self.write_leases(leases)
+        if self.debug == 'YES':
+            print('Released port blocks of ' + owner)
+        return 0
+
+
+def get_allocator(debug):
+    # Port allocator shared by every test running on this host
+    return PortAllocator(PORT_LEASE_DIR, PORT_RANGE_START, PORT_RANGE_END, debug)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# This will help us to measure how long a restarted cluster node takes
+# to rejoin the cluster and whether it got the missing write sets with
+# IST or with a full SST. Results are kept per gcache configuration in
+# the sysbench results database.
+
+import os
+import re
+import time
+import sqlite3
+import mysql.connector
+from config import *
+from util import db_connection
+from util import node_readiness
+from util import sysbench_results
+
+# Joiner error log lines about the state transfer
+IST_PATTERN = re.compile(r'WSREP: (Receiving IST: (\d+) writesets|IST received)', re.I)
+SST_PATTERN = re.compile(r'WSREP: (SST received|SST succeeded|.*wsrep_sst_\w+.*completed)', re.I)
+SST_METHOD_PATTERN = re.compile(r'WSREP: (Prepared SST request|Running: \'wsrep_sst_)\s*:?\s*(\w+)', re.I)
+GCACHE_PATTERN = re.compile(r'(gcache\.(?:size|page_size|keep_pages_size|recover))\s*=\s*([^;]*)')
+
+
+def transfer_info(error_log, log_offset=0):
+    """ State transfer of the startup logged after log_offset.
+        Returns (transfer, sst method, IST write sets) where
+        transfer is IST, SST or none.
+    """
+    transfer = 'none'
+    sst_method = None
+    writesets = None
+    if not os.path.isfile(error_log):
+        return transfer, sst_method, writesets
+    with open(error_log, 'rb') as log:
+        log.seek(log_offset)
+        for raw_line in log:
+            line = raw_line.decode(errors='replace')
+            ist = IST_PATTERN.search(line)
+            if ist:
+                if ist.group(2) is not None:
+                    writesets = int(ist.group(2))
+                if transfer != 'SST':
+                    transfer = 'IST'
+                continue
+            method = SST_METHOD_PATTERN.search(line)
+            if method:
+                sst_method = method.group(2)
+            if SST_PATTERN.search(line):
+                transfer = 'SST'
+    return transfer, sst_method, writesets
+
+
+def datadir_size(datadir):
+    # Bytes in the data directory, the amount an SST has copied
+    size = 0
+    for root, dirs, files in os.walk(datadir):
+        for file in files:
+            try:
+                size += os.path.getsize(os.path.join(root, file))
+            except OSError:
+                pass
+    return size
+
+
+class RecoveryMetrics:
+    def __init__(self, basedir, workdir, debug):
+        self.basedir = basedir
+        self.workdir = workdir
+        self.debug = debug
+
+    def gcache_config(self, socket):
+        # gcache provider options of a node, the key of the stored results
+        try:
+            options = db_connection.DbConnection('root', socket, self.debug). \
+                scalar("SELECT @@wsrep_provider_options")
+        except mysql.connector.Error:
+            return ''
+        return ', '.join(name + '=' + value.strip() for name, value in GCACHE_PATTERN.findall(options or ''))
+
+    def received_bytes(self, socket):
+        try:
+            rows = db_connection.DbConnection('root', socket, self.debug). \
+                query("SHOW GLOBAL STATUS LIKE 'wsrep_received_bytes'")
+        except mysql.connector.Error:
+            return None
+        if not rows:
+            return None
+        return int(rows[0][1])
+
+    def restart(self, node, scenario, timeout=120, startup=None):
+        """ Start node with its startup script (or startup
+            command) and wait until it is synced. Records the
+            recovery times and state transfer. Returns 0/1.
+        """
+        node_dir = self.workdir + '/node' + str(node)
+        socket = node_dir + '/mysql.sock'
+        error_log = node_dir + '/node' + str(node) + '.err'
+        if startup is None:
+            startup = "bash " + self.workdir + '/log/startup' + str(node) + '.sh'
+        if self.debug == 'YES':
+            print(startup)
+        # The previous run's log is rotated, timings and transfer come from this run only
+        waiter = node_readiness.restart_waiter(self.workdir, node, self.debug)
+        log_offset = waiter.log_offset
+        os.system(startup)
+        result = waiter.wait('synced', timeout)
+        if result != 0:
+            return result
+        transfer, sst_method, writesets = transfer_info(error_log, log_offset)
+        if transfer == 'SST':
+            transferred = datadir_size(node_dir)
+        else:
+            # Right after the rejoin this is (mostly) the IST stream
+            transferred = self.received_bytes(socket)
+        metrics = {
+            'socket_ready': waiter.events.get('ready'),
+            'joined': waiter.events.get('joined'),
+            'synced': waiter.events.get('synced'),
+            'transfer': transfer,
+            'sst_method': sst_method,
+            'ist_writesets': writesets,
+            'bytes': transferred,
+            'gcache': self.gcache_config(socket),
+        }
+        self.save(node, scenario, metrics)
+        print("\tnode" + str(node) + " recovery: " + transfer +
+              (" (" + sst_method + ")" if transfer == 'SST' and sst_method else '') +
+              ", ready " + self.seconds(metrics['socket_ready']) +
+              ", joined " + self.seconds(metrics['joined']) +
+              ", synced " + self.seconds(metrics['synced']) +
+              ", " + str(transferred) + " bytes" +
+              (", " + metrics['gcache'] if metrics['gcache'] else ''))
+        return 0
+
+    def seconds(self, value):
+        if value is None:
+            return '-'
+        return '{:.1f}s'.format(value)
+
+    def save(self, node, scenario, metrics):
+        # Recovery results go to the sysbench results database
+        if not os.path.exists(os.path.dirname(SYSBENCH_RESULTS_DB)):
+            os.makedirs(os.path.dirname(SYSBENCH_RESULTS_DB), exist_ok=True)
+        connection = sqlite3.connect(SYSBENCH_RESULTS_DB, timeout=60)
+        try:
+            with connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS recovery_times (id INTEGER PRIMARY KEY, test TEXT, version TEXT, "
+                    "scenario TEXT, node INTEGER, gcache TEXT, run_at REAL, socket_ready REAL, joined REAL, "
+                    "synced REAL, transfer TEXT, sst_method TEXT, ist_writesets INTEGER, bytes INTEGER)")
+                connection.execute(
+                    "INSERT INTO recovery_times (test, version, scenario, node, gcache, run_at, socket_ready, "
+                    "joined, synced, transfer, sst_method, ist_writesets, bytes) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (sysbench_results.test_name(), sysbench_results.build_version(self.basedir), scenario,
+                     int(node), metrics['gcache'], time.time(), metrics['socket_ready'], metrics['joined'],
+                     metrics['synced'], metrics['transfer'], metrics['sst_method'], metrics['ist_writesets'],
+                     metrics['bytes']))
+        finally:
+            connection.close()
@@ -1,7 +1,8 @@
 import os
 import configparser
 from util import utility
-import time
+from util import db_connection
+from util import wsrep_sync
 
 # Reading initial configuration
 config = configparser.ConfigParser()
@@ -22,15 +23,17 @@ class RQGDataGen:
         self.utility_cmd = utility.Utility(debug)
         self.version = self.utility_cmd.version_check(self.basedir)
 
-    def initiate_rqg(self, module, db, socket):
-        """ Method to initiate RQD data load against
-            MariaDB Galera Cluster.
+    def rqg_load(self, module, db, socket):
+        """ Method to run RQG data load of one module
+            against MariaDB Galera Cluster.
+            Returns a list of (spec file, result).
         """
         # Get RQG module
         module = parent_dir + '/randgen/conf/' + module
-        master_port = self.basedir + "/bin/mysql --user=root --socket=" + socket + \
-            ' -Bse"select @@port" 2>&1'
-        port = os.popen(master_port).read().rstrip()
+        if not os.path.exists(module):
+            print(module + ' does not exist in RQG')
+            return [(module, 1)]
+        port = str(db_connection.DbConnection('root', socket, self.debug).scalar("select @@port"))
         # Create schema for RQG run
         create_db = self.basedir + "/bin/mysql --user=root --socket=" + socket + \
             ' -Bse"drop database if exists ' + db + \
@@ -38,6 +41,21 @@ class RQGDataGen:
         if self.debug == 'YES':
             print(create_db)
         os.system(create_db)
+        # Run RQG, the specs of a module share table names so they run one by one
+        results = []
+        for file in sorted(os.listdir(module)):
+            if file.endswith(".zz"):
+                rqg_command = "cd " + parent_dir + "/randgen; perl " + parent_dir + "/randgen/gendata.pl " \
+                              "--dsn=dbi:mysql:host=127.0.0.1:port=" \
+                              + port + ":user=" + self.user + ":database=" + db + " --spec=" + \
+                              module + '/' + file + " > " + \
+                              self.workdir + "/log/rqg_" + db + "_" + file[:-3] + ".log 2>&1"
+                if self.debug == 'YES':
+                    print(rqg_command)
+                results.append((file, os.system(rqg_command)))
+        return results
+
+    def create_rqg_user(self, socket):
         if int(self.version) > int("050700"):
             create_user = self.basedir + "/bin/mysql --user=root --socket=" + socket + \
                 ' -Bse"create user rqg_test@\'%\' identified with mysql_native_password by \'\'; ' \
@@ -45,44 +63,39 @@ class RQGDataGen:
             if self.debug == 'YES':
                 print(create_user)
             os.system(create_user)
-        # Checking RQG module
-        os.chdir(parent_dir + '/randgen')
-        if not os.path.exists(module):
-            print(module + ' does not exist in RQG')
-            exit(1)
-        # Run RQG
-        for file in os.listdir(module):
-            if file.endswith(".zz"):
-                rqg_command = "perl " + parent_dir + "/randgen/gendata.pl " \
-                              "--dsn=dbi:mysql:host=127.0.0.1:port=" \
-                              + port + ":user=" + self.user + ":database=" + db + " --spec=" + \
-                              module + '/' + file + " > " + \
-                              self.workdir + "/log/rqg_run.log 2>&1"
-                if self.debug == 'YES':
-                    print(rqg_command)
-                result = os.system(rqg_command)
-                self.utility_cmd.check_testcase(result, "RQG data load (DB: " + db + ")")
+
+    def initiate_rqg(self, module, db, socket):
+        """ Method to initiate RQD data load against
+            MariaDB Galera Cluster.
+        """
+        self.create_rqg_user(socket)
+        for file, result in self.rqg_load(module, db, socket):
+            self.utility_cmd.check_testcase(result, "RQG data load (DB: " + db + ", spec: " + file + ")")
 
     def galera_dataload(self, socket):
         """
-            RQG data load for MariaDB Galera Cluster
+            RQG data load for MariaDB Galera Cluster. Every
+            module is loaded into its own schema.
         """
         if int(self.version) < int("1004"):
             ##rqg_config = ['galera', 'transactions', 'optimizer', 'mariadb', 'runtime', 'temporal']
             rqg_config = ['optimizer']
         else:
             rqg_config = ['optimizer']
+        self.create_rqg_user(socket)
+        for config in rqg_config:
+            for file, result in self.rqg_load(config, 'db_' + config, socket):
+                self.utility_cmd.check_testcase(result, "RQG data load (DB: db_" + config + ", spec: " + file + ")")
+        node1_socket = self.workdir + '/node1/mysql.sock'
+        node2_socket = self.workdir + '/node2/mysql.sock'
+        for node_socket in [node1_socket, node2_socket]:
+            db_connection.DbConnection('root', node_socket, self.debug).execute("flush logs")
+        # Wait until every node has applied what node1 has committed
+        result = wsrep_sync.wait_for_apply(node1_socket, wsrep_sync.cluster_sockets(self.workdir),
+                                           debug=self.debug)
+        self.utility_cmd.check_testcase(result, "Cluster nodes applied RQG data load")
         for config in rqg_config:
-            self.initiate_rqg(config, 'db_' + config, socket)
-            flush_log = basedir + "/bin/mysql --user=root --socket=" + \
-                        workdir + '/node1/mysql.sock' + ' -Bse "flush logs" 2>&1'
-            os.system(flush_log)
-            flush_log = basedir + "/bin/mysql --user=root --socket=" + \
-                        workdir + '/node2/mysql.sock' + ' -Bse "flush logs" 2>&1'
-            os.system(flush_log)
-            time.sleep(5)
-            result = self.utility_cmd.check_table_count(basedir, 'db_' + config, workdir + '/node1/mysql.sock',
-                                                   workdir + '/node2/mysql.sock')
+            result = self.utility_cmd.check_table_count(self.basedir, 'db_' + config, node1_socket, node2_socket)
             self.utility_cmd.check_testcase(result, "Checksum run for DB: db_" + config)
             #result = self.utility_cmd.check_gtid_consistency(basedir, workdir + '/node1/mysql.sock', workdir + '/node2/mysql.sock')
             #self.utility_cmd.check_testcase(result, "GTID binlog state between cluster nodes")
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# This will help us to keep sysbench throughput and latency numbers.
+# Sysbench logs are parsed and stored in a SQLite database keyed
+# by test, server build and workload configuration.
+
+import os
+import re
+import sys
+import sqlite3
+import time
+from config import *
+
+SUMMARY_PATTERNS = {
+    'transactions': re.compile(r'^\s*transactions:\s+(\d+)\s+\(([\d.]+) per sec'),
+    'queries': re.compile(r'^\s*queries:\s+(\d+)\s+\(([\d.]+) per sec'),
+    'errors': re.compile(r'^\s*ignored errors:\s+(\d+)'),
+    'reconnects': re.compile(r'^\s*reconnects:\s+(\d+)'),
+    'total_time': re.compile(r'^\s*total time:\s+([\d.]+)s'),
+    'lat_min': re.compile(r'^\s*min:\s+([\d.]+)'),
+    'lat_avg': re.compile(r'^\s*avg:\s+([\d.]+)'),
+    'lat_max': re.compile(r'^\s*max:\s+([\d.]+)'),
+    'lat_pct': re.compile(r'^\s*(\d+)th percentile:\s+([\d.]+)'),
+}
+# [ 10s ] thds: 10 tps: 995.10 qps: 19904.09 (r/w/o: ...) lat (ms,95%): 15.00 err/s: 0.00 reconn/s: 0.00
+INTERVAL_PATTERN = re.compile(r'^\[\s*(\d+)s\s*\]\s+thds:\s+(\d+)\s+tps:\s+([\d.]+)\s+qps:\s+([\d.]+).*?'
+                              r'lat \(ms,\d+%\):\s+([\d.]+)\s+err/s:\s+([\d.]+)\s+reconn/s:\s+([\d.]+)')
+#        5.280 |****                                     30
+HISTOGRAM_PATTERN = re.compile(r'^\s*([\d.]+)\s+\|\**\s+(\d+)\s*$')
+# Tail latencies taken from the --histogram report
+HISTOGRAM_PERCENTILES = (95, 99)
+
+
+def histogram_percentile(histogram, percentile):
+    # Latency bucket (ms) below which percentile % of the events fall
+    target = sum(count for value, count in histogram) * percentile / 100
+    events = 0
+    for value, count in histogram:
+        events += count
+        if events >= target:
+            return value
+    return None
+
+
+def parse(output, partial=False):
+    """ Parse sysbench run output. Returns None if the
+        output has no final report (failed run). With partial,
+        a run which was stopped early gets a summary made from
+        its interval reports. p95 and p99 latencies come from
+        the --histogram report.
+    """
+    result = {'intervals': []}
+    histogram = []
+    for line in output.splitlines():
+        interval = INTERVAL_PATTERN.search(line)
+        if interval:
+            result['intervals'].append([int(interval.group(1)), int(interval.group(2))] +
+                                       [float(value) for value in interval.groups()[2:]])
+            continue
+        bucket = HISTOGRAM_PATTERN.search(line)
+        if bucket:
+            histogram.append((float(bucket.group(1)), int(bucket.group(2))))
+            continue
+        for name, pattern in SUMMARY_PATTERNS.items():
+            match = pattern.search(line)
+            if not match:
+                continue
+            if name in ('transactions', 'queries'):
+                result[name] = int(match.group(1))
+                result[name[0] + 'ps'] = float(match.group(2))
+            elif name == 'lat_pct':
+                result['percentile'] = int(match.group(1))
+                result['lat_pct'] = float(match.group(2))
+            elif name in ('errors', 'reconnects'):
+                result[name] = int(match.group(1))
+            else:
+                result[name] = float(match.group(1))
+            break
+    if histogram:
+        for percentile in HISTOGRAM_PERCENTILES:
+            result['lat_p' + str(percentile)] = histogram_percentile(histogram, percentile)
+    elif result.get('percentile') == 95:
+        result['lat_p95'] = result['lat_pct']
+    if 'tps' not in result:
+        intervals = result['intervals']
+        if not partial or not intervals:
+            return None
+        result['partial'] = True
+        result['tps'] = sum(interval[2] for interval in intervals) / len(intervals)
+        result['qps'] = sum(interval[3] for interval in intervals) / len(intervals)
+        result['lat_pct'] = max(interval[4] for interval in intervals)
+        result['total_time'] = float(intervals[-1][0])
+    return result
+
+
+def parse_log(log_file, log_offset=0):
+    # Parse the part of a sysbench log written after log_offset
+    if not os.path.isfile(log_file):
+        return None
+    with open(log_file, errors='replace') as log:
+        log.seek(log_offset)
+        return parse(log.read())
+
+
+def build_version(basedir):
+    """ Build key: the server version string plus size and
+        mtime of bin/mysqld, so nightly builds of the same
+        version are told apart.
+    """
+    mysqld = basedir + '/bin/mysqld'
+    version_info = os.popen(mysqld + ' --version 2>&1').read().rstrip()
+    if not os.path.isfile(mysqld):
+        return version_info
+    stat = os.stat(mysqld)
+    return version_info + ' [' + str(stat.st_size) + ' bytes, ' + \
+        time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(stat.st_mtime)) + ']'
+
+
+def test_name():
+    # Name of the running suite test file
+    return os.path.splitext(os.path.basename(sys.argv[0]))[0]
+
+
+class ResultStore:
+    def __init__(self, db_file):
+        self.db_file = db_file
+        if not os.path.exists(os.path.dirname(db_file)):
+            os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        # Parallel test runs write to the same file
+        self.connection = sqlite3.connect(db_file, timeout=60)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS sysbench_runs (id INTEGER PRIMARY KEY, test TEXT, version TEXT, "
+            "config TEXT, workload TEXT, threads INTEGER, run_at REAL, tps REAL, qps REAL, "
+            "transactions INTEGER, queries INTEGER, errors INTEGER, reconnects INTEGER, total_time REAL, "
+            "lat_min REAL, lat_avg REAL, lat_max REAL, percentile INTEGER, lat_pct REAL, lat_p95 REAL, "
+            "lat_p99 REAL, partial INTEGER)")
+        # Stores created before the tail latency columns
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(sysbench_runs)")]
+        for column in ('lat_p95 REAL', 'lat_p99 REAL', 'partial INTEGER'):
+            if column.split()[0] not in columns:
+                self.connection.execute("ALTER TABLE sysbench_runs ADD COLUMN " + column)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS sysbench_intervals (run_id INTEGER, second INTEGER, threads INTEGER, "
+            "tps REAL, qps REAL, lat_pct REAL, err_per_sec REAL, reconn_per_sec REAL)")
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS sysbench_runs_key ON sysbench_runs (test, workload, config, threads)")
+        self.connection.commit()
+
+    def save(self, test, version, config, workload, threads, result):
+        # Store a parsed sysbench result, returns the run id
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO sysbench_runs (test, version, config, workload, threads, run_at, tps, qps, "
+                "transactions, queries, errors, reconnects, total_time, lat_min, lat_avg, lat_max, "
+                "percentile, lat_pct, lat_p95, lat_p99, partial) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (test, version, config, workload, int(threads), time.time()) +
+                tuple(result.get(name) for name in ('tps', 'qps', 'transactions', 'queries', 'errors',
+                                                    'reconnects', 'total_time', 'lat_min', 'lat_avg',
+                                                    'lat_max', 'percentile', 'lat_pct', 'lat_p95',
+                                                    'lat_p99')) + (int(result.get('partial', False)),))
+            run_id = cursor.lastrowid
+            self.connection.executemany(
+                "INSERT INTO sysbench_intervals VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [[run_id] + interval for interval in result['intervals']])
+        return run_id
+
+    def runs(self, test=None, version=None):
+        # Stored runs, oldest first
+        query = "SELECT * FROM sysbench_runs WHERE 1 = 1"
+        params = []
+        if test is not None:
+            query += " AND test = ?"
+            params.append(test)
+        if version is not None:
+            query += " AND version = ?"
+            params.append(version)
+        self.connection.row_factory = sqlite3.Row
+        try:
+            return self.connection.execute(query + " ORDER BY id", params).fetchall()
+        finally:
+            self.connection.row_factory = None
+
+    def close(self):
+        self.connection.close()
+
+
+def save_result(basedir, workload, config, threads, result, debug='NO'):
+    # Store a parsed result of the running test
+    store = ResultStore(SYSBENCH_RESULTS_DB)
+    try:
+        store.save(test_name(), build_version(basedir), config, workload, threads, result)
+    finally:
+        store.close()
+    if debug == 'YES':
+        print(workload + ' (' + config + ') : tps ' + str(result['tps']) + ', qps ' + str(result['qps']) +
+              ', p95 latency ' + str(result.get('lat_p95')) + 'ms, p99 latency ' + str(result.get('lat_p99')) +
+              'ms' + (' (stopped early)' if result.get('partial') else ''))
+
+
+def record(basedir, workload, config, threads, log_file, log_offset=0, debug='NO'):
+    """ Parse a sysbench log and store the result. Returns
+        the parsed result, None if the log has no report.
+    """
+    result = parse_log(log_file, log_offset)
+    if result is None:
+        return None
+    save_result(basedir, workload, config, threads, result, debug)
+    return result
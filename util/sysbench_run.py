@@ -1,4 +1,5 @@
 import os
+import re
 import itertools
 import sys
 from config import *
@@ -6,8 +7,17 @@ cwd = os.path.dirname(os.path.realpath(__file__))
 parent_dir = os.path.normpath(os.path.join(cwd, '../'))
 sys.path.insert(0, parent_dir)
 from util import utility
+from util import db_connection
+from util import sysbench_results
+from util import sysbench_workload
+from util import dataset_cache
+from util import cluster_pool
+from util import wsrep_sampler
+from util import wsrep_sync
 SYSBENCH_DB_CONNECT = " --mysql-user=" + SYSBENCH_USER + \
     " --mysql-password=" + SYSBENCH_PASS + " --db-driver=mysql "
+# The latency histogram gives the p95 and p99 of the results store
+SYSBENCH_REPORT = " --report-interval=" + str(SYSBENCH_REPORT_INTERVAL) + " --histogram=on"
 EXPORT_LUA_PATH = 'export SBTEST_SCRIPTDIR="' + parent_dir + \
             '/sysbench_lua"; export LUA_PATH="' + parent_dir + \
             '/sysbench_lua/?;' + parent_dir + '/sysbench_lua/?.lua"'
@@ -20,39 +30,76 @@ class SysbenchRun:
         self.debug = debug
         self.utility_cmd = utility.Utility(debug)
 
+    def log_size(self, log_file):
+        # Current size of a sysbench log, runs may append to the same log
+        if os.path.isfile(log_file):
+            return os.path.getsize(log_file)
+        return 0
+
+    def save_result(self, workload, config, threads, log_file, log_offset=0):
+        """ Parse throughput and latency of a finished
+            sysbench run and keep them in the results store
+        """
+        result = sysbench_results.record(self.basedir, workload, config, threads,
+                                         log_file, log_offset, self.debug)
+        if result is None:
+            print("WARNING! No sysbench report found in " + log_file)
+        return result
+
     def sanity_check(self, db):
         # Sanity check for sysbench run
         check_sybench = os.system('which sysbench >/dev/null 2>&1')
         if check_sybench != 0:
             print("ERROR!: sysbench package is not installed")
         # Create schema for sysbench run
-        query = self.basedir + "/bin/mysql --user=root --socket=" + \
-            self.socket + ' -e"drop database if exists ' + \
-            db + "; create database " + \
-            db + ';" > /dev/null 2>&1'
-        if self.debug == 'YES':
-            print(query)
-        query_status = os.system(query)
+        connection = db_connection.DbConnection('root', self.socket, self.debug)
+        query_status = connection.execute("drop database if exists " + db)
+        if query_status == 0:
+            query_status = connection.execute("create database " + db)
         if int(query_status) != 0:
             print("ERROR!: Could not create sysbench test database(" + db + ")")
             exit(1)
-        version = self.utility_cmd.version_check(self.basedir)   # Get version
         # Create sysbench user
-        create_user = self.basedir + "/bin/mysql --user=root --socket=" + \
-            self.socket + ' -e"create user if not exists ' + \
-            SYSBENCH_USER + "@'localhost' identified  by '" + \
-            SYSBENCH_PASS + "';grant all on *.* to " + SYSBENCH_USER + "@'localhost'" \
-            ';" > /dev/null 2>&1'
-        if self.debug == 'YES':
-            print(create_user)
-        query_status = os.system(create_user)
+        query_status = connection.execute("create user if not exists " + SYSBENCH_USER +
+                                          "@'localhost' identified by '" + SYSBENCH_PASS + "'")
+        if query_status == 0:
+            query_status = connection.execute("grant all on *.* to " + SYSBENCH_USER + "@'localhost'")
         if int(query_status) != 0:
             print("ERROR!: Could not create sysbench user : sysbench")
             return 1
         return 0
 
-    def sysbench_load(self, db, tables, threads, table_size):
-        # Sysbench data load
+    def cluster_node(self):
+        # True if the socket belongs to a cluster node started in workdir
+        return re.match(re.escape(self.workdir) + r'/node\d+/mysql\.sock$', self.socket) is not None
+
+    def dataset_cache(self, db):
+        """ Dataset snapshots are used only for a freshly started
+            cluster in workdir, restoring replaces every node datadir.
+            A leased pool cluster must keep its mysqld processes, so
+            it never uses the cache.
+        """
+        if not DATASET_CACHE or not self.cluster_node():
+            return None
+        cache = dataset_cache.DatasetCache(DATASET_CACHE, self.basedir, self.workdir, self.debug)
+        if cache.running_nodes() == 0 or cluster_pool.is_leased(self.workdir, cache.running_nodes()) or \
+                not cache.is_fresh(self.socket, db):
+            return None
+        return cache
+
+    def sysbench_load(self, db, tables, threads, table_size, use_cache=True):
+        # Sysbench data load, use_cache=False always runs the prepare
+        cache = self.dataset_cache(db) if use_cache else None
+        if cache is not None:
+            node = cache.running_nodes()
+            key = cache.cache_key('oltp_insert.lua', db, tables, table_size, node)
+            if cache.has_snapshot(key):
+                if self.debug == 'YES':
+                    print("Restoring sysbench dataset " + key + " from " + DATASET_CACHE)
+                if cache.restore(key, node) != 0:
+                    print("ERROR!: sysbench dataset restore is failed")
+                    return 1
+                return 0
         query = EXPORT_LUA_PATH + ";sysbench " + parent_dir + \
             "/sysbench_lua/oltp_insert.lua" \
             " --table-size=" + str(table_size) + \
@@ -67,23 +114,19 @@ class SysbenchRun:
         if int(query_status) != 0:
             print("ERROR!: sysbench data load run is failed")
             return 1
+        if cache is not None and cache.snapshot(key, node) != 0:
+            print("ERROR!: Could not save sysbench dataset snapshot")
+            return 1
         return 0
 
     def sysbench_ts_encryption(self, db, threads):
         # Check InnoDB system tablespace encryption
-        check_system_ts_encryption = self.basedir + "/bin/mysql --user=root --socket=" + \
-            self.socket + ' -Bse"select encryption from information_schema.innodb_tablespaces ' \
-            "where name='innodb_system';\" 2>&1"
-        if self.debug == 'YES':
-            print(check_system_ts_encryption)
-        check_system_ts_encryption = os.popen(check_system_ts_encryption).read().rstrip()
+        connection = db_connection.DbConnection('root', self.socket, self.debug)
+        check_system_ts_encryption = connection.scalar("select encryption from information_schema.innodb_tablespaces "
+                                                       "where name='innodb_system'")
 
         # Check default_table_encryption status
-        check_table_encryption = self.basedir + "/bin/mysql --user=root --socket=" + \
-            self.socket + ' -Bse"select @@default_table_encryption;" 2>&1'
-        if self.debug == 'YES':
-            print(check_table_encryption)
-        check_table_encryption = os.popen(check_table_encryption).read().rstrip()
+        check_table_encryption = connection.scalar("select @@default_table_encryption")
 
         for i in range(1, int(threads) - 4):
             query = self.basedir + "/bin/mysql --user=root --socket=" + \
@@ -142,6 +185,9 @@ class SysbenchRun:
         # Create sysbench table structure
         result = self.sysbench_load(db, table_count, table_count, 10000)
         self.utility_cmd.check_testcase(result, "Sysbench data load")
+        sampler = self.wsrep_sampler('oltp_custom_' + str(thread))
+        if sampler is not None:
+            sampler.start()
         rand_types = ['uniform', 'gaussian', 'special', 'pareto']
         delete_inserts = [10, 20, 30, 40, 50]
         index_updates = [10, 20, 30, 40, 50]
@@ -159,7 +205,7 @@ class SysbenchRun:
                 " --db-ps-mode=disable --delete_inserts=" + str(delete_insert) + \
                 " --index_updates=" + str(index_update) + \
                 " --time=" + str(10) + \
-                " --non_index_updates=" + str(non_index_update) + " run >" + \
+                " --non_index_updates=" + str(non_index_update) + SYSBENCH_REPORT + " run >" + \
                 self.workdir + "/log/sysbench_oltp_read_write.log"
             if self.debug == 'YES':
                 print(query)
@@ -172,11 +218,19 @@ class SysbenchRun:
                 print("ERROR!: sysbench oltp(" + combination + ") run is failed")
             else:
                 self.utility_cmd.check_testcase(query_status, "Sysbench oltp(" + combination + ") run")
+                self.save_result('oltp_custom', "tables:" + str(table_count) + ", table_size:" +
+                                 str(table_size) + ", " + combination, thread,
+                                 self.workdir + "/log/sysbench_oltp_read_write.log")
+        if sampler is not None:
+            sampler.stop()
 
     def sysbench_custom_read_qa(self, db, table_count, thread, table_size):
         # Create sysbench table structure
         result = self.sysbench_load(db, table_count, table_count, table_size)
         self.utility_cmd.check_testcase(result, "Sysbench data load")
+        sampler = self.wsrep_sampler('read_only_custom_' + str(thread))
+        if sampler is not None:
+            sampler.start()
         sum_ranges = [2, 4, 6]
         distinct_ranges = [3, 5, 7]
         simple_ranges = [1, 3, 5]
@@ -196,7 +250,7 @@ class SysbenchRun:
                 " --simple_ranges=" + str(simple_range) + \
                 " --order_ranges=" + str(order_range) + \
                 " --point_selects=" + str(point_select) + \
-                " --time=" + str(10) + \
+                " --time=" + str(10) + SYSBENCH_REPORT + \
                 " run >" + self.workdir + "/log/sysbench_oltp_read_only.log"
             if self.debug == 'YES':
                 print(query)
@@ -211,6 +265,11 @@ class SysbenchRun:
                 exit(1)
             else:
                 self.utility_cmd.check_testcase(query_status, "Sysbench read only(" + combination + ") run")
+                self.save_result('read_only_custom', "tables:" + str(table_count) + ", table_size:" +
+                                 str(table_size) + ", " + combination, thread,
+                                 self.workdir + "/log/sysbench_oltp_read_only.log")
+        if sampler is not None:
+            sampler.stop()
 
     def sysbench_cleanup(self, db, tables, threads, table_size):
         # Sysbench data cleanup
@@ -229,71 +288,86 @@ class SysbenchRun:
             return 1
         return 0
 
-    def sysbench_oltp_read_write(self, db, tables, threads, table_size, time, background=None):
-        if background == "Yes":
-            str_run = self.workdir + "/log/sysbench_read_write_" + str(threads) + ".log & "
-        else:
-            str_run = self.workdir + "/log/sysbench_read_write_" + str(threads) + ".log "
-        # Sysbench OLTP read write run
-        query = "sysbench /usr/share/sysbench/oltp_read_write.lua" \
+    def wsrep_sampler(self, name):
+        """ wsrep status sampler for all nodes of the cluster, None
+            if sampling is disabled or the socket is not a cluster node.
+            Runs with the same name on other nodes share the sampler.
+        """
+        if not WSREP_SAMPLE_INTERVAL or float(WSREP_SAMPLE_INTERVAL) <= 0 or not self.cluster_node():
+            return None
+        return wsrep_sampler.SharedSampler(wsrep_sync.cluster_sockets(self.workdir),
+                                           self.workdir + "/log/wsrep_status_" + name + ".csv",
+                                           WSREP_SAMPLE_INTERVAL, self.debug)
+
+    def start_workload(self, query, log_file, workload, config, threads, sample=True):
+        """ Start a background sysbench run. Returns the workload
+            handle, use its stop() method to end the run. The
+            result is stored when the run is stopped or waited for.
+        """
+        sampler = None
+        if sample:
+            sampler = self.wsrep_sampler(workload + "_" + str(threads))
+        return sysbench_workload.SysbenchWorkload(query, log_file, self.workdir, self.socket, self.debug,
+                                                  workload, config, threads, sampler, self.basedir).start()
+
+    def oltp_run(self, lua, workload, log_file, db, tables, threads, table_size, time, background, sample=True):
+        """ Run a sysbench oltp script. Foreground runs return
+            0/1 and store their result, background runs return
+            a workload handle. With sample, wsrep status is
+            recorded while sysbench is running.
+        """
+        query = "sysbench /usr/share/sysbench/" + lua + \
             " --table-size=" + str(table_size) + \
             " --tables=" + str(tables) + \
             " --threads=" + str(threads) + \
             " --mysql-db=" + db + " " + SYSBENCH_DB_CONNECT + \
             " --mysql-socket=" + self.socket + \
             " --time=" + str(time) + \
-            " --db-ps-mode=disable run >> " + str_run
+            " --db-ps-mode=disable" + SYSBENCH_REPORT + " run"
+        config = "tables:" + str(tables) + ", table_size:" + str(table_size) + ", time:" + str(time)
+        if background == "Yes":
+            return self.start_workload(query, log_file, workload, config, threads, sample)
+        query += " >> " + log_file
         if self.debug == 'YES':
             print(query)
+        log_offset = self.log_size(log_file)
+        sampler = None
+        if sample:
+            sampler = self.wsrep_sampler(workload + "_" + str(threads))
+        if sampler is not None:
+            sampler.start()
         query_status = os.system(query)
+        if sampler is not None:
+            sampler.stop()
         if int(query_status) != 0:
-            print("ERROR!: sysbench read write run is failed")
             return 1
+        self.save_result(workload, config, threads, log_file, log_offset)
         return 0
 
+    def sysbench_oltp_read_write(self, db, tables, threads, table_size, time, background=None):
+        # Sysbench OLTP read write run
+        result = self.oltp_run("oltp_read_write.lua", 'oltp_read_write',
+                               self.workdir + "/log/sysbench_read_write_" + str(threads) + ".log",
+                               db, tables, threads, table_size, time, background)
+        if result == 1:
+            print("ERROR!: sysbench read write run is failed")
+        return result
+
     def sysbench_oltp_read_only(self, db, tables, threads, table_size, time, background=None):
-        if background == "Yes":
-            str_run = self.workdir + "/log/sysbench_read_only.log & "
-        else:
-            str_run = self.workdir + "/log/sysbench_read_only.log "
         # Sysbench OLTP read only run
-        query = "sysbench /usr/share/sysbench/oltp_read_only.lua" \
-            " --table-size=" + str(table_size) + \
-            " --tables=" + str(tables) + \
-            " --threads=" + str(threads) + \
-            " --mysql-db=" + db + " " + SYSBENCH_DB_CONNECT + \
-            " --mysql-socket=" + self.socket + \
-            " --time=" + str(time) + \
-            " --db-ps-mode=disable run > " + str_run
-        if self.debug == 'YES':
-            print(query)
-        query_status = os.system(query)
-        if int(query_status) != 0:
+        result = self.oltp_run("oltp_read_only.lua", 'oltp_read_only', self.workdir + "/log/sysbench_read_only.log",
+                               db, tables, threads, table_size, time, background)
+        if result == 1:
             print("ERROR!: sysbench read only run is failed")
-            return 1
-        return 0
+        return result
 
     def sysbench_oltp_write_only(self, db, tables, threads, table_size, time, background=None):
-        if background == "Yes":
-            str_run = self.workdir + "/log/sysbench_write_only.log &"
-        else:
-            str_run = self.workdir + "/log/sysbench_write_only.log"
         # Sysbench OLTP write only run
-        query = "sysbench /usr/share/sysbench/oltp_write_only.lua" \
-            " --table-size=" + str(table_size) + \
-            " --tables=" + str(tables) + \
-            " --threads=" + str(threads) + \
-            " --mysql-db=" + db + " " + SYSBENCH_DB_CONNECT + \
-            " --mysql-socket=" + self.socket + \
-            " --time=" + str(time) + \
-            " --db-ps-mode=disable run > " + str_run
-        if self.debug == 'YES':
-            print(query)
-        query_status = os.system(query)
-        if int(query_status) != 0:
+        result = self.oltp_run("oltp_write_only.lua", 'oltp_write_only', self.workdir + "/log/sysbench_write_only.log",
+                               db, tables, threads, table_size, time, background)
+        if result == 1:
             print("ERROR!: sysbench write only run is failed")
-            return 1
-        return 0
+        return result
 
     def sysbench_custom_table(self, db, table_count, thread, table_size):
         table_format = ['DEFAULT', 'DYNAMIC', 'FIXED', 'COMPRESSED', 'REDUNDANT', 'COMPACT']
@@ -333,24 +407,9 @@ class SysbenchRun:
         return 0
 
     def sysbench_tpcc_run(self, db, tables, threads, table_size, time, background=None):
-        if background == "Yes":
-            str_run = self.workdir + "/log/sysbench_write_only.log &"
-        else:
-            str_run = self.workdir + "/log/sysbench_write_only.log"
         # Sysbench OLTP write only run
-        query = "sysbench /usr/share/sysbench/oltp_write_only.lua" \
-            " --table-size=" + str(table_size) + \
-            " --tables=" + str(tables) + \
-            " --threads=" + str(threads) + \
-            " --mysql-db=" + db + " " + SYSBENCH_DB_CONNECT + \
-            " --mysql-socket=" + self.socket + \
-            " --time=" + str(time) + \
-            " --db-ps-mode=disable run > " + str_run
-        if self.debug == 'YES':
-            print(query)
-        query_status = os.system(query)
-        if int(query_status) != 0:
+        result = self.oltp_run("oltp_write_only.lua", 'oltp_write_only', self.workdir + "/log/sysbench_write_only.log",
+                               db, tables, threads, table_size, time, background)
+        if result == 1:
             print("ERROR!: sysbench write only run is failed")
-            return 1
-        return 0
-
+        return result
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# This will help us to run sysbench in the background and stop it
+# again without looking for the process with pidof/ps.
+
+import os
+import atexit
+import signal
+import subprocess
+import threading
+from util import sysbench_results
+
+# Background workloads started by this process
+_workloads = []
+_workloads_lock = threading.Lock()
+
+
+class SysbenchWorkload:
+    def __init__(self, command, log_file, workdir, socket, debug, workload='', config='', threads=0, sampler=None,
+                 basedir=None):
+        self.command = command
+        self.log_file = log_file
+        self.workdir = workdir
+        self.socket = socket
+        self.debug = debug
+        self.workload = workload
+        self.config = config
+        self.threads = threads
+        # wsrep status sampler which runs as long as the workload
+        self.sampler = sampler
+        # With basedir the result is kept in the results store when the run ends
+        self.basedir = basedir
+        self.saved = False
+        self.process = None
+        self.reader = None
+        self.output = []
+        self.output_lock = threading.Lock()
+        self.started = threading.Event()
+
+    def start(self):
+        """ Start sysbench in its own process group. The output
+            is appended to log_file while it is running.
+        """
+        if self.debug == 'YES':
+            print(self.command + ' >> ' + self.log_file + ' &')
+        self.process = subprocess.Popen(self.command, shell=True, stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT, universal_newlines=True,
+                                        errors='replace', start_new_session=True)
+        self.reader = threading.Thread(target=self.read_output, daemon=True)
+        self.reader.start()
+        if self.sampler is not None:
+            self.sampler.start()
+        with _workloads_lock:
+            _workloads.append(self)
+        return self
+
+    def read_output(self):
+        # Copy sysbench output to the log file as it comes
+        with open(self.log_file, 'a') as log:
+            for line in self.process.stdout:
+                log.write(line)
+                log.flush()
+                with self.output_lock:
+                    self.output.append(line)
+                if line.startswith('Threads started!'):
+                    self.started.set()
+        self.started.set()
+
+    def startup_status(self, timeout=60):
+        """ Wait until sysbench has started its threads.
+            Returns 0 if the workload is running (or already
+            finished successfully), otherwise 1.
+        """
+        self.started.wait(timeout)
+        if self.process.poll() is None or self.process.returncode == 0:
+            return 0
+        return 1
+
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def finish(self):
+        self.reader.join()
+        if self.sampler is not None:
+            self.sampler.stop()
+        with _workloads_lock:
+            if self in _workloads:
+                _workloads.remove(self)
+        self.save_result()
+
+    def save_result(self):
+        # Store the result once, also for a run which was stopped early
+        if self.basedir is None or self.saved:
+            return
+        self.saved = True
+        result = self.result()
+        if result is None:
+            print("WARNING! No sysbench report found in " + self.log_file)
+            return
+        sysbench_results.save_result(self.basedir, self.workload, self.config, self.threads, result, self.debug)
+
+    def wait(self, timeout=None):
+        # Wait for the run to end, returns the sysbench exit code
+        return_code = self.process.wait(timeout)
+        self.finish()
+        return return_code
+
+    def stop(self, timeout=10):
+        """ Stop the run with SIGTERM (SIGKILL if it does not exit
+            in time) and return what it reported until then.
+        """
+        if self.is_running():
+            if self.debug == 'YES':
+                print("Terminating sysbench run on " + self.socket)
+            try:
+                os.killpg(self.process.pid, signal.SIGTERM)
+                self.process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                os.killpg(self.process.pid, signal.SIGKILL)
+                self.process.wait()
+            except ProcessLookupError:
+                self.process.wait()
+        self.finish()
+        return self.result()
+
+    def result(self):
+        """ Parsed sysbench report. A stopped run has no final
+            report, its summary is made from the interval reports.
+        """
+        with self.output_lock:
+            output = ''.join(self.output)
+        return sysbench_results.parse(output, partial=True)
+
+
+def workloads(workdir=None, socket=None):
+    # Running background workloads, optionally of one cluster or node only
+    with _workloads_lock:
+        return [workload for workload in _workloads if workload.is_running() and
+                (workdir is None or workload.workdir == workdir) and
+                (socket is None or workload.socket == socket)]
+
+
+def stop_all(workdir=None, socket=None):
+    # Stop background workloads, returns their results
+    return [workload.stop() for workload in workloads(workdir, socket)]
+
+
+atexit.register(stop_all)
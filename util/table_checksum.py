@@ -1,5 +1,6 @@
 import os
 from util import utility
+from util import db_connection
 
 
 class TableChecksum:
@@ -30,35 +31,21 @@ class TableChecksum:
 
         version = self.utility_cmd.version_check(self.basedir)
         # Creating pt_user for database consistency check
-        query = self.basedir + "/bin/mysql --user=root --socket=" + \
-            self.socket + ' -e"create user if not exists' \
-            " pt_user@'localhost' identified by 'test';" \
-            "grant all on *.* to pt_user@'localhost'" \
-            ';" > /dev/null 2>&1'
-        self.run_query(query)
+        connection = db_connection.DbConnection('root', self.socket, self.debug)
+        connection.execute("create user if not exists pt_user@'localhost' identified by 'test'")
+        connection.execute("grant all on *.* to pt_user@'localhost'")
         # Creating percona db for cluster data checksum
-        query = self.basedir + "/bin/mysql --user=root --socket=" + \
-            self.socket + ' -e"drop database if exists percona;' \
-            'create database percona;' \
-            'drop table if exists percona.dsns;' \
-            'create table percona.dsns(id int,' \
-            'parent_id int,dsn varchar(100), ' \
-            'primary key(id));" > /dev/null 2>&1'
-        self.run_query(query)
+        connection.execute("drop database if exists percona")
+        connection.execute("create database percona")
+        connection.execute("create table percona.dsns(id int, parent_id int, "
+                           "dsn varchar(100), primary key(id))")
 
+        dsns = []
         for i in range(1, int(self.node) + 1):
-            port = self.basedir + "/bin/mysql --user=root " + \
-                '--socket=' + self.workdir + '/node' + str(i) + '/mysql.sock' + \
-                ' -Bse"select @@port" 2>&1'
-            port = os.popen(port).read().rstrip()
-
-            insert_query = self.basedir + "/bin/mysql --user=root " + \
-                '--socket=' + self.socket + \
-                ' -e"insert into percona.dsns (id,dsn) values (' + \
-                str(i) + ",'h=127.0.0.1,P=" + str(port) + \
-                ",u=pt_user,p=test');" \
-                '"> /dev/null 2>&1'
-            self.run_query(insert_query)
+            port = db_connection.DbConnection('root', self.workdir + '/node' + str(i) + '/mysql.sock',
+                                              self.debug).scalar("select @@port")
+            dsns.append((i, 'h=127.0.0.1,P=' + str(port) + ',u=pt_user,p=test'))
+        connection.execute_many("insert into percona.dsns (id,dsn) values (%s, %s)", dsns)
         return 0
 
     def error_status(self, error_code):
@@ -96,9 +83,7 @@ class TableChecksum:
             method will compare the
             data between cluster nodes
         """
-        port = self.basedir + "/bin/mysql --user=root --socket=" + \
-            self.socket + ' -Bse"select @@port" 2>&1'
-        port = os.popen(port).read().rstrip()
+        port = db_connection.DbConnection('root', self.socket, self.debug).scalar("select @@port")
         version = self.utility_cmd.version_check(self.basedir)
 
         run_checksum = self.pt_basedir + "/bin/pt-table-checksum h=127.0.0.1,P=" + \
@@ -2,14 +2,23 @@
 import os
 import random
 import shutil
-import subprocess
 import sys
-import time
 from datetime import datetime
 from distutils.spawn import find_executable
+import mysql.connector
 from util import db_connection
+from util import cluster_checksum
+from util import merkle_checksum
 from util import galera_startup
 from util import md_startup
+from util import port_allocator
+from util import node_readiness
+from util import wsrep_sync
+from util import cluster_pool
+from util import cnf_model
+
+# Seconds to wait for cluster nodes to apply pending write sets
+SYNC_TIMEOUT = 300
 
 
 class Utility:
@@ -61,20 +70,21 @@ class Utility:
         cnf_name.close()
         return 0
 
+    def gtid_binlog_state(self, socket):
+        # @@gtid_binlog_state of the server, '' if it does not answer
+        try:
+            return str(db_connection.DbConnection('root', socket, self.debug).scalar('SELECT @@gtid_binlog_state'))
+        except mysql.connector.Error:
+            return ''
+
     def check_gtid_consistency(self, basedir, socket1, socket2):
-        """ Compare the table count between two nodes
+        """ Compare the GTID binlog state between two nodes
         """
-        query = basedir + '/bin/mysql -uroot --socket=' + \
-            socket1 + ' -Bse"SELECT @@gtid_binlog_state;"'
-        gtid_binlog_state_1 = os.popen(query).read().rstrip()
+        gtid_binlog_state_1 = self.gtid_binlog_state(socket1)
         if self.debug == 'YES':
-            print(query)
             print('GTID binlog state ' + gtid_binlog_state_1)
-        query = basedir + '/bin/mysql -uroot --socket=' + \
-            socket2 + ' -Bse"SELECT @@gtid_binlog_state;"'
-        gtid_binlog_state_2 = os.popen(query).read().rstrip()
+        gtid_binlog_state_2 = self.gtid_binlog_state(socket2)
         if self.debug == 'YES':
-            print(query)
             print('GTID binlog state ' + gtid_binlog_state_2)
         if gtid_binlog_state_1 == gtid_binlog_state_2:
             return 0
@@ -85,32 +95,39 @@ class Utility:
             return 1
 
     def check_table_count(self, basedir, db, socket1, socket2):
-        """ Compare the table count between two nodes
+        """ Compare the table checksums between two nodes
         """
-        query = basedir + '/bin/mysql -uroot ' + db + ' --socket=' + \
-                socket1 + ' -Bse"show tables;"'
-        tables = os.popen(query).read().rstrip()
-        # Compare the table checksum between node1 and node2
-        for table in tables.split('\n'):
-            query = basedir + '/bin/mysql -uroot --socket=' + \
-                socket1 + ' -Bse"checksum table ' + \
-                db + '.' + table + ';"'
-            table_count_node1 = os.popen(query).read().rstrip()
-            if self.debug == 'YES':
-                print(query)
-                print('Table count ' + table_count_node1)
-            query = basedir + '/bin/mysql -uroot --socket=' + \
-                socket2 + ' -Bse"checksum table ' + \
-                db + '.' + table + ';"'
-            table_count_node2 = os.popen(query).read().rstrip()
-            if self.debug == 'YES':
-                print(query)
-                print('Table count ' + table_count_node2)
-            if table_count_node1 == table_count_node2:
-                return 0
+        if wsrep_sync.wait_for_cluster([socket1, socket2], SYNC_TIMEOUT, self.debug) != 0:
+            return 1
+        return cluster_checksum.ClusterChecksum([socket1, socket2], self.debug).check(db)
+
+    def wait_for_cluster_sync(self, workdir, timeout=SYNC_TIMEOUT):
+        """ Wait until every running cluster node has applied
+            all write sets committed in the cluster so far
+        """
+        return wsrep_sync.wait_for_cluster(wsrep_sync.cluster_sockets(workdir), timeout, self.debug)
+
+    def check_cluster_consistency(self, basedir, workdir, node, db, method='checksum'):
+        """ Compare the table checksums across all
+            running cluster nodes. method 'merkle' reports
+            the divergent primary key ranges of big tables.
+        """
+        sockets = []
+        for i in range(1, int(node) + 1):
+            socket = workdir + '/node' + str(i) + '/mysql.sock'
+            if os.path.exists(socket):
+                sockets.append(socket)
             else:
-                print("\tTable(" + db + '.' + table + " ) checksum is different")
-                return 1
+                print("\tSkipping node" + str(i) + " checksum, node is not running")
+        if len(sockets) < 2:
+            print("\tERROR! Need at least two running nodes to compare " + db)
+            return 1
+        # Compare only after every node has applied the same write sets
+        if wsrep_sync.wait_for_cluster(sockets, SYNC_TIMEOUT, self.debug) != 0:
+            return 1
+        if method == 'merkle':
+            return merkle_checksum.MerkleChecksum(sockets, self.debug).check(db)
+        return cluster_checksum.ClusterChecksum(sockets, self.debug).check(db)
 
     def pxb_sanity_check(self, basedir, workdir, socket):
         """ Check pxb installation and cleanup backup directory
@@ -182,21 +199,25 @@ class Utility:
         if encryption == 'YES':
             os.system("cp " + source_datadir + "/keyring " + dest_datadir)
 
+    def slave_status(self, socket, channel):
+        # Get the SHOW SLAVE STATUS row, None if replication is not configured
+        if channel != 'msr':
+            channel = ""  # channel name is to identify the replication source
+        try:
+            rows = db_connection.DbConnection('root', socket, self.debug).\
+                query("SHOW SLAVE " + channel + " STATUS")
+        except mysql.connector.Error:
+            return None
+        if not rows:
+            return None
+        return rows[0]
+
     def replication_io_status(self, basedir, socket, node, channel):
         """ This will check replication IO thread
             running status
         """
-        if channel != 'msr':
-            channel = ""  # channel name is to identify the replication source
-        # Get slave status
-        io_status = basedir + "/bin/mysql --user=root --socket=" + \
-            socket + " -Bse\"SHOW SLAVE " + channel + " STATUS\G\" 2>&1 " \
-            '| grep "Slave_IO_Running:" ' \
-            "| awk '{ print $2 }'"
-        if self.debug == 'YES':
-            print(io_status)
-        io_status = os.popen(io_status).read().rstrip()
-        if io_status == "Yes":
+        slave_status = self.slave_status(socket, channel)
+        if slave_status is not None and slave_status.Slave_IO_Running == "Yes":
             check_slave_status = 'ON'
         else:
             check_slave_status = 'OFF'
@@ -212,18 +233,8 @@ class Utility:
         """ This will check replication SQL thread
             running status
         """
-        if channel != 'msr':
-            channel = ""  # channel name is to identify the replication source
-        # Get slave status
-        version = self.version_check(basedir)
-        sql_status = basedir + "/bin/mysql --user=root --socket=" + \
-            socket + " -Bse\"SHOW SLAVE " + channel + " STATUS\G\" 2>&1 " \
-            '| grep "Slave_SQL_Running:" ' \
-            "| awk '{ print $2 }'"
-        if self.debug == 'YES':
-            print(sql_status)
-        sql_status = os.popen(sql_status).read().rstrip()
-        if sql_status == "Yes":
+        slave_status = self.slave_status(socket, channel)
+        if slave_status is not None and slave_status.Slave_SQL_Running == "Yes":
             check_slave_status = 'ON'
         else:
             check_slave_status = 'OFF'
@@ -237,43 +248,43 @@ class Utility:
 
     def rpl_flush_log(self, basedir, socket):
         # Run FLUSH LOGS command in given server
-        flush_log = basedir + "/bin/mysql --user=root --socket=" + \
-            socket + ' -Bse "flush logs" 2>&1'
-        if self.debug == 'YES':
-            print(flush_log)
-        os.system(flush_log)
+        return db_connection.DbConnection('root', socket, self.debug).execute("FLUSH LOGS")
+
+    def master_logs(self, socket):
+        # SHOW MASTER LOGS rows, empty if the server does not answer
+        try:
+            return db_connection.DbConnection('root', socket, self.debug).query("SHOW MASTER LOGS")
+        except mysql.connector.Error:
+            return []
 
     def rpl_master_log_file(self, basedir, socket):
         # get latest master log file from the server
-        master_log_file = basedir + "/bin/mysql --user=root --socket=" + \
-            socket + " -Bse 'show master logs' | awk '{print $1}' | tail -1 2>&1"
-        if self.debug == 'YES':
-            print(master_log_file)
-        return os.popen(master_log_file).read().rstrip()
+        rows = self.master_logs(socket)
+        if not rows:
+            return ''
+        return rows[-1].Log_name
 
     def rpl_master_log_pos(self, basedir, socket):
         # get latest master log position from the server
-        master_log_pos = basedir + "/bin/mysql --user=root --socket=" + \
-            socket + " -Bse 'show master logs' | awk '{print $2}' | tail -1 2>&1"
-        if self.debug == 'YES':
-            print(master_log_pos)
-        return os.popen(master_log_pos).read().rstrip()
+        rows = self.master_logs(socket)
+        if not rows:
+            return ''
+        return str(rows[-1].File_size)
 
     def get_port(self, basedir, socket):
-        # get the port from the server
-        server_port = basedir + "/bin/mysql --user=root --socket=" + \
-            socket + ' -Bse "select @@port" 2>&1'
-        if self.debug == 'YES':
-            print(server_port)
-        return os.popen(server_port).read().rstrip()
+        # get the port from the server, '' if it does not answer
+        try:
+            return str(db_connection.DbConnection('root', socket, self.debug).scalar("SELECT @@port"))
+        except mysql.connector.Error:
+            return ''
 
     def rpl_binlog_gtid_pos(self, basedir, socket, master_log_file, master_log_pos):
-        binlog_gtid_pos = basedir + "/bin/mysql --user=root --socket=" + \
-            socket + " -Bse \"select binlog_gtid_pos('" + master_log_file + \
-            "'," + master_log_pos + ")\" | awk '{print $1}' | tail -1 2>&1"
-        if self.debug == 'YES':
-            print(binlog_gtid_pos)
-        return os.popen(binlog_gtid_pos).read().rstrip()
+        try:
+            return str(db_connection.DbConnection('root', socket, self.debug).
+                       scalar("SELECT binlog_gtid_pos(%s, %s)", (master_log_file, int(master_log_pos))))
+        except (mysql.connector.Error, ValueError):
+            # Server down, or no master log position ('') to look up
+            return ''
 
     def invoke_replication(self, basedir, master_socket, slave_socket, repl_mode, comment):
         """ This method will invoke replication.
@@ -294,11 +305,7 @@ class Utility:
         # flush logs
         self.rpl_flush_log(basedir, master_socket)
         if repl_mode == 'backup_slave':
-            data_dir = basedir + "/bin/mysql --user=root --socket=" + \
-                       slave_socket + " -Bse 'select @@datadir';"
-            if self.debug == 'YES':
-                print(data_dir)
-            data_dir = os.popen(data_dir).read().rstrip()
+            data_dir = db_connection.DbConnection('root', slave_socket, self.debug).scalar('SELECT @@datadir')
             query = "cat " + data_dir + "xtrabackup_binlog_pos_innodb | awk '{print $1}'"
             master_log_file = os.popen(query).read().rstrip()
             query = "cat " + data_dir + "xtrabackup_binlog_pos_innodb | awk '{print $2}'"
@@ -306,17 +313,12 @@ class Utility:
         else:
             # get master log file and position
             master_log_file = self.rpl_master_log_file(basedir, master_socket)
-            master_log_pos = self.rpl_master_log_file(basedir, master_socket)
+            master_log_pos = self.rpl_master_log_pos(basedir, master_socket)
 
         # get master port number
         master_port = self.get_port(basedir, master_socket)
         if repl_mode == 'GTID':
-            binlog_gtid_pos = basedir + "/bin/mysql --user=root --socket=" + \
-                              master_socket + " -Bse \"select binlog_gtid_pos('" + master_log_file + \
-                              "'," + master_log_pos + ")\" | awk '{print $1}' | tail -1 2>&1"
-            if self.debug == 'YES':
-                print(binlog_gtid_pos)
-            binlog_gtid_pos = os.popen(binlog_gtid_pos).read().rstrip()
+            binlog_gtid_pos = self.rpl_binlog_gtid_pos(basedir, master_socket, master_log_file, master_log_pos)
             apply_gtid_slave_pos = basedir + "/bin/mysql --user=root --socket=" + \
                 slave_socket + " -Bse\"set global gtid_slave_pos='" + binlog_gtid_pos + "';\" 2>&1"
             if self.debug == 'YES':
@@ -386,14 +388,14 @@ class Utility:
         self.rpl_flush_log(basedir, master_socket)
         # get master log file, position and port number
         master_log_file = self.rpl_master_log_file(basedir, master_socket)
-        master_log_pos = self.rpl_master_log_file(basedir, master_socket)
+        master_log_pos = self.rpl_master_log_pos(basedir, master_socket)
         master_port = self.get_port(basedir, master_socket)
         self.change_master(basedir, slave_socket, master_port, master_log_file, master_log_pos, repl_mode, comment)
         # flush logs
         self.rpl_flush_log(basedir, slave_socket)
         # get master log file, position and port number
         master_log_file = self.rpl_master_log_file(basedir, slave_socket)
-        master_log_pos = self.rpl_master_log_file(basedir, slave_socket)
+        master_log_pos = self.rpl_master_log_pos(basedir, slave_socket)
         master_port = self.get_port(basedir, slave_socket)
         self.change_master(basedir, master_socket, master_port, master_log_file, master_log_pos, repl_mode, comment)
 
@@ -441,7 +443,10 @@ class Utility:
         self.check_testcase(result, "Initiated replication from master1 and master2")
 
     def start_galera(self, parent_dir, workdir, basedir, node, socket, user, encryption, my_extra):
-        # Start MariaDB Galera cluster
+        # Start MariaDB Galera cluster, or use the warm one qa_framework.py leased to this test
+        if cluster_pool.lease_warm_cluster(workdir, node, encryption, my_extra):
+            self.check_testcase(0, "Cluster startup (warm cluster from cluster pool)")
+            return
         dbconnection_check = db_connection.DbConnection(user, socket)
         server_startup = galera_startup.StartCluster(parent_dir, workdir, basedir, int(node), self.debug)
         result = server_startup.sanity_check()
@@ -465,7 +470,7 @@ class Utility:
         """
         # Start MariaDB Galera cluster for replication test
         dbconnection_check = db_connection.DbConnection(user, socket)
-        server_startup = md_startup.StartPerconaServer(parent_dir, workdir, basedir, int(node))
+        server_startup = md_startup.StartPerconaServer(parent_dir, workdir, basedir, int(node), self.debug)
         result = server_startup.sanity_check()
         self.check_testcase(result, "MD: Startup sanity check")
         if encryption == 'YES':
@@ -482,90 +487,58 @@ class Utility:
         self.check_testcase(result, "MD: Database connection")
 
     def stop_galera(self, workdir, basedir, node):
-        # Stop MariaDB Galera cluster
+        # Stop MariaDB Galera cluster, a leased pool cluster goes back to the pool running
+        if cluster_pool.is_leased(workdir, node):
+            self.check_testcase(0, "Galera: returning cluster to cluster pool")
+            return
         for i in range(int(node), 0, -1):
+            db_connection.DbConnection('root', workdir + '/node' + str(i) + '/mysql.sock').close_all()
             shutdown_node = basedir + '/bin/mysqladmin --user=root --socket=' + \
                             workdir + '/node' + str(i) + '/mysql.sock shutdown > /dev/null 2>&1'
             if self.debug == 'YES':
                 print(shutdown_node)
             result = os.system(shutdown_node)
             self.check_testcase(result, "Galera: shutting down cluster node" + str(i))
+        port_allocator.get_allocator(self.debug).release(workdir)
 
     def stop_md(self, workdir, basedir, node):
         # Stop Percona Server
         for i in range(int(node), 0, -1):
+            db_connection.DbConnection('root', '/tmp/mdnode' + str(i) + '.sock').close_all()
             shutdown_node = basedir + '/bin/mysqladmin --user=root --socket=/tmp/mdnode' + \
                             str(i) + '.sock shutdown > /dev/null 2>&1'
             if self.debug == 'YES':
                 print(shutdown_node)
             result = os.system(shutdown_node)
             self.check_testcase(result, "MD: shutting down MariaDB Server" + str(i))
+        port_allocator.get_allocator(self.debug).release(workdir + '#md')
 
     def galera_startup_check(self, basedir, workdir, cluster_node):
         """ This method will check the node
             startup status.
         """
-        query_cluster_status = basedir + '/bin/mysql --user=root --socket=' + \
-            workdir + '/node' + str(cluster_node) + \
-            '/mysql.sock -Bse"show status like \'wsrep_local_state_comment\';"' \
-            ' 2>/dev/null | awk \'{print $2}\''
-        ping_query = basedir + '/bin/mysqladmin --user=root --socket=' + \
-            workdir + '/node' + str(cluster_node) + \
-            '/mysql.sock ping > /dev/null 2>&1'
-        for startup_timer in range(300):
-            time.sleep(1)
-            cluster_status = os.popen(query_cluster_status).read().rstrip()
-            if cluster_status == 'Synced':
-                self.check_testcase(0, "Node startup is successful")
-                break
-            if startup_timer > 298:
-                self.check_testcase(0, "Warning! Node is not synced with cluster. "
-                                       "Check the error log to get more info")
-                ping_check = subprocess.call(ping_query, shell=True, stderr=subprocess.DEVNULL)
-                ping_status = ("{}".format(ping_check))
-                if int(ping_status) == 0:
-                    self.check_testcase(int(ping_status), "Node startup is successful "
-                                                          "(Node status:" + cluster_status + ")")
-                    break  # break the loop if mysqld is running
+        readiness = node_readiness.node_waiter(workdir, cluster_node, self.debug)
+        if readiness.wait('synced', 300) == 0:
+            self.check_testcase(0, "Node startup is successful")
+        else:
+            self.check_testcase(0, "Warning! Node is not synced with cluster. "
+                                   "Check the error log to get more info")
+            if 'ready' in readiness.events:
+                self.check_testcase(0, "Node startup is successful "
+                                       "(Node status:" + readiness.state + ")")
 
     def node_joiner(self, workdir, basedir, donor_node, joiner_node):
         # Add new node to existing cluster
         donor = 'node' + donor_node  # Donor node
         joiner = 'node' + joiner_node  # Joiner node
-        shutil.copy(workdir + '/conf/' + donor + '.cnf',
-                    workdir + '/conf/' + joiner + '.cnf')
-        query = basedir + '/bin/mysql --user=root --socket=' + workdir + '/node' + donor_node + \
-                '/mysql.sock -Bse"show variables like \'wsrep_cluster_address\';"' \
-                ' 2>/dev/null | awk \'{print $2}\''
-        wsrep_cluster_addr = os.popen(query).read().rstrip()  # Get cluster address
-        query = basedir + "/bin/mysql --user=root --socket=" + \
-                workdir + '/node' + donor_node + '/mysql.sock -Bse"select @@port" 2>&1'
-        if self.debug == 'YES':
-            print(query)
-        port_no = os.popen(query).read().rstrip()  # Port number from Donor
-        wsrep_port_no = int(port_no) + 108  # New wsrep port number
-        port_no = int(port_no) + 100  # New Joiner port number
+        wsrep_cluster_addr = db_connection.DbConnection('root', workdir + '/node' + donor_node + '/mysql.sock',
+                                                        self.debug).scalar('SELECT @@wsrep_cluster_address')
+        joiner_ports = port_allocator.get_allocator(self.debug).lease(workdir + '#' + joiner, 1)
+        if joiner_ports is None:
+            self.check_testcase(1, "Port lease for " + joiner)
 
         # Create new cnf for joiner
-        os.system("sed -i 's#" + donor + "#" + joiner + "#g' " + workdir +
-                  '/conf/' + joiner + '.cnf')
-        os.system("sed -i '/wsrep_sst_auth=root:/d' " + workdir +
-                  '/conf/' + joiner + '.cnf')
-        os.system("sed -i  '0,/^[ \\t]*wsrep_cluster_address[ \\t]*=.*$/s|"
-                  "^[ \\t]*wsrep_cluster_address[ \\t]*=.*$|wsrep_cluster_address="
-                  + wsrep_cluster_addr + "127.0.0.1:" + str(wsrep_port_no) + "|' "
-                  + workdir + '/conf/' + joiner + '.cnf')
-        os.system("sed -i  '0,/^[ \\t]*port[ \\t]*=.*$/s|"
-                  "^[ \\t]*port[ \\t]*=.*$|port="
-                  + str(port_no) + "|' " + workdir + '/conf/' + joiner + '.cnf')
-        os.system('sed -i  "0,/^[ \\t]*wsrep_provider_options[ \\t]*=.*$/s|'
-                  "^[ \\t]*wsrep_provider_options[ \\t]*=.*$|wsrep_provider_options="
-                  "'gmcast.listen_addr=tcp://127.0.0.1:" +
-                  str(wsrep_port_no) + "'"
-                                       '|" ' + workdir + '/conf/' + joiner + '.cnf')
-        os.system("sed -i  '0,/^[ \\t]*server_id[ \\t]*=.*$/s|"
-                  "^[ \\t]*server_id[ \\t]*=.*$|server_id="
-                  "14|' " + workdir + '/conf/' + joiner + '.cnf')
+        cnf_model.write_joiner_config(workdir, donor, joiner, wsrep_cluster_addr, joiner_ports[0])
 
         # Create startup script for joiner.
         shutil.copy(workdir + '/log/startup' + donor_node + '.sh',
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# This will help us to follow Galera replication while a workload is
+# running. wsrep status of every node is polled in the background and
+# written as a CSV time series into the log directory.
+
+import csv
+import time
+import threading
+import mysql.connector
+from util import db_connection
+
+# Status columns, in CSV order. Cumulative counters (flow control pause
+# time, received/replicated write sets) can be turned into rates by
+# taking the difference between two samples.
+WSREP_COLUMNS = ['wsrep_local_state', 'wsrep_flow_control_paused', 'wsrep_flow_control_paused_ns',
+                 'wsrep_flow_control_sent', 'wsrep_flow_control_recv', 'wsrep_local_recv_queue',
+                 'wsrep_local_recv_queue_avg', 'wsrep_local_send_queue', 'wsrep_local_send_queue_avg',
+                 'wsrep_cert_deps_distance', 'wsrep_apply_window', 'wsrep_commit_window',
+                 'wsrep_apply_oooe', 'wsrep_commit_oooe', 'wsrep_local_cert_failures',
+                 'wsrep_local_bf_aborts', 'wsrep_replicated', 'wsrep_received', 'wsrep_last_committed',
+                 'wsrep_cluster_size']
+# Running samplers by CSV file, with the number of workloads using them
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+class WsrepSampler:
+    def __init__(self, sockets, csv_file, interval, debug):
+        self.sockets = sockets
+        self.csv_file = csv_file
+        self.interval = float(interval)
+        self.debug = debug
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.samples = 0
+
+    def sample(self, connection):
+        # wsrep status values of one node in WSREP_COLUMNS order
+        cursor = connection.cursor()
+        cursor.execute("SHOW GLOBAL STATUS LIKE 'wsrep%'")
+        status = dict((name.lower(), value) for name, value in cursor.fetchall())
+        cursor.close()
+        return [status.get(column, '') for column in WSREP_COLUMNS]
+
+    def run(self):
+        """ Poll every node once per interval over one connection
+            per node, until stop() is called.
+        """
+        connections = {}
+        with open(self.csv_file, 'a', newline='') as output:
+            writer = csv.writer(output)
+            if output.tell() == 0:
+                writer.writerow(['time', 'elapsed', 'node'] + WSREP_COLUMNS)
+            start = time.time()
+            next_sample = start
+            while not self.stop_event.is_set():
+                now = time.time()
+                for node, socket in enumerate(self.sockets, 1):
+                    try:
+                        if node not in connections:
+                            connections[node] = db_connection.DbConnection('root', socket).connect()
+                        values = self.sample(connections[node])
+                    except mysql.connector.Error as e:
+                        # Nodes are restarted by some tests, try again on the next sample
+                        if self.debug == 'YES':
+                            print('wsrep sampler: node' + str(node) + ' : ' + str(e))
+                        connections.pop(node, None)
+                        continue
+                    writer.writerow(['{:.3f}'.format(now), '{:.3f}'.format(now - start), node] + values)
+                output.flush()
+                self.samples += 1
+                next_sample += self.interval
+                self.stop_event.wait(max(next_sample - time.time(), 0))
+        for connection in connections.values():
+            try:
+                connection.close()
+            except mysql.connector.Error:
+                pass
+
+    def start(self):
+        if self.debug == 'YES':
+            print('Sampling wsrep status of ' + str(len(self.sockets)) + ' node(s) every ' +
+                  str(self.interval) + 's into ' + self.csv_file)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        return 0
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+class SharedSampler:
+    """ Handle on the sampler of a CSV file. Workloads with the
+        same name started on several nodes of one cluster share
+        one sampler, it runs until the last of them stops.
+    """
+    def __init__(self, sockets, csv_file, interval, debug):
+        self.sockets = sockets
+        self.csv_file = csv_file
+        self.interval = interval
+        self.debug = debug
+        self.started = False
+
+    def start(self):
+        with _shared_lock:
+            if self.csv_file not in _shared:
+                _shared[self.csv_file] = [WsrepSampler(self.sockets, self.csv_file, self.interval,
+                                                       self.debug).start(), 0]
+            _shared[self.csv_file][1] += 1
+        self.started = True
+        return self
+
+    def stop(self):
+        if not self.started:
+            return 0
+        self.started = False
+        sampler = None
+        with _shared_lock:
+            _shared[self.csv_file][1] -= 1
+            if _shared[self.csv_file][1] == 0:
+                sampler = _shared.pop(self.csv_file)[0]
+        if sampler is not None:
+            sampler.stop()
+        return 0
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# This will help us to wait until every cluster node has applied the
+# write sets of a writer node, instead of sleeping a fixed time.
+
+import os
+import time
+import mysql.connector
+from util import db_connection
+
+# Poll interval grows from MIN_POLL to MAX_POLL seconds
+MIN_POLL = 0.05
+MAX_POLL = 1
+
+
+def cluster_sockets(workdir):
+    # Sockets of the running cluster nodes, node1 first
+    sockets = []
+    while os.path.exists(workdir + '/node' + str(len(sockets) + 1) + '/mysql.sock'):
+        sockets.append(workdir + '/node' + str(len(sockets) + 1) + '/mysql.sock')
+    return sockets
+
+
+def last_committed(socket, debug=None):
+    """ wsrep_last_committed seqno of a node, None if
+        the node is down or is not a Galera node
+    """
+    try:
+        rows = db_connection.DbConnection('root', socket, debug). \
+            query("SHOW GLOBAL STATUS LIKE 'wsrep_last_committed'")
+    except mysql.connector.Error as e:
+        if debug == 'YES':
+            print(socket + ': could not read wsrep_last_committed: ' + str(e))
+        return None
+    if not rows:
+        return None
+    return int(rows[0][1])
+
+
+def wait_for_seqno(sockets, seqno, timeout=300, debug=None):
+    """ Wait until every node has applied seqno.
+        Returns 0 on success, 1 on timeout.
+    """
+    deadline = time.time() + timeout
+    poll = MIN_POLL
+    waiting = list(sockets)
+    while True:
+        applied = dict((socket, last_committed(socket, debug)) for socket in waiting)
+        waiting = [socket for socket in waiting if applied[socket] is None or applied[socket] < seqno]
+        if not waiting:
+            return 0
+        if time.time() >= deadline:
+            for socket in waiting:
+                print("ERROR! " + socket + " applied seqno " + str(applied[socket]) +
+                      ", waited for " + str(seqno) + " (" + str(timeout) + "s)")
+            return 1
+        time.sleep(min(poll, max(deadline - time.time(), 0)))
+        poll = min(poll * 2, MAX_POLL)
+
+
+def wait_for_apply(writer_socket, sockets, timeout=300, debug=None):
+    """ Wait until all nodes have applied everything the
+        writer node had committed when the wait started.
+    """
+    seqno = last_committed(writer_socket, debug)
+    if seqno is None:
+        print("ERROR! Could not read wsrep_last_committed from " + writer_socket)
+        return 1
+    start = time.time()
+    result = wait_for_seqno(sockets, seqno, timeout, debug)
+    if debug == 'YES' and result == 0:
+        print("All nodes applied seqno " + str(seqno) + " in " + "{:.2f}".format(time.time() - start) + "s")
+    return result
+
+
+def wait_for_cluster(sockets, timeout=300, debug=None):
+    """ Wait until the nodes have applied the highest seqno
+        committed on any of them. Nodes which are down or
+        are not Galera nodes are left out.
+    """
+    seqnos = dict((socket, last_committed(socket, debug)) for socket in sockets)
+    sockets = [socket for socket in sockets if seqnos[socket] is not None]
+    if len(sockets) < 2:
+        return 0
+    seqno = max(seqnos[socket] for socket in sockets)
+    start = time.time()
+    result = wait_for_seqno(sockets, seqno, timeout, debug)
+    if debug == 'YES' and result == 0:
+        print("All nodes applied seqno " + str(seqno) + " in " + "{:.2f}".format(time.time() - start) + "s")
+    return result